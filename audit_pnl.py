@@ -1,49 +1,48 @@
-
-import MetaTrader5 as mt5
-from datetime import datetime, timedelta
+import os
+from datetime import datetime
 import pandas as pd
 from config import settings
+from src.execution_bridge import MT5Handler
+from src.analytics import (DealCache, DealHistory, trade_frame, performance_stats, breakdown,
+                           daily_pnl, attach_journal, decision_funnel)
+from src.journal import TradeJournal
 
-def audit_today():
-    if not mt5.initialize():
-        print("Failed to init MT5")
-        return
-
-    # Login check
-    if not mt5.login(settings.MT5_LOGIN, password=settings.MT5_PASSWORD, server=settings.MT5_SERVER):
-        print("Login failed")
+def audit_today(days=365, bridge=None):
+    """
+    Auditoría de PnL. `bridge`: cualquier broker con la interfaz de MT5Handler
+    (por defecto MT5; también ReplayBroker).
+    """
+    if bridge is None:
+        bridge = MT5Handler(login=settings.MT5_LOGIN, password=settings.MT5_PASSWORD, server=settings.MT5_SERVER)
+    if not bridge.connect():
+        print("Failed to connect to MT5")
         return
 
     # Definir "Hoy" (Desde medianoche server)
-    now = datetime.now()
-    today_start = datetime(now.year, now.month, now.day)
-    
-    # Obtener historial de DEALS (Operaciones cerradas)
-    deals = mt5.history_deals_get(today_start, now)
-    
-    total_profit = 0.0
-    print(f"\n--- AUDITORÍA DE HOY ({today_start.date()}) ---")
-    
-    if deals:
-        df = pd.DataFrame(list(deals), columns=deals[0]._asdict().keys())
-        # Filtrar solo entradas/salidas (ignorar balance inicial si aparece como deal)
-        # Entry in/out logic is complex, simpler to just sum 'profit' + 'commission' + 'swap'
-        
-        for deal in deals:
-            # Tipos: 0=BUY, 1=SELL, but deals are execution steps.
-            # Entry=0, Entry_Out=1. 
-            # Profit logic: Only deals with profit != 0 are usually exits.
-            if deal.profit != 0:
-                pnl = deal.profit + deal.swap + deal.commission
-                total_profit += pnl
-                symbol = deal.symbol
-                type_str = "WIN" if pnl > 0 else "LOSS"
-                print(f"[{symbol}] {type_str}: ${pnl:.2f}")
+    server_now = bridge.server_time(settings.SYMBOLS[0])
+    now = int(server_now) if server_now else int(datetime.now().timestamp())
+    today_start = now // 86400 * 86400
+
+    # Historial de DEALS: días cerrados desde la caché local, solo lo nuevo al broker
+    history = DealHistory(bridge.history_deals, DealCache(settings.DEAL_CACHE_DIR), account=settings.MT5_LOGIN)
+    trades = trade_frame(history.load(today_start - days * 86400, now))
+    if os.path.exists(settings.JOURNAL_PATH):
+        events = TradeJournal(settings.JOURNAL_PATH, bot='MT5').query(bot='MT5')
+        trades = attach_journal(trades, events)
+    else:
+        events = None
+
+    today = trades[trades['close_time'] >= today_start]
+    print(f"\n--- AUDITORÍA DE HOY ({pd.Timestamp(today_start, unit='s').date()}) ---")
+    if len(today):
+        for symbol, pnl in zip(today['symbol'], today['pnl']):
+            type_str = "WIN" if pnl > 0 else "LOSS"
+            print(f"[{symbol}] {type_str}: ${pnl:.2f}")
     else:
         print("No closed trades today.")
 
     # Verificar posiciones ABIERTAS (Floating PnL)
-    positions = mt5.positions_get()
+    positions = bridge.positions()
     floating_pnl = 0.0
     print("\n--- POSICIONES ABIERTAS ---")
     if positions:
@@ -52,14 +51,37 @@ def audit_today():
             print(f"[{pos.symbol}] Floating: ${pos.profit:.2f} (Price: {pos.price_current})")
     else:
         print("No open positions.")
-        
+
+    # Rendimiento del periodo (equity desde el balance al inicio de la ventana)
+    account = bridge.get_account_info()
+    stats = performance_stats(trades['pnl'], start_balance=account.balance - trades['pnl'].sum())
+    print(f"\n--- RENDIMIENTO ({days} DÍAS) ---")
+    print(f"Trades: {stats['trades']} | Win rate: {stats['win_rate']:.1%} | PF: {stats['profit_factor']:.2f} | "
+          f"Expectancy: ${stats['expectancy']:.2f} | Payoff: {stats['payoff']:.2f}")
+    print(f"Net: ${stats['net']:.2f} | Max DD: ${stats['max_drawdown']:.2f} ({stats['max_drawdown_pct']:.2%}) | "
+          f"Max losing streak: {stats['max_losing_streak']}")
+    if len(trades):
+        columns = ['trades', 'win_rate', 'net', 'expectancy', 'profit_factor']
+        print("\n--- POR SÍMBOLO ---")
+        print(breakdown(trades, 'symbol')[columns].round(2).to_string())
+        print("\n--- POR SESIÓN ---")
+        print(breakdown(trades, 'session')[columns].round(2).to_string())
+        if 'reason' in trades:
+            print("\n--- POR SETUP ---")
+            print(breakdown(trades.fillna({'reason': 'MANUAL'}), 'reason')[columns].round(2).to_string())
+        print("\n--- ÚLTIMOS 10 DÍAS ---")
+        print(daily_pnl(trades).tail(10).round(2).to_string())
+    if events is not None and len(events):
+        print("\n--- DECISIONES (JOURNAL) ---")
+        print(decision_funnel(events).to_string())
+
     print("\n" + "="*30)
-    print(f"CLOSED PnL:   ${total_profit:.2f}")
+    print(f"CLOSED PnL:   ${today['pnl'].sum():.2f}")
     print(f"FLOATING PnL: ${floating_pnl:.2f}")
-    print(f"NET EQUITY:   ${mt5.account_info().equity:.2f}")
+    print(f"NET EQUITY:   ${account.equity:.2f}")
     print("="*30)
 
-    mt5.shutdown()
+    bridge.shutdown()
 
 if __name__ == "__main__":
     audit_today()
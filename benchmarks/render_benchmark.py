@@ -0,0 +1,44 @@
+import sys
+import os
+import io
+import time
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.visual_backtest import draw_spectacular_trade
+
+def make_chart_data(n_bars=300, seed=3):
+    """
+    Velas M15 aleatorias con huecos frecuentes (muchos FVG y todas las sesiones).
+    """
+    rng = np.random.default_rng(seed)
+    closes = 1.10 + np.cumsum(rng.normal(0, 0.0008, n_bars))
+    opens = np.r_[closes[0], closes[:-1]]
+    highs = np.maximum(opens, closes) + rng.exponential(0.0002, n_bars)
+    lows = np.minimum(opens, closes) - rng.exponential(0.0002, n_bars)
+    index = pd.date_range('2024-03-04', periods=n_bars, freq='15min')
+    return pd.DataFrame({'Open': opens, 'High': highs, 'Low': lows, 'Close': closes}, index=index)
+
+def run(n_charts=10):
+    df = make_chart_data()
+    entry = df['Close'].iloc[-1]
+    trade = {'symbol': 'EURUSD', 'action': 'BUY', 'entry': entry, 'sl': entry - 0.0015,
+             'tp': entry + 0.0045, 'reason': 'BENCHMARK', 'rr': 3.0,
+             'real_liq_high': df['High'].max(), 'real_liq_low': df['Low'].min()}
+
+    draw_spectacular_trade(df, trade, output_file=io.BytesIO()) # Warm-up (fonts, caches)
+    times = []
+    for _ in range(n_charts):
+        t0 = time.perf_counter()
+        draw_spectacular_trade(df, trade, output_file=io.BytesIO())
+        times.append(time.perf_counter() - t0)
+    times = np.array(times) * 1000
+    print(f"Render: {n_charts} charts | median {np.median(times):.0f} ms | min {times.min():.0f} ms | "
+          f"{1000 / np.median(times):.2f} charts/s")
+    return {'median_ms': float(np.median(times)), 'min_ms': float(times.min())}
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
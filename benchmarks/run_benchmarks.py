@@ -0,0 +1,256 @@
+import sys
+import os
+import io
+import json
+import time
+import argparse
+import platform
+import contextlib
+from datetime import datetime
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import settings
+from src.smc_analyst import SMCAnalyst
+from src.optimization import simulate_trade_vectorized, generate_entries, run_optimization
+from src.trade_engine import RangeExtremes
+from src.visual_backtest import draw_spectacular_trade
+from src.synthetic_data import generate_ohlc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+DEFAULT_SIZES = [10000, 100000, 1000000]
+PIP = 0.0001
+FAST_CASE = 0.05     # Casos de menos de 50 ms: más repeticiones (el ruido pesa más)
+FAST_REPEATS = 20
+MISMATCH_EXIT = 2    # Línea base de otra clase de máquina: ni pasa ni falla en silencio
+
+
+def load_bars(n_bars, store_dir=None, symbol=None):
+    """
+    Velas sintéticas (por defecto) o las `n_bars` últimas del BarStore.
+    """
+    if store_dir is None:
+        return generate_ohlc(n_bars, symbol or 'EURUSD', seed=7)[0]
+    from src.bar_store import BarStore
+    df = BarStore(store_dir).read(symbol, settings.TIMEFRAME_LTF, n_bars=n_bars)
+    if df is None:
+        raise SystemExit(f"No stored data for {symbol} in {store_dir}")
+    df.columns = [column.capitalize() for column in df.columns]
+    return df
+
+
+def measure(fn, repeats):
+    """
+    Tiempos (s) de `repeats` ejecuciones tras un calentamiento
+    (al menos FAST_REPEATS si el caso dura menos de FAST_CASE).
+    """
+    t0 = time.perf_counter()
+    fn()
+    if time.perf_counter() - t0 < FAST_CASE:
+        repeats = max(repeats, FAST_REPEATS)
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def cases(df):
+    """
+    Casos de la suite sobre un histórico. Cada uno: (nombre, función sin argumentos).
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyst = SMCAnalyst(swing_lookback=settings.SWING_LOOKBACK)
+    entries = generate_entries(analyst, df, pip_size=PIP)
+    engine = RangeExtremes(df['High'].values, df['Low'].values)
+
+    def analyze_live():
+        # Loop en vivo: ventana de 500 velas, estado incremental por símbolo (200 cierres)
+        with contextlib.redirect_stdout(io.StringIO()):
+            live = SMCAnalyst(swing_lookback=settings.SWING_LOOKBACK, streaming=True)
+        for end in range(len(df) - 200, len(df)):
+            live.analyze(df.iloc[end - 500:end], trend_bias=0, point=PIP / 10, symbol='BENCH', timeframe='M15')
+
+    def optimization():
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_optimization(df=df, pip_size=PIP, output_file=None)
+
+    return [
+        ('generate_ohlc', lambda: generate_ohlc(len(df), seed=7)),
+        ('analyze', lambda: analyst.analyze(df, trend_bias=0, point=PIP / 10)),
+        ('analyze_live_200', analyze_live),
+        ('generate_historical_signals', lambda: analyst.generate_historical_signals(df)),
+        ('generate_entries', lambda: generate_entries(analyst, df, pip_size=PIP)),
+        ('simulate_trade_vectorized', lambda: simulate_trade_vectorized(df, entries, 10, 2.0, engine=engine)),
+        ('run_optimization', optimization),
+    ]
+
+
+def render_case():
+    # El gráfico solo usa las últimas 200 velas: coste independiente del tamaño
+    df = generate_ohlc(300, seed=7)[0]
+    entry = df['Close'].iloc[-1]
+    trade = {'symbol': 'EURUSD', 'action': 'BUY', 'entry': entry, 'sl': entry - 0.0015, 'tp': entry + 0.0045,
+             'reason': 'BENCHMARK', 'rr': 3.0, 'real_liq_high': df['High'].max(), 'real_liq_low': df['Low'].min()}
+    return 'draw_spectacular_trade', lambda: draw_spectacular_trade(df, trade, output_file=io.BytesIO())
+
+
+def run_suite(sizes, repeats=3, store_dir=None, symbol=None, only=None):
+    results = {}
+
+    def record(name, size, times):
+        key = f"{name}@{size}"
+        results[key] = {'case': name, 'bars': size, 'median_s': float(np.median(times)),
+                        'min_s': float(np.min(times)), 'runs': len(times)}
+        print(f"{key:<42} median {np.median(times) * 1e3:10.2f} ms | min {np.min(times) * 1e3:10.2f} ms")
+
+    for size in sizes:
+        df = load_bars(size, store_dir, symbol)
+        for name, fn in cases(df):
+            if only and name not in only: continue
+            record(name, len(df), measure(fn, repeats))
+
+    name, fn = render_case()
+    if not only or name in only:
+        record(name, 200, measure(fn, repeats * 3))
+    return results
+
+
+def calibrate(repeats=15):
+    """
+    Mínimo (s) de una carga fija (numpy + bucle Python) en esta máquina. La línea
+    base se escala por calibración actual / calibración base antes de comparar.
+    """
+    x = np.random.default_rng(0).random(500000)
+
+    def work():
+        np.sort(x)
+        np.cumsum(x)
+        total = 0
+        for i in range(100000):
+            total += i % 7
+        return total
+    return float(np.min(measure(work, repeats)))
+
+
+def machine_info():
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'node': platform.node(), 'cpus': os.cpu_count()}
+
+
+def machine_key(machine):
+    """
+    Lo que hace comparables dos máquinas una vez calibradas: CPUs y versión
+    mayor.menor de Python y numpy (kernel, host o parche no cuentan).
+    """
+    minor = lambda version: '.'.join(str(version).split('.')[:2])
+    return {'python': minor(machine.get('python')), 'numpy': minor(machine.get('numpy')), 'cpus': machine.get('cpus')}
+
+
+def machine_diff(baseline, machine):
+    """
+    Campos de machine_key que difieren de la línea base (tiempos no comparables).
+    """
+    base, current = machine_key(baseline.get('machine', {})), machine_key(machine)
+    return [f"{key}: {base[key]} -> {value}" for key, value in current.items() if base[key] != value]
+
+
+def compare(results, baseline, tolerance, min_delta, scale=1.0):
+    """
+    Casos más lentos que la línea base escalada por `scale` (calibración):
+    min > base * scale * (1 + tolerance) y más de `min_delta` s.
+    Se compara el mínimo (el ruido solo suma tiempo) y no la mediana.
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get('results', {}).get(key)
+        if base is None: continue
+        expected = base['min_s'] * scale
+        ratio = result['min_s'] / expected if expected > 0 else 1.0
+        flag = ratio > 1 + tolerance and result['min_s'] - expected > min_delta
+        print(f"{key:<42} {expected * 1e3:10.2f} -> {result['min_s'] * 1e3:10.2f} ms  x{ratio:5.2f}"
+              f"{'  <-- REGRESSION' if flag else ''}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de análisis, simulación y render.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--cases', nargs='+', help="Solo estos casos (por nombre)")
+    parser.add_argument('--store', help="BarStore con OHLCV real en lugar de velas sintéticas")
+    parser.add_argument('--symbol', default='EURUSD')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help="Guarda estos resultados como línea base")
+    parser.add_argument('--tolerance', type=float, default=0.30, help="Margen de regresión (0.30 = +30%%)")
+    parser.add_argument('--min-delta', type=float, default=0.005, help="Diferencia mínima en segundos")
+    parser.add_argument('--skip-on-mismatch', action='store_true',
+                        help="Sale con 0 (gate omitido) si la línea base es de otra clase de máquina")
+    args = parser.parse_args(argv)
+
+    calibration = calibrate()
+    print(f"Calibration: {calibration * 1e3:.2f} ms")
+    results = run_suite(args.sizes, args.repeats, args.store, args.symbol, args.cases)
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'machine': machine_info(),
+        'calibration_s': calibration,
+        'data': 'store' if args.store else 'synthetic',
+        'results': results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = os.path.join(RESULTS_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults: {output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline yet (run with --save-baseline).")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    differences = machine_diff(baseline, report['machine'])
+    if differences:
+        print(f"\n⚠️ Baseline recorded on another kind of machine ({'; '.join(differences)}): timings are not "
+              f"comparable. Re-run with --save-baseline on this machine.")
+        if args.skip_on_mismatch:
+            print("Gate skipped (--skip-on-mismatch).")
+            return 0
+        return MISMATCH_EXIT
+    scale = calibration / baseline['calibration_s'] if baseline.get('calibration_s') else 1.0
+    print(f"\n--- vs baseline ({baseline['created']}, tolerance +{args.tolerance:.0%}, "
+          f"calibration x{scale:.2f}) ---")
+    regressions = compare(results, baseline, args.tolerance, args.min_delta, scale)
+    if regressions:
+        # Confirmación: se vuelven a medir los casos sospechosos antes de fallar
+        print(f"\nRe-measuring {len(regressions)} suspected regression(s)...")
+        sizes = sorted({results[key]['bars'] for key in regressions} & set(args.sizes))
+        rerun = run_suite(sizes, args.repeats * 3, args.store, args.symbol, {results[key]['case'] for key in regressions})
+        for key in regressions:
+            if key in rerun:
+                results[key]['min_s'] = min(results[key]['min_s'], rerun[key]['min_s'])
+        print()
+        regressions = compare({key: results[key] for key in regressions}, baseline, args.tolerance, args.min_delta,
+                              scale)
+    if regressions:
+        print(f"❌ {len(regressions)} performance regression(s): {', '.join(regressions)}")
+        return 1
+    print("✅ No performance regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
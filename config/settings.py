@@ -30,6 +30,31 @@ TRAP_BOS_COUNT = 2  # Number of BOS to consider a trap
 # Adjust based on your broker server time!
 KILLZONES = [8, 9, 10, 11, 12, 13, 14, 15, 16, 17]
 
+# Local OHLCV History (memory-mapped bar store)
+BAR_STORE_DIR = "data/bars"
+
+# Trade / decision journal (SQLite WAL, shared by both bots)
+JOURNAL_PATH = "data/journal.db"
+
+# Closed-day deal history cache (analytics / audit_pnl.py)
+DEAL_CACHE_DIR = "data/deals"
+
+# Prometheus /metrics endpoint (stage latencies, scan time per symbol); 0 disables it.
+# Use METRICS_HOST = "0.0.0.0" to scrape from outside the container.
+METRICS_PORT = 9108
+METRICS_HOST = "127.0.0.1"
+
+# Symbol Specs (tick size/value, volume limits) cache
+SYMBOL_SPEC_TTL_SECONDS = 3600
+
+# Audit Charts (rendered in a background process pool)
+RENDER_WORKERS = 1
+RENDER_MAX_PENDING = 4       # Charts in flight; newer fills send text-only alerts
+
+# Scheduling (Bar-Close Events)
+BAR_SETTLE_SECONDS = 2       # Wait after the LTF close before analyzing
+DUTY_INTERVAL_SECONDS = 10   # Trailing stops / risk checks between closes
+
 # Credentials
 # OPCIÓN A: Escríbelas aquí directamente para pruebas rápidas (Reemplaza los valores).
 # OPCIÓN B: Déjalas como están y usa un archivo .env para mayor seguridad (Recomendado para Docker).
@@ -27,6 +27,25 @@ SYMBOLS = [
 TIMEFRAME_HTF = "4h"  # Higher timeframe for trend
 TIMEFRAME_LTF = "15m"  # Lower timeframe for entry
 
+# Local OHLCV History (memory-mapped bar store)
+BAR_STORE_DIR = "data/bars"
+OHLCV_PAGE_LIMIT = 1000      # Max candles per fetch_ohlcv call (long histories are paged)
+
+# Trade / decision journal (SQLite WAL, shared by both bots)
+JOURNAL_PATH = "data/journal.db"
+
+# Prometheus /metrics endpoint (stage latencies, scan time per symbol); 0 disables it.
+# Use METRICS_HOST = "0.0.0.0" to scrape from outside the container.
+METRICS_PORT = 9108
+METRICS_HOST = "127.0.0.1"
+
+# Scheduling (Bar-Close Events)
+BAR_SETTLE_SECONDS = 2       # Wait after the LTF close before analyzing
+DUTY_INTERVAL_SECONDS = 10   # Sleep granularity between closes
+
+# Async Scanner (main_ccxt_async.py)
+MAX_CONCURRENT_REQUESTS = 20 # In-flight REST calls; ccxt's rate limiter still spaces them
+
 # Risk Management
 RISK_PER_TRADE = 0.01      # 1% risk per trade
 DAILY_LOSS_LIMIT = 0.03    # 3% daily hard stop
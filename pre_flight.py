@@ -68,6 +68,9 @@ def pre_flight_check():
     msg = "🚀 **PRE-FLIGHT CHECK PASSED**\n\nAll systems are GREEN. Ready for launch."
     try:
         notifier.send_alert(msg)
+        notifier.close(timeout=30) # Delivery runs in the background
+        if notifier.sent == 0:
+            raise RuntimeError("message not delivered")
         print_status("Telegram Link", True, "Test message sent successfully.")
     except Exception as e:
         print_status("Telegram Link", False, f"Failed to send: {e}")
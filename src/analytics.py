@@ -0,0 +1,267 @@
+import sys
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.liquidity_levels import SESSIONS
+
+# Campos de history_deals_get que usa la analítica (y su dtype columnar)
+DEAL_DTYPES = {
+    'time': np.int64, 'ticket': np.int64, 'position_id': np.int64, 'symbol': str,
+    'type': np.int64, 'entry': np.int64, 'volume': np.float64, 'price': np.float64,
+    'profit': np.float64, 'commission': np.float64, 'swap': np.float64,
+}
+
+# Constantes MT5 (sin depender del paquete MetaTrader5)
+DEAL_TYPE_BUY = 0
+DEAL_TYPE_SELL = 1
+DEAL_ENTRY_IN = 0
+
+TRADE_COLUMNS = ['position_id', 'symbol', 'direction', 'volume', 'entry_price', 'exit_price',
+                 'open_time', 'close_time', 'pnl', 'session']
+
+
+def empty_deals():
+    return {column: np.empty(0, dtype=dtype) for column, dtype in DEAL_DTYPES.items()}
+
+
+def deal_arrays(deals):
+    """
+    Deals (tuplas de mt5.history_deals_get, registros o DataFrame) -> dict de arrays.
+    """
+    if deals is None or len(deals) == 0:
+        return empty_deals()
+    if not isinstance(deals, pd.DataFrame):
+        first = deals[0]
+        columns = first._asdict().keys() if hasattr(first, '_asdict') else None
+        deals = pd.DataFrame(list(deals), columns=columns)
+    return {column: deals[column].to_numpy().astype(dtype) for column, dtype in DEAL_DTYPES.items()}
+
+
+def concat_deals(parts):
+    parts = [part for part in parts if len(part['time'])]
+    if not parts:
+        return empty_deals()
+    return {column: np.concatenate([part[column] for part in parts]) for column in DEAL_DTYPES}
+
+
+def select_deals(deals, mask):
+    return {column: values[mask] for column, values in deals.items()}
+
+
+class DealCache:
+    """
+    Deals de días cerrados por cuenta, un .npy por columna (data/deals/<cuenta>/).
+    meta.json guarda filas, inicio cubierto y `closed_until` (epoch); se escribe
+    al final, así una escritura cortada no deja filas a medias visibles.
+    """
+
+    def __init__(self, root="data/deals"):
+        self.root = root
+
+    def path(self, account):
+        return os.path.join(self.root, str(account))
+
+    def load(self, account):
+        """
+        Retorna (deals, meta) o (vacío, None) si la cuenta no tiene caché.
+        """
+        meta_file = os.path.join(self.path(account), 'meta.json')
+        if not os.path.exists(meta_file):
+            return empty_deals(), None
+        with open(meta_file) as f:
+            meta = json.load(f)
+        deals = {column: np.load(os.path.join(self.path(account), f"{column}.npy"))[:meta['rows']]
+                 for column in DEAL_DTYPES}
+        return deals, meta
+
+    def save(self, account, deals, start, closed_until):
+        os.makedirs(self.path(account), exist_ok=True)
+        for column in DEAL_DTYPES:
+            np.save(os.path.join(self.path(account), f"{column}.npy"), deals[column])
+        with open(os.path.join(self.path(account), 'meta.json'), 'w') as f:
+            json.dump({'rows': int(len(deals['time'])), 'start': int(start), 'closed_until': int(closed_until)}, f)
+
+
+class DealHistory:
+    """
+    Historial de deals de una cuenta. Los días cerrados se sirven desde DealCache;
+    al broker solo se le piden los deals desde el último día cacheado.
+    fetch(date_from, date_to): epoch segundos -> deals (p. ej. mt5.history_deals_get).
+    """
+
+    def __init__(self, fetch, cache=None, account=0):
+        self.fetch = fetch
+        self.cache = cache or DealCache()
+        self.account = account
+
+    def load(self, start, now=None):
+        """
+        Deals con time >= start hasta `now` (hora del servidor, epoch segundos).
+        """
+        start = int(start)
+        now = int(now if now is not None else time.time())
+        today = now // 86400 * 86400
+        cached, meta = self.cache.load(self.account)
+        if meta is None or start < meta['start']:
+            # Sin caché o se pide más atrás de lo guardado: se reconstruye desde `start`
+            cached, meta = empty_deals(), {'start': start, 'closed_until': start}
+        since = meta['closed_until']
+
+        fresh = deal_arrays(self.fetch(since, now))
+        if today > since:
+            # Días completos nuevos -> caché (el día en curso siempre se vuelve a pedir)
+            done = fresh['time'] < today
+            cached = concat_deals([cached, select_deals(fresh, done)])
+            self.cache.save(self.account, cached, meta['start'], today)
+            fresh = select_deals(fresh, ~done)
+
+        deals = concat_deals([cached, fresh])
+        return select_deals(deals, deals['time'] >= start)
+
+
+def session_labels(times):
+    """
+    Sesión (hora del servidor) de cada epoch: ASIA / LONDON / NEW_YORK / OFF.
+    """
+    hours = (np.asarray(times, dtype=np.int64) % 86400) // 3600
+    labels = np.full(len(hours), 'OFF', dtype=object)
+    for name, (start, end) in SESSIONS.items():
+        labels[(hours >= start) & (hours < end)] = name
+    return labels
+
+
+def trade_frame(deals):
+    """
+    Una fila por posición cerrada: deals agrupados por position_id con reduceat.
+    pnl = profit + commission + swap de todos los deals de la posición.
+    """
+    trading = (deals['type'] == DEAL_TYPE_BUY) | (deals['type'] == DEAL_TYPE_SELL)
+    deals = select_deals(deals, trading)
+    if len(deals['time']) == 0:
+        return pd.DataFrame(columns=TRADE_COLUMNS)
+
+    order = np.lexsort((deals['time'], deals['position_id']))
+    deals = select_deals(deals, order)
+    position = deals['position_id']
+    starts = np.flatnonzero(np.r_[True, position[1:] != position[:-1]])
+    ends = np.r_[starts[1:], len(position)] - 1
+
+    net = deals['profit'] + deals['commission'] + deals['swap']
+    exits = np.add.reduceat((deals['entry'] != DEAL_ENTRY_IN).astype(np.int64), starts)
+    closed = exits > 0
+
+    open_time = deals['time'][starts]
+    trades = pd.DataFrame({
+        'position_id': position[starts],
+        'symbol': deals['symbol'][starts],
+        'direction': np.where(deals['type'][starts] == DEAL_TYPE_BUY, 'BUY', 'SELL'),
+        'volume': deals['volume'][starts],
+        'entry_price': deals['price'][starts],
+        'exit_price': deals['price'][ends],
+        'open_time': open_time,
+        'close_time': np.maximum.reduceat(deals['time'], starts),
+        'pnl': np.add.reduceat(net, starts),
+        'session': session_labels(open_time),
+    }, columns=TRADE_COLUMNS)[closed]
+    return trades.sort_values(['close_time', 'position_id'], kind='stable').reset_index(drop=True)
+
+
+def _max_run(mask):
+    if not mask.any(): return 0
+    edges = np.diff(np.r_[0, mask.astype(np.int8), 0])
+    return int((np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)).max())
+
+
+def _equity(pnl, start_balance):
+    equity = start_balance + np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.r_[start_balance, equity])[1:]
+    return equity, peak, peak - equity
+
+
+def equity_curve(trades, start_balance=0.0):
+    """
+    Equity al cierre de cada operación, pico previo y drawdown (absoluto y %).
+    """
+    pnl = np.asarray(trades['pnl'], dtype=np.float64)
+    equity, peak, drawdown = _equity(pnl, start_balance)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown_pct = np.where(peak > 0, drawdown / peak, 0.0)
+    return pd.DataFrame({'time': pd.to_datetime(np.asarray(trades['close_time'], dtype=np.int64), unit='s'),
+                         'pnl': pnl, 'equity': equity, 'peak': peak,
+                         'drawdown': drawdown, 'drawdown_pct': drawdown_pct})
+
+
+def performance_stats(pnl, start_balance=0.0):
+    """
+    Estadísticas de una secuencia de PnL por operación (en orden de cierre).
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    n = len(pnl)
+    wins, losses = pnl > 0, pnl < 0
+    gross_profit = float(pnl[wins].sum())
+    gross_loss = float(-pnl[losses].sum())
+    _, peak, drawdown = _equity(pnl, start_balance)
+    avg_win = float(pnl[wins].mean()) if wins.any() else 0.0
+    avg_loss = float(-pnl[losses].mean()) if losses.any() else 0.0
+    return {
+        'trades': n,
+        'wins': int(wins.sum()),
+        'losses': int(losses.sum()),
+        'win_rate': float(wins.mean()) if n else 0.0,
+        'net': float(pnl.sum()),
+        'gross_profit': gross_profit,
+        'gross_loss': gross_loss,
+        'profit_factor': gross_profit / gross_loss if gross_loss > 0 else float('inf') if gross_profit > 0 else 0.0,
+        'expectancy': float(pnl.mean()) if n else 0.0,
+        'avg_win': avg_win,
+        'avg_loss': avg_loss,
+        'payoff': avg_win / avg_loss if avg_loss > 0 else 0.0,
+        'max_drawdown': float(drawdown.max()) if n else 0.0,
+        'max_drawdown_pct': float((drawdown[peak > 0] / peak[peak > 0]).max()) if (peak > 0).any() else 0.0,
+        'max_losing_streak': _max_run(losses),
+    }
+
+
+def breakdown(trades, by='symbol'):
+    """
+    Estadísticas por grupo (symbol, session, direction, reason...) con un groupby.
+    """
+    pnl = trades['pnl']
+    grouped = trades.assign(win=pnl > 0, gross_profit=pnl.clip(lower=0), gross_loss=-pnl.clip(upper=0)).groupby(by)
+    out = grouped.agg(trades=('pnl', 'size'), wins=('win', 'sum'), net=('pnl', 'sum'), expectancy=('pnl', 'mean'),
+                      gross_profit=('gross_profit', 'sum'), gross_loss=('gross_loss', 'sum'))
+    out['win_rate'] = out['wins'] / out['trades']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out['profit_factor'] = np.where(out['gross_loss'] > 0, out['gross_profit'] / out['gross_loss'], np.inf)
+    return out.sort_values('net', ascending=False)
+
+
+def daily_pnl(trades):
+    """
+    PnL cerrado por día del servidor.
+    """
+    days = pd.to_datetime(np.asarray(trades['close_time'], dtype=np.int64) // 86400 * 86400, unit='s')
+    return trades.groupby(days)['pnl'].agg(['size', 'sum']).rename(columns={'size': 'trades', 'sum': 'pnl'})
+
+
+def attach_journal(trades, events):
+    """
+    Añade la razón de entrada del journal (eventos FILL) a cada operación por ticket.
+    """
+    fills = events[events['event'] == 'FILL']
+    tickets = pd.to_numeric(fills['ticket'], errors='coerce')
+    fills = pd.DataFrame({'position_id': tickets, 'reason': fills['reason']}).dropna(subset=['position_id'])
+    fills = fills.astype({'position_id': np.int64}).drop_duplicates('position_id', keep='last')
+    return trades.merge(fills, on='position_id', how='left')
+
+
+def decision_funnel(events):
+    """
+    Señales, ejecuciones, descartes (por motivo) y movimientos de SL por símbolo.
+    """
+    label = np.where(events['event'] == 'SKIP', 'SKIP:' + events['reason'].fillna(''), events['event'])
+    return pd.crosstab(events['symbol'], label)
@@ -0,0 +1,162 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+from collections import deque
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.timeframes import bar_open_time, timeframe_seconds, sync_start
+
+# Columnas OHLCV reconocidas (MT5 en mayúsculas, CCXT en minúsculas)
+VOLUME_COLUMNS = ('Volume', 'volume', 'tick_volume', 'Tick_volume')
+
+
+def _ohlc_columns(df):
+    """
+    Nombres reales de open/high/low/close/volumen en el DataFrame (volumen puede ser None).
+    """
+    lower = {column.lower(): column for column in df.columns}
+    names = [lower[name] for name in ('open', 'high', 'low', 'close')]
+    volume = next((column for column in VOLUME_COLUMNS if column in df.columns), None)
+    return names + [volume]
+
+
+def aggregate_arrays(times, opens, highs, lows, closes, volumes, timeframe, offset=None):
+    """
+    Agrega velas base (ordenadas) a `timeframe` con reduceat.
+    times: DatetimeIndex o datetime64. Retorna dict de arrays con 'time' = apertura HTF.
+    """
+    buckets = bar_open_time(pd.DatetimeIndex(times), timeframe, offset)
+    if len(buckets) == 0:
+        empty = np.empty(0)
+        return {'time': buckets, 'open': empty, 'high': empty, 'low': empty, 'close': empty, 'volume': empty}
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    return {
+        'time': buckets[starts],
+        'open': np.asarray(opens)[starts],
+        'high': np.maximum.reduceat(np.asarray(highs), starts),
+        'low': np.minimum.reduceat(np.asarray(lows), starts),
+        'close': np.asarray(closes)[ends],
+        'volume': np.add.reduceat(np.asarray(volumes), starts) if volumes is not None else np.zeros(len(starts)),
+    }
+
+
+def aggregate(df, timeframe, offset=None):
+    """
+    Velas de `timeframe` construidas desde un DataFrame base (mismo estilo de columnas).
+    La última fila es el bloque de la última vela base (puede estar incompleto).
+    """
+    o, h, l, c, v = _ohlc_columns(df)
+    bars = aggregate_arrays(df.index, df[o].values, df[h].values, df[l].values, df[c].values,
+                            df[v].values if v else None, timeframe, offset)
+    out = pd.DataFrame({o: bars['open'], h: bars['high'], l: bars['low'], c: bars['close']},
+                       index=pd.DatetimeIndex(bars['time'], name=df.index.name))
+    if v:
+        out[v] = bars['volume']
+    return out
+
+
+def base_bars_for(base_timeframe, timeframe, n_bars):
+    """
+    Velas base necesarias para `n_bars` velas de `timeframe` (sin contar huecos de mercado).
+    """
+    return n_bars * max(1, timeframe_seconds(timeframe) // timeframe_seconds(base_timeframe))
+
+
+class BarAggregator:
+    """
+    Timeframes superiores (p. ej. M15 -> H1/H4/D1, o M1 -> M15) desde un único
+    flujo de velas base, por símbolo y de forma incremental.
+
+    Las velas se alinean como bar_open_time (medianoche del servidor del broker
+    en MT5, UTC en CCXT; `offset` desplaza el inicio de sesión si hace falta).
+    El bloque que contiene la última vela base es siempre la vela en formación
+    (igual que la última fila de get_data); se cierra cuando llega la primera
+    vela base del bloque siguiente.
+    """
+
+    def __init__(self, base_timeframe, timeframes, offset=None, max_bars=1000):
+        self.base_timeframe = base_timeframe
+        self.timeframes = list(timeframes)
+        self.offset = offset
+        self.max_bars = max_bars
+        self.states = {} # symbol -> dict
+
+    def seed(self, symbol, df):
+        """
+        Estado inicial desde un histórico base completo (velas cerradas).
+        """
+        columns = _ohlc_columns(df)
+        state = {'columns': columns, 'last_time': df.index[-1] if len(df) else None, 'bars': {}}
+        for timeframe in self.timeframes:
+            htf = aggregate(df, timeframe, self.offset)
+            rows = list(zip(htf.index, *[htf[column].values for column in columns if column]))
+            closed = deque(rows[:-1], maxlen=self.max_bars)
+            state['bars'][timeframe] = {'closed': closed, 'forming': list(rows[-1]) if rows else None}
+        self.states[symbol] = state
+        return state
+
+    def update(self, symbol, df):
+        """
+        Añade las velas base nuevas de `df`. Retorna {timeframe: DataFrame de velas
+        cerradas nuevas} o None si no hay estado o `df` no enlaza con la última
+        vela procesada (hay que llamar a seed con más histórico).
+        """
+        state = self.states.get(symbol)
+        if state is None or df is None:
+            return None
+        index = df.index
+        start = sync_start(index, state['last_time'])
+        if start is None:
+            return None
+
+        new = df.iloc[start:]
+        columns = state['columns']
+        values = [new[column].values if column else np.zeros(len(new)) for column in columns]
+        closed_now = {}
+        for timeframe in self.timeframes:
+            bars = state['bars'][timeframe]
+            buckets = bar_open_time(new.index, timeframe, self.offset)
+            closed_now[timeframe] = []
+            for i, bucket in enumerate(buckets):
+                o, h, l, c, v = (column[i] for column in values)
+                forming = bars['forming']
+                if forming is not None and forming[0] == bucket:
+                    forming[2] = max(forming[2], h)
+                    forming[3] = min(forming[3], l)
+                    forming[4] = c
+                    if len(forming) > 5:
+                        forming[5] += v
+                    continue
+                if forming is not None:
+                    bars['closed'].append(tuple(forming))
+                    closed_now[timeframe].append(tuple(forming))
+                bars['forming'] = [bucket, o, h, l, c] + ([v] if columns[4] else [])
+        state['last_time'] = index[-1]
+        return {timeframe: self._frame(state, rows) for timeframe, rows in closed_now.items()}
+
+    def _frame(self, state, rows):
+        names = [column for column in state['columns'] if column]
+        if not rows:
+            return pd.DataFrame(columns=names, index=pd.DatetimeIndex([]))
+        times, *values = zip(*rows)
+        return pd.DataFrame(dict(zip(names, values)), index=pd.DatetimeIndex(times))
+
+    def frame(self, symbol, timeframe, forming=True):
+        """
+        Velas HTF guardadas (las `max_bars` últimas cerradas + la que se forma).
+        """
+        state = self.states.get(symbol)
+        if state is None: return None
+        bars = state['bars'][timeframe]
+        rows = list(bars['closed'])
+        if forming and bars['forming'] is not None:
+            rows.append(tuple(bars['forming']))
+        return self._frame(state, rows)
+
+    def history_bars(self, timeframe, n_bars):
+        """
+        Velas base a pedir para sembrar `n_bars` velas de `timeframe`.
+        """
+        return base_bars_for(self.base_timeframe, timeframe, n_bars)
@@ -0,0 +1,184 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from src.timeframes import timeframe_seconds
+
+class BarStore:
+    """
+    Almacén local columnar de velas por (symbol, timeframe).
+
+    Cada columna es un fichero binario plano (int64 para `time` en epoch
+    segundos, float64 para el resto) que se lee con np.memmap: los rangos
+    de años de M1/M15 se sirven sin copiar. Las escrituras son append; la
+    última vela (la que se estaba formando) se sobrescribe en su sitio.
+    Un bloque que no solapa ni continúa la cola guardada deja un hueco: se
+    registra en gaps.json (ver gaps()) para que los backtests no lo ignoren.
+    """
+
+    def __init__(self, root="data/bars"):
+        self.root = root
+
+    def path(self, symbol, timeframe):
+        # "BTC/USDT" -> "BTC_USDT"
+        safe_symbol = symbol.replace('/', '_').replace(':', '_')
+        return os.path.join(self.root, safe_symbol, timeframe)
+
+    def columns(self, symbol, timeframe):
+        meta_file = os.path.join(self.path(symbol, timeframe), 'columns.json')
+        if not os.path.exists(meta_file): return None
+        with open(meta_file) as f:
+            return json.load(f)
+
+    def _gaps_file(self, symbol, timeframe):
+        return os.path.join(self.path(symbol, timeframe), 'gaps.json')
+
+    def gaps(self, symbol, timeframe, start=None, end=None):
+        """
+        Huecos registrados por append: [(última vela guardada, primera vela nueva)]
+        en epoch segundos, con velas sin descargar entre ambas. Solo los que
+        caen en [start, end) si se indican (Timestamp o epoch segundos).
+        """
+        file = self._gaps_file(symbol, timeframe)
+        if not os.path.exists(file): return []
+        with open(file) as f:
+            gaps = [tuple(gap) for gap in json.load(f)]
+        lo = self._epoch(start) if start is not None else None
+        hi = self._epoch(end) if end is not None else None
+        return [gap for gap in gaps if (lo is None or gap[1] > lo) and (hi is None or gap[0] < hi)]
+
+    def _record_gap(self, symbol, timeframe, last_time, first_time):
+        gaps = self.gaps(symbol, timeframe) + [(int(last_time), int(first_time))]
+        with open(self._gaps_file(symbol, timeframe), 'w') as f:
+            json.dump(gaps, f)
+        print(f"[Store] Gap in {symbol} {timeframe}: {pd.Timestamp(last_time, unit='s')} -> "
+              f"{pd.Timestamp(first_time, unit='s')} (bars missing)")
+
+    def _column_file(self, symbol, timeframe, column):
+        return os.path.join(self.path(symbol, timeframe), f"{column}.bin")
+
+    @staticmethod
+    def _dtype(column):
+        return np.dtype(np.int64) if column == 'time' else np.dtype(np.float64)
+
+    def length(self, symbol, timeframe):
+        """
+        Número de velas completas (mínimo entre columnas por si una escritura se cortó).
+        """
+        columns = self.columns(symbol, timeframe)
+        if not columns: return 0
+        sizes = []
+        for column in columns:
+            file = self._column_file(symbol, timeframe, column)
+            size = os.path.getsize(file) if os.path.exists(file) else 0
+            sizes.append(size // self._dtype(column).itemsize)
+        return min(sizes)
+
+    def last_time(self, symbol, timeframe):
+        n = self.length(symbol, timeframe)
+        if n == 0: return None
+        times = np.memmap(self._column_file(symbol, timeframe, 'time'), dtype=np.int64, mode='r', shape=(n,))
+        return int(times[-1])
+
+    def append(self, symbol, timeframe, bars):
+        """
+        Añade velas (dict o array estructurado con `time` en epoch segundos, orden ascendente).
+        Velas anteriores a la última guardada se ignoran; la de igual tiempo se sobrescribe.
+        Retorna el número de velas nuevas.
+        """
+        names = list(bars.dtype.names) if hasattr(bars, 'dtype') else list(bars.keys())
+        times = np.asarray(bars['time'], dtype=np.int64)
+        if len(times) == 0: return 0
+
+        columns = self.columns(symbol, timeframe)
+        if columns is None:
+            columns = ['time'] + [name for name in names if name != 'time']
+            os.makedirs(self.path(symbol, timeframe), exist_ok=True)
+            with open(os.path.join(self.path(symbol, timeframe), 'columns.json'), 'w') as f:
+                json.dump(columns, f)
+        missing = [column for column in columns if column not in names]
+        if missing:
+            raise ValueError(f"Missing columns for {symbol} {timeframe}: {missing}")
+
+        n = self._truncate(symbol, timeframe, columns)
+        last_time = self.last_time(symbol, timeframe) if n else None
+
+        start = 0
+        if last_time is not None:
+            start = int(np.searchsorted(times, last_time))
+            if start < len(times) and times[start] == last_time:
+                # Patch de la última vela guardada
+                for column in columns:
+                    value = np.asarray(bars[column][start:start + 1], dtype=self._dtype(column))
+                    with open(self._column_file(symbol, timeframe, column), 'r+b') as f:
+                        f.seek((n - 1) * value.itemsize)
+                        f.write(value.tobytes())
+                start += 1
+            elif start == 0 and times[0] - last_time > timeframe_seconds(timeframe):
+                # Ni solapa ni continúa la cola: las velas intermedias no se descargaron
+                self._record_gap(symbol, timeframe, last_time, times[0])
+
+        new_rows = len(times) - start
+        if new_rows > 0:
+            for column in columns:
+                values = np.asarray(bars[column][start:], dtype=self._dtype(column))
+                with open(self._column_file(symbol, timeframe, column), 'ab') as f:
+                    f.write(values.tobytes())
+        return new_rows
+
+    def append_frame(self, symbol, timeframe, df):
+        """
+        Añade un DataFrame con índice temporal (columnas en cualquier capitalización).
+        """
+        bars = {'time': df.index.values.astype('datetime64[s]').astype(np.int64)}
+        for column in df.columns:
+            bars[column.lower()] = df[column].values
+        return self.append(symbol, timeframe, bars)
+
+    def _truncate(self, symbol, timeframe, columns):
+        # Deja todas las columnas con la misma longitud (escritura interrumpida)
+        n = self.length(symbol, timeframe)
+        for column in columns:
+            file = self._column_file(symbol, timeframe, column)
+            if not os.path.exists(file):
+                open(file, 'wb').close()
+            elif os.path.getsize(file) != n * self._dtype(column).itemsize:
+                with open(file, 'r+b') as f:
+                    f.truncate(n * self._dtype(column).itemsize)
+        return n
+
+    def read_arrays(self, symbol, timeframe, start=None, end=None, n_bars=None):
+        """
+        Columnas como vistas memmap (sin copia) en [start, end).
+        start/end: Timestamp o epoch segundos. n_bars: solo las últimas n.
+        """
+        n = self.length(symbol, timeframe)
+        if n == 0: return None
+        columns = self.columns(symbol, timeframe)
+        arrays = {column: np.memmap(self._column_file(symbol, timeframe, column),
+                                    dtype=self._dtype(column), mode='r', shape=(n,))
+                  for column in columns}
+
+        lo, hi = 0, n
+        times = arrays['time']
+        if start is not None:
+            lo = int(np.searchsorted(times, self._epoch(start)))
+        if end is not None:
+            hi = int(np.searchsorted(times, self._epoch(end)))
+        if n_bars is not None:
+            lo = max(lo, hi - n_bars)
+        return {column: values[lo:hi] for column, values in arrays.items()}
+
+    def read(self, symbol, timeframe, start=None, end=None, n_bars=None):
+        """
+        DataFrame con índice `time` (datetime) y las columnas guardadas.
+        """
+        arrays = self.read_arrays(symbol, timeframe, start=start, end=end, n_bars=n_bars)
+        if arrays is None: return None
+        index = pd.DatetimeIndex(pd.to_datetime(np.asarray(arrays.pop('time')), unit='s'), name='time')
+        return pd.DataFrame({column: np.asarray(values) for column, values in arrays.items()}, index=index)
+
+    @staticmethod
+    def _epoch(ts):
+        if isinstance(ts, (int, np.integer)): return int(ts)
+        return int(pd.Timestamp(ts).value // 10**9)
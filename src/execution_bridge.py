@@ -1,8 +1,131 @@
-import MetaTrader5 as mt5
+try:
+    import MetaTrader5 as mt5
+except ImportError: # Sin terminal (Linux/CI): solo replay / offline, ver src/replay.py
+    mt5 = None
 import time
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from config import settings
+from src.journal import STOP_MOVE
+from src.timeframes import timeframe_seconds
+
+# MT5 timeframe mapping (simplified)
+TIMEFRAMES = {
+    "M1": mt5.TIMEFRAME_M1,
+    "M5": mt5.TIMEFRAME_M5,
+    "M15": mt5.TIMEFRAME_M15,
+    "H1": mt5.TIMEFRAME_H1,
+    "H4": mt5.TIMEFRAME_H4,
+    "D1": mt5.TIMEFRAME_D1
+} if mt5 else {}
+
+# Position types (same values as mt5.ORDER_TYPE_BUY / mt5.ORDER_TYPE_SELL)
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+
+# Normalize columns for SMC Analysis (Capitalized)
+RATE_COLUMNS = {
+    'open': 'Open',
+    'high': 'High',
+    'low': 'Low',
+    'close': 'Close',
+    'tick_volume': 'Volume'
+}
+
+
+class BarCache:
+    """
+    Buffer de velas de capacidad fija para un (symbol, timeframe).
+    Guarda los rates crudos de MT5 y solo integra las velas nuevas:
+    la vela en formación se parchea, las cerradas se añaden al final.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buf = None
+        self._start = 0
+        self._end = 0
+        self._frame = None
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def last_time(self):
+        if len(self) == 0:
+            return None
+        return self._buf['time'][self._end - 1]
+
+    def load(self, rates):
+        """
+        Reemplaza el contenido completo (arranque en frío o hueco irrecuperable).
+        """
+        rates = rates[-self.capacity:]
+        # Doble de capacidad: los append no reubican hasta llenar la mitad libre
+        self._buf = np.empty(self.capacity * 2, dtype=rates.dtype)
+        self._buf[:len(rates)] = rates
+        self._start = 0
+        self._end = len(rates)
+        self._frame = None
+
+    def merge(self, rates):
+        """
+        Integra un bloque reciente de rates (ordenado por tiempo).
+        Devuelve False si el bloque no solapa con la última vela cacheada
+        (faltan velas intermedias), sin modificar el buffer.
+        """
+        last_time = self.last_time
+        times = rates['time']
+        if last_time is None or times[0] > last_time:
+            return False
+
+        pos = int(np.searchsorted(times, last_time))
+        patched = pos < len(rates) and times[pos] == last_time
+        if patched:
+            if self._buf[self._end - 1] != rates[pos]:
+                self._buf[self._end - 1] = rates[pos]
+                self._patch_frame(rates[pos])
+            pos += 1
+
+        new_rates = rates[pos:]
+        if len(new_rates):
+            self._append(new_rates)
+        return True
+
+    def _append(self, new_rates):
+        k = len(new_rates)
+        if self._end + k > len(self._buf):
+            # Compactar: movemos la ventana viva al inicio del buffer
+            keep = min(len(self), self.capacity - min(k, self.capacity))
+            self._buf[:keep] = self._buf[self._end - keep:self._end]
+            self._start, self._end = 0, keep
+            new_rates = new_rates[-self.capacity:]
+            k = len(new_rates)
+        self._buf[self._end:self._end + k] = new_rates
+        self._end += k
+        self._start = max(self._start, self._end - self.capacity)
+        self._frame = None
+
+    def _patch_frame(self, rate):
+        if self._frame is None:
+            return
+        for j, name in enumerate(rate.dtype.names[1:]):
+            self._frame.iloc[-1, j] = rate[name]
+
+    def frame(self, n_bars):
+        """
+        DataFrame de las últimas n_bars velas (mismo formato que get_data).
+        Es una copia: _patch_frame escribe la vela en formación en el frame
+        cacheado y no debe cambiar los que ya tienen otros (render, df_ltf).
+        """
+        if self._frame is None:
+            rates = self._buf[self._start:self._end]
+            data = {RATE_COLUMNS.get(name, name): rates[name] for name in rates.dtype.names[1:]}
+            index = pd.DatetimeIndex(pd.to_datetime(rates['time'], unit='s'), name='Time')
+            self._frame = pd.DataFrame(data, index=index)
+        return self._frame.iloc[-n_bars:].copy()
+
 
 class MT5Handler:
     """
@@ -10,11 +133,13 @@ class MT5Handler:
     Gestión de conexión con el broker y órdenes.
     """
 
-    def __init__(self, login=None, password=None, server=None):
+    def __init__(self, login=None, password=None, server=None, store=None):
         self.login = login
         self.password = password
         self.server = server
         self.connected = False
+        self.bar_cache = {} # (symbol, timeframe) -> BarCache
+        self.store = store  # Optional BarStore (local history)
 
     def connect(self):
         """
@@ -46,43 +171,153 @@ class MT5Handler:
     def get_data(self, symbol, timeframe, n_bars=1000):
         """
         Fetches historical data.
+        Usa un cache incremental por (symbol, timeframe): tras la primera
+        descarga solo se piden al terminal las velas nuevas.
+        Con `store`, las velas se persisten en local y sirven de respaldo offline.
         """
         if not self.connected:
             self.connect()
-            
-        # MT5 timeframe mapping (simplified)
-        tf_map = {
-            "M1": mt5.TIMEFRAME_M1,
-            "M5": mt5.TIMEFRAME_M5,
-            "M15": mt5.TIMEFRAME_M15,
-            "H1": mt5.TIMEFRAME_H1,
-            "H4": mt5.TIMEFRAME_H4
-        }
-        
-        rates = mt5.copy_rates_from_pos(symbol, tf_map.get(timeframe, mt5.TIMEFRAME_M15), 0, n_bars)
-        
-        if rates is None:
+        if not self.connected and self.store is not None:
+            return self._read_store(symbol, timeframe, n_bars)
+
+        tf = TIMEFRAMES.get(timeframe, mt5.TIMEFRAME_M15)
+        key = (symbol, timeframe)
+        cache = self.bar_cache.get(key)
+
+        if cache is None or n_bars > cache.capacity:
+            cache = BarCache(n_bars)
+            if not self._seed_from_store(cache, symbol, timeframe, tf):
+                rates = mt5.copy_rates_from_pos(symbol, tf, 0, n_bars)
+                if rates is None or len(rates) == 0:
+                    print(f"No data for {symbol}")
+                    return None
+                cache.load(rates)
+                self.bar_cache[key] = cache
+                self._write_store(symbol, timeframe, rates)
+                return cache.frame(n_bars)
+            self.bar_cache[key] = cache
+
+        # Pedimos solo la cola; si no solapa con lo cacheado ampliamos la ventana
+        count = 2
+        while True:
+            rates = mt5.copy_rates_from_pos(symbol, tf, 0, count)
+            if rates is None or len(rates) == 0:
+                print(f"No data for {symbol}")
+                return None
+            if cache.merge(rates):
+                break
+            if count >= cache.capacity:
+                cache.load(rates)
+                break
+            count = min(count * 8, cache.capacity)
+
+        self._write_store(symbol, timeframe, rates)
+        return cache.frame(n_bars)
+
+    def _seed_from_store(self, cache, symbol, timeframe, tf):
+        """
+        Arranque en frío desde el almacén local (solo si cubre las n velas pedidas).
+        """
+        if self.store is None or self.store.length(symbol, timeframe) < cache.capacity:
+            return False
+        # Una vela del terminal para conocer el formato exacto de los rates
+        probe = mt5.copy_rates_from_pos(symbol, tf, 0, 1)
+        if probe is None or len(probe) == 0:
+            return False
+        arrays = self.store.read_arrays(symbol, timeframe, n_bars=cache.capacity)
+        rates = np.zeros(len(arrays['time']), dtype=probe.dtype)
+        for name in probe.dtype.names:
+            if name in arrays:
+                rates[name] = arrays[name]
+        cache.load(rates)
+        return True
+
+    def _write_store(self, symbol, timeframe, rates):
+        if self.store is None: return
+        try:
+            last_time = self.store.last_time(symbol, timeframe)
+            if last_time is not None and rates['time'][0] - last_time > timeframe_seconds(timeframe):
+                # Cola guardada anterior al bloque (reinicio tras días parado): se rellena el tramo
+                # intermedio desde el terminal; si no lo tiene, el store registra el hueco
+                backfill = mt5.copy_rates_range(symbol, TIMEFRAMES.get(timeframe, mt5.TIMEFRAME_M15),
+                                                int(last_time), int(rates['time'][0]) - 1)
+                if backfill is not None and len(backfill):
+                    self.store.append(symbol, timeframe, backfill)
+            self.store.append(symbol, timeframe, rates)
+        except Exception as e:
+            print(f"[Store] Error saving {symbol} {timeframe}: {e}")
+
+    def _read_store(self, symbol, timeframe, n_bars):
+        df = self.store.read(symbol, timeframe, n_bars=n_bars)
+        if df is None:
             print(f"No data for {symbol}")
             return None
-            
-        df = pd.DataFrame(rates)
-        df['time'] = pd.to_datetime(df['time'], unit='s')
-        
-        # Normalize columns for SMC Analysis (Capitalized)
-        df.rename(columns={
-            'time': 'Time', 
-            'open': 'Open', 
-            'high': 'High', 
-            'low': 'Low', 
-            'close': 'Close', 
-            'tick_volume': 'Volume'
-        }, inplace=True)
-        
-        # Set index to Time for easier manipulation
-        df.set_index('Time', inplace=True)
-        
+        df.rename(columns=RATE_COLUMNS, inplace=True)
+        df.index.name = 'Time'
         return df
 
+    def invalidate_cache(self, symbol=None):
+        """
+        Descarta el cache de velas (de un símbolo o completo).
+        """
+        if symbol is None:
+            self.bar_cache.clear()
+        else:
+            for key in [k for k in self.bar_cache if k[0] == symbol]:
+                del self.bar_cache[key]
+
+    # --- Broker interface (also implemented by replay.ReplayBroker) ---
+
+    def is_connected(self):
+        return mt5.terminal_info() is not None
+
+    def server_time(self, symbol="EURUSD"):
+        """
+        Hora del servidor (epoch segundos) según el último tick de `symbol`.
+        """
+        tick = mt5.symbol_info_tick(symbol)
+        return tick.time if tick else None
+
+    def get_tick(self, symbol):
+        return mt5.symbol_info_tick(symbol)
+
+    def symbol_info(self, symbol):
+        return mt5.symbol_info(symbol)
+
+    def positions(self, symbol=None, ticket=None):
+        if ticket is not None:
+            return mt5.positions_get(ticket=ticket)
+        if symbol is not None:
+            return mt5.positions_get(symbol=symbol)
+        return mt5.positions_get()
+
+    def history_deals(self, date_from, date_to):
+        """
+        Deals del historial de la cuenta entre dos epoch (segundos, hora del servidor).
+        """
+        return mt5.history_deals_get(int(date_from), int(date_to)) or ()
+
+    def calc_margin(self, order_type, symbol, volume, price):
+        action = mt5.ORDER_TYPE_BUY if order_type in ('BUY', ORDER_TYPE_BUY) else mt5.ORDER_TYPE_SELL
+        return mt5.order_calc_margin(action, symbol, volume, price)
+
+    def modify_position(self, ticket, symbol, stop_loss, take_profit):
+        """
+        Cambia SL/TP de una posición abierta. Retorna True si el broker lo acepta.
+        """
+        request = {
+            "action": mt5.TRADE_ACTION_SLTP,
+            "position": ticket,
+            "symbol": symbol,
+            "sl": stop_loss,
+            "tp": take_profit
+        }
+        res = mt5.order_send(request)
+        if res.retcode != mt5.TRADE_RETCODE_DONE:
+            print(f"      [BE] Failed: {res.comment}")
+            return False
+        return True
+
     def place_limit_order(self, symbol, order_type, price, stop_loss, take_profit, volume):
         """
         Places a limit order using raw MT5 logic.
@@ -128,8 +363,11 @@ class MT5Handler:
     def place_market_order(self, symbol, order_type, volume, stop_loss, take_profit):
         """
         Places a Market Order (Instant Execution).
+        order_type: 'BUY' / 'SELL' or mt5.ORDER_TYPE_BUY / mt5.ORDER_TYPE_SELL.
         """
         if not mt5.initialize(): return None
+        if order_type in ('BUY', 'SELL'):
+            order_type = mt5.ORDER_TYPE_BUY if order_type == 'BUY' else mt5.ORDER_TYPE_SELL
         
         tick = mt5.symbol_info_tick(symbol)
         price = tick.ask if order_type == mt5.ORDER_TYPE_BUY else tick.bid
@@ -162,8 +400,11 @@ class ExecutionManager:
     Manages the state of the bot's portfolio:
     - Tracking Primary Entry vs Bursts
     - Managing Risks (SL Moves)
+    Works against any broker with the MT5Handler interface (live or replay).
     """
-    def __init__(self):
+    def __init__(self, bridge=None, journal=None):
+        self.bridge = bridge or MT5Handler()
+        self.journal = journal # TradeJournal (optional): records SL moves
         self.primary_trade = None # Ticket ID
         self.burst_trades = [] # List of Ticket IDs
         self.active_trap = None # ID of the trap we are trading
@@ -173,7 +414,7 @@ class ExecutionManager:
         [Auto-Protection] Move SL to Break Even if price moves 1R in favor.
         """
         # Get active positions for this bot (Magic Number filter recommended if set)
-        positions = mt5.positions_get() # In live, filter by magic or symbol list if needed
+        positions = self.bridge.positions() # In live, filter by magic or symbol list if needed
         if not positions: return
 
         for pos in positions:
@@ -182,7 +423,7 @@ class ExecutionManager:
             
             entry_price = pos.price_open
             current_sl = pos.sl
-            is_buy = pos.type == mt5.ORDER_TYPE_BUY
+            is_buy = pos.type == ORDER_TYPE_BUY
             
             # Dynamic 1R Calculation
             # If we don't know original risk, we estimate it or use 20 pips default
@@ -192,7 +433,7 @@ class ExecutionManager:
             # Using Fixed Threshold for Robustness: 20 Pips Profit triggers BE
             be_trigger = 0.0020 
             
-            tick = mt5.symbol_info_tick(symbol)
+            tick = self.bridge.get_tick(symbol)
             if not tick: continue
             
             current_price = tick.bid if is_buy else tick.ask
@@ -205,16 +446,12 @@ class ExecutionManager:
                 if not at_be:
                     print(f"      [BE] Securing {symbol} (Profit > 20 pips). Moving SL to {entry_price}")
                     
-                    request = {
-                        "action": mt5.TRADE_ACTION_SLTP,
-                        "position": pos.ticket,
-                        "symbol": symbol,
-                        "sl": entry_price, # Move to Entry
-                        "tp": pos.tp
-                    }
-                    res = mt5.order_send(request)
-                    if res.retcode != mt5.TRADE_RETCODE_DONE:
-                        print(f"      [BE] Failed: {res.comment}")
+                    moved = self.bridge.modify_position(pos.ticket, symbol, entry_price, pos.tp) # Move to Entry
+                    if moved and self.journal is not None:
+                        self.journal.record(STOP_MOVE, symbol, 'BUY' if is_buy else 'SELL', entry=entry_price,
+                                            sl=entry_price, tp=pos.tp, size=pos.volume, reason='BREAKEVEN',
+                                            ticket=pos.ticket, previous_sl=current_sl, price=current_price)
+
     def register_primary_entry(self, ticket):
         self.primary_trade = ticket
         print(f"ExecManager: Registered Primary Trade #{ticket}")
@@ -224,9 +461,8 @@ class ExecutionManager:
         print(f"ExecManager: Registered Burst Trade #{ticket}")
         
     def get_open_positions(self):
-        # Wrapper to get actual positions from MT5 (All symbols)
-        if not mt5.initialize(): return []
-        return mt5.positions_get()
+        # Wrapper to get actual positions from the broker (All symbols)
+        return self.bridge.positions() or []
 
     def check_burst_eligibility(self, current_price):
         """
@@ -237,7 +473,7 @@ class ExecutionManager:
             return False
             
         # Get position details
-        positions = mt5.positions_get(ticket=self.primary_trade)
+        positions = self.bridge.positions(ticket=self.primary_trade)
         if not positions:
             print(f"Primary trade {self.primary_trade} not found (closed?). Resetting.")
             self.primary_trade = None
@@ -248,7 +484,7 @@ class ExecutionManager:
         # Check if SL is at Breakeven or better
         # Buy: SL >= PriceOpen
         # Sell: SL <= PriceOpen
-        is_buy = pos.type == mt5.ORDER_TYPE_BUY
+        is_buy = pos.type == ORDER_TYPE_BUY
         
         if is_buy:
             if pos.sl >= pos.price_open: return True
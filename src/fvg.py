@@ -0,0 +1,188 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.trade_engine import RangeExtremes
+from src.timeframes import sync_start
+
+FVG_COLUMNS = ['Time', 'Pos', 'Direction', 'Top', 'Bottom', 'Filled']
+
+
+def detect_fvgs(highs, lows):
+    """
+    Fair Value Gaps de 3 velas en una sola pasada vectorizada.
+    Alcista: low[i] > high[i-2] (hueco = high[i-2]..low[i]).
+    Bajista: high[i] < low[i-2] (hueco = high[i]..low[i-2]).
+    Retorna (pos, direction, top, bottom); pos = índice de la tercera vela.
+    """
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    if len(highs) < 3:
+        empty = np.empty(0)
+        return empty.astype(np.int64), empty.astype(np.int8), empty, empty
+
+    bull = lows[2:] > highs[:-2]
+    bear = ~bull & (highs[2:] < lows[:-2])
+    pos = np.flatnonzero(bull | bear) + 2
+    is_bull = bull[pos - 2]
+    direction = np.where(is_bull, 1, -1).astype(np.int8)
+    top = np.where(is_bull, lows[pos], lows[pos - 2])
+    bottom = np.where(is_bull, highs[pos - 2], highs[pos])
+    return pos, direction, top, bottom
+
+
+def find_fvgs(df, engine=None):
+    """
+    Todos los FVG del DataFrame con la vela en la que se rellenan.
+    Relleno = el precio cruza el borde lejano (alcista: low < Bottom;
+    bajista: high > Top) en una vela posterior. Filled = len(df) si sigue abierto.
+    """
+    pos, direction, top, bottom = detect_fvgs(df['High'].values, df['Low'].values)
+    filled = np.full(len(pos), len(df), dtype=np.int64)
+    if len(pos):
+        engine = engine or RangeExtremes(df['High'].values, df['Low'].values)
+        bull = direction == 1
+        filled[bull] = engine.first_below(pos[bull] + 1, bottom[bull])
+        filled[~bull] = engine.first_above(pos[~bull] + 1, top[~bull])
+
+    return pd.DataFrame({
+        'Time': df.index[pos],
+        'Pos': pos,
+        'Direction': direction,
+        'Top': top,
+        'Bottom': bottom,
+        'Filled': filled
+    }, columns=FVG_COLUMNS)
+
+
+def open_fvgs(df, engine=None):
+    """
+    FVG que siguen sin rellenar al cierre de la última vela del DataFrame.
+    """
+    gaps = find_fvgs(df, engine=engine)
+    return gaps[gaps['Filled'] == len(df)].drop(columns='Filled').reset_index(drop=True)
+
+
+class FVGBook:
+    """
+    Huecos abiertos de un (símbolo, timeframe) en arrays paralelos.
+    Cada vela cerrada nueva retira los que rellena y añade el suyo si lo forma.
+    """
+
+    def __init__(self, max_open=200):
+        self.max_open = max_open
+        self.last_time = None
+        self.count = 0           # Velas cerradas procesadas
+        self._prev = []          # (high, low) de las dos últimas velas
+        self.times = np.empty(0, dtype='datetime64[ns]')
+        self.direction = np.empty(0, dtype=np.int8)
+        self.top = np.empty(0)
+        self.bottom = np.empty(0)
+
+    def seed(self, df):
+        """
+        Reconstruye el libro desde un histórico completo (arranque o hueco de datos).
+        """
+        gaps = open_fvgs(df).tail(self.max_open)
+        self.times = gaps['Time'].values.astype('datetime64[ns]')
+        self.direction = gaps['Direction'].values.astype(np.int8)
+        self.top = gaps['Top'].values.astype(np.float64)
+        self.bottom = gaps['Bottom'].values.astype(np.float64)
+        self.count = len(df)
+        self.last_time = df.index[-1] if len(df) else None
+        self._prev = list(zip(df['High'].values[-2:], df['Low'].values[-2:]))
+
+    def push(self, timestamp, high, low):
+        # 1. Rellenos: solo pueden venir de velas posteriores a la que creó el hueco
+        if len(self.top):
+            filled = ((self.direction == 1) & (low < self.bottom)) | ((self.direction == -1) & (high > self.top))
+            if filled.any():
+                keep = ~filled
+                self.times, self.direction = self.times[keep], self.direction[keep]
+                self.top, self.bottom = self.top[keep], self.bottom[keep]
+
+        # 2. Hueco nuevo contra la vela i-2
+        if len(self._prev) == 2:
+            prev_high, prev_low = self._prev[0]
+            gap = None
+            if low > prev_high:
+                gap = (1, low, prev_high)
+            elif high < prev_low:
+                gap = (-1, prev_low, high)
+            if gap is not None:
+                self.times = np.append(self.times, np.datetime64(pd.Timestamp(timestamp).to_datetime64(), 'ns'))
+                self.direction = np.append(self.direction, np.int8(gap[0]))
+                self.top = np.append(self.top, gap[1])
+                self.bottom = np.append(self.bottom, gap[2])
+                if len(self.top) > self.max_open:
+                    self.times, self.direction = self.times[1:], self.direction[1:]
+                    self.top, self.bottom = self.top[1:], self.bottom[1:]
+
+        self._prev = (self._prev + [(high, low)])[-2:]
+        self.count += 1
+        self.last_time = timestamp
+
+    def frame(self, mask=None):
+        if mask is None:
+            mask = slice(None)
+        return pd.DataFrame({
+            'Time': self.times[mask],
+            'Direction': self.direction[mask],
+            'Top': self.top[mask],
+            'Bottom': self.bottom[mask]
+        })
+
+    def overlapping(self, low, high, direction=None):
+        """
+        Huecos abiertos que se solapan con [low, high] (opcionalmente de una dirección).
+        """
+        mask = (self.bottom <= high) & (self.top >= low)
+        if direction is not None:
+            mask &= self.direction == direction
+        return self.frame(mask)
+
+
+class FVGIndex:
+    """
+    Índice de FVG abiertos por (símbolo, timeframe), actualizado de forma
+    incremental con las velas cerradas nuevas de cada llamada.
+    """
+
+    def __init__(self, max_open=200):
+        self.max_open = max_open
+        self.books = {} # (symbol, timeframe) -> FVGBook
+
+    def update(self, symbol, timeframe, df):
+        """
+        Sincroniza el libro con `df` (todas sus filas se consideran cerradas).
+        """
+        key = (symbol, timeframe)
+        book = self.books.get(key)
+        index = df.index
+        n = len(df)
+
+        start = sync_start(index, book.last_time) if book is not None else None
+        if start is None:
+            # Arranque o hueco en los datos: reconstrucción vectorizada
+            book = FVGBook(self.max_open)
+            book.seed(df)
+            self.books[key] = book
+            return book
+
+        highs = df['High'].values
+        lows = df['Low'].values
+        for i in range(start, n):
+            book.push(index[i], highs[i], lows[i])
+        return book
+
+    def open_gaps(self, symbol, timeframe):
+        book = self.books.get((symbol, timeframe))
+        return book.frame() if book is not None else FVGBook().frame()
+
+    def overlapping(self, symbol, timeframe, low, high, direction=None):
+        book = self.books.get((symbol, timeframe))
+        if book is None:
+            return FVGBook().frame()
+        return book.overlapping(low, high, direction)
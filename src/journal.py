@@ -0,0 +1,212 @@
+import os
+import csv
+import json
+import time
+import queue
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+import pandas as pd
+
+# Tipos de evento del journal
+SIGNAL = 'SIGNAL'         # Señal nueva del analista (antes de filtros)
+FILL = 'FILL'             # Orden ejecutada (con tamaño y ticket)
+SKIP = 'SKIP'             # Señal descartada (reason = filtro que la paró)
+STOP_MOVE = 'STOP_MOVE'   # SL movido sobre una posición abierta
+EVENT_TYPES = (SIGNAL, FILL, SKIP, STOP_MOVE)
+
+COLUMNS = ['ts', 'bot', 'event', 'symbol', 'action', 'entry', 'sl', 'tp', 'size', 'reason', 'ticket', 'details']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id      INTEGER PRIMARY KEY,
+    ts      TEXT NOT NULL,  -- 'YYYY-MM-DD HH:MM:SS' (reloj del bot)
+    bot     TEXT NOT NULL,  -- MT5 / CCXT
+    event   TEXT NOT NULL,  -- SIGNAL / FILL / SKIP / STOP_MOVE
+    symbol  TEXT NOT NULL,
+    action  TEXT,
+    entry   REAL,
+    sl      REAL,
+    tp      REAL,
+    size    REAL,           -- lotes (MT5) o unidades base (CCXT)
+    reason  TEXT,
+    ticket  TEXT,
+    details TEXT            -- JSON con el resto del contexto
+);
+CREATE INDEX IF NOT EXISTS idx_events_symbol_ts ON events (symbol, ts);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+"""
+
+
+def connect(path, timeout=30.0):
+    """
+    Conexión SQLite en modo WAL: lectores y un escritor a la vez sin bloquearse;
+    los escritores de otros procesos esperan hasta `timeout` segundos.
+    """
+    conn = sqlite3.connect(path, timeout=timeout)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class TradeJournal:
+    """
+    Journal de señales, ejecuciones, descartes y movimientos de stop sobre SQLite (WAL).
+
+    record() solo encola; un hilo en segundo plano escribe por lotes de hasta
+    `batch_size` filas en una transacción cada `flush_interval` segundos.
+    Los dos bots (y varios procesos) pueden compartir el mismo fichero: el
+    esquema es único y la columna `bot` distingue el origen.
+    """
+
+    def __init__(self, path, bot, clock=None, batch_size=500, flush_interval=1.0):
+        self.path = path
+        self.bot = bot
+        self.clock = clock or time # Cualquier objeto con time() (replay: SimulatedClock)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.written = 0
+        self.failed = 0
+        self._worker = None
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = connect(path)
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def record(self, event, symbol, action=None, entry=None, sl=None, tp=None, size=None,
+               reason=None, ticket=None, **details):
+        """
+        Encola un evento. Los argumentos extra van a la columna `details` (JSON).
+        """
+        ts = datetime.fromtimestamp(self.clock.time()).strftime('%Y-%m-%d %H:%M:%S')
+        row = (ts, self.bot, event, symbol, action,
+               None if entry is None else float(entry),
+               None if sl is None else float(sl),
+               None if tp is None else float(tp),
+               None if size is None else float(size),
+               reason,
+               None if ticket is None else str(ticket),
+               json.dumps(details, default=str) if details else None)
+        self._ensure_worker()
+        self.queue.put(row)
+
+    def flush(self, timeout=None):
+        """
+        Espera a que todo lo encolado esté escrito. Retorna False si vence el timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=10):
+        """
+        Escribe lo pendiente y detiene el hilo.
+        """
+        if self._worker is None: return True
+        drained = self.flush(timeout)
+        self.queue.put(None)
+        self._worker.join(timeout=1)
+        self._worker = None
+        return drained
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="trade-journal", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        conn = connect(self.path)
+        try:
+            while True:
+                item = self.queue.get()
+                batch = [] if item is None else [item]
+                stop = item is None
+                if item is None:
+                    self.queue.task_done()
+
+                # Agrupa lo que llegue dentro del intervalo (hasta batch_size filas)
+                deadline = time.monotonic() + self.flush_interval
+                while not stop and len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0: break
+                    try:
+                        extra = self.queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if extra is None:
+                        stop = True
+                        self.queue.task_done()
+                        break
+                    batch.append(extra)
+
+                if batch:
+                    try:
+                        self._write(conn, batch)
+                    except Exception as e:
+                        self.failed += len(batch)
+                        print(f"[!] Journal Error: {e}")
+                    finally:
+                        for _ in batch:
+                            self.queue.task_done()
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _write(self, conn, rows):
+        with conn:
+            conn.executemany(f"INSERT INTO events ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+        self.written += len(rows)
+
+    def query(self, symbol=None, day=None, start=None, end=None, event=None, bot=None):
+        """
+        Eventos como DataFrame. `day` ('YYYY-MM-DD') o [start, end) acotan por
+        hora; con `symbol` usa el índice (symbol, ts), sin él el de ts.
+        """
+        if day is not None:
+            start = pd.Timestamp(day).strftime('%Y-%m-%d')
+            end = (pd.Timestamp(day) + timedelta(days=1)).strftime('%Y-%m-%d')
+        clauses, params = [], []
+        for column, op, value in (('symbol', '=', symbol), ('ts', '>=', start), ('ts', '<', end),
+                                  ('event', '=', event), ('bot', '=', bot)):
+            if value is None: continue
+            if column == 'ts':
+                value = pd.Timestamp(value).strftime('%Y-%m-%d %H:%M:%S')
+            clauses.append(f"{column} {op} ?")
+            params.append(value)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM events"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts, id"
+        conn = connect(self.path)
+        try:
+            return pd.read_sql_query(sql, conn, params=params, parse_dates=['ts'])
+        finally:
+            conn.close()
+
+    def import_csv(self, csv_path, bot=None):
+        """
+        Migra un bot_journal.csv antiguo (columna `lots` en MT5, `size` en CCXT)
+        como eventos FILL. Retorna las filas importadas.
+        """
+        with open(csv_path, newline='') as f:
+            rows = [(r['timestamp'], bot or self.bot, FILL, r['symbol'], r['action'],
+                     float(r['entry']), float(r['sl']), float(r['tp']),
+                     float(r.get('lots') or r.get('size') or 0), r['reason'], None, None)
+                    for r in csv.DictReader(f)]
+        conn = connect(self.path)
+        try:
+            self._write(conn, rows)
+        finally:
+            conn.close()
+        return len(rows)
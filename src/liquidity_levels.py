@@ -0,0 +1,196 @@
+import sys
+import os
+import bisect
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.market_structure import MarketStructure
+from src.timeframes import sync_start
+
+# Sesiones (hora del broker), las mismas que sombrea el gráfico de auditoría
+SESSIONS = {'ASIA': (0, 8), 'LONDON': (8, 12), 'NEW_YORK': (13, 17)}
+
+
+class LevelSide:
+    """
+    Niveles de un lado ordenados por precio (listas paralelas + bisect).
+    above=True: liquidez por encima (máximos); False: por debajo (mínimos).
+    """
+
+    def __init__(self, above):
+        self.above = above
+        self.prices = []
+        self.levels = []
+
+    def add(self, level):
+        pos = bisect.bisect_right(self.prices, level['price'])
+        self.prices.insert(pos, level['price'])
+        self.levels.insert(pos, level)
+
+    def take(self, high, low, close):
+        """
+        Retira los niveles que alcanza la mecha. Retorna (barridos, rotos):
+        barridos = la vela cerró de vuelta dentro; rotos = cerró más allá.
+        """
+        if self.above:
+            # Niveles por debajo del high: todos tomados; los > close, barridos
+            end = bisect.bisect_left(self.prices, high)
+            split = bisect.bisect_right(self.prices, close, 0, end)
+            broken, swept = self.levels[:split], self.levels[split:end]
+            del self.prices[:end], self.levels[:end]
+        else:
+            # Niveles por encima del low: todos tomados; los < close, barridos
+            start = bisect.bisect_right(self.prices, low)
+            split = bisect.bisect_left(self.prices, close, start)
+            swept, broken = self.levels[start:split], self.levels[split:]
+            del self.prices[start:], self.levels[start:]
+        return swept, broken
+
+    def prune(self, oldest):
+        keep = [i for i, level in enumerate(self.levels) if level['time'] >= oldest]
+        if len(keep) != len(self.levels):
+            self.prices = [self.prices[i] for i in keep]
+            self.levels = [self.levels[i] for i in keep]
+
+    def __len__(self):
+        return len(self.prices)
+
+
+class LiquidityBook:
+    """
+    Pools de liquidez de un símbolo: máximos sin tocar por encima del precio y
+    mínimos por debajo, etiquetados por origen (PDH/PDL, sesión, swing),
+    timeframe y hora. Cada vela cerrada cuesta O(log n + niveles tomados).
+    """
+
+    def __init__(self, timeframe, max_age=pd.Timedelta(days=5)):
+        self.timeframe = timeframe
+        self.max_age = max_age
+        self.highs = LevelSide(above=True)
+        self.lows = LevelSide(above=False)
+        self.last_time = None
+        self.last_sweeps = ([], [])  # (máximos, mínimos) barridos por la última vela
+        self._day = None      # (fecha, high, low) del día en curso
+        self._session = None  # (nombre, high, low) de la sesión en curso
+
+    def add_level(self, price, side, origin, time, timeframe=None):
+        """
+        Registra un nivel. side: 'HIGH' (liquidez arriba) o 'LOW' (abajo).
+        """
+        level = {'price': price, 'side': side, 'origin': origin,
+                 'timeframe': timeframe or self.timeframe, 'time': time}
+        (self.highs if side == 'HIGH' else self.lows).add(level)
+        return level
+
+    def push(self, timestamp, high, low, close, swings=()):
+        """
+        Procesa una vela cerrada: primero barridos/retiros, después niveles nuevos.
+        swings: (time, kind, price) confirmados en esta vela (del StructureBook).
+        """
+        swept_highs, _ = self.highs.take(high, low, close)
+        swept_lows, _ = self.lows.take(high, low, close)
+        self.last_sweeps = (swept_highs, swept_lows)
+
+        self._roll_day(timestamp, high, low)
+        self._roll_session(timestamp, high, low)
+
+        # Swings confirmados (fractales de Williams) como liquidez interna
+        for swing_time, kind, price in swings:
+            self._add_untaken(price, kind, 'SWING', swing_time, high, low)
+
+        self.last_time = timestamp
+        return self.last_sweeps
+
+    def _add_untaken(self, price, side, origin, time, high, low):
+        # Un nivel ya superado por la vela actual no es liquidez pendiente
+        if (side == 'HIGH' and price > high) or (side == 'LOW' and price < low):
+            self.add_level(price, side, origin, time)
+
+    def _roll_day(self, timestamp, high, low):
+        day = timestamp.date()
+        if self._day is None or self._day[0] != day:
+            if self._day is not None:
+                # Cierre de día: PDH / PDL y limpieza de niveles viejos
+                self._add_untaken(self._day[1], 'HIGH', 'PDH', timestamp, high, low)
+                self._add_untaken(self._day[2], 'LOW', 'PDL', timestamp, high, low)
+                oldest = timestamp - self.max_age
+                self.highs.prune(oldest)
+                self.lows.prune(oldest)
+            self._day = (day, high, low)
+        else:
+            self._day = (day, max(self._day[1], high), min(self._day[2], low))
+
+    def _roll_session(self, timestamp, high, low):
+        name = next((name for name, (start, end) in SESSIONS.items() if start <= timestamp.hour < end), None)
+        current = self._session
+        if current is not None and current[0] != name:
+            self._add_untaken(current[1], 'HIGH', f"{current[0]}_HIGH", timestamp, high, low)
+            self._add_untaken(current[2], 'LOW', f"{current[0]}_LOW", timestamp, high, low)
+            current = None
+        if name is None:
+            self._session = None
+        elif current is None:
+            self._session = (name, high, low)
+        else:
+            self._session = (name, max(current[1], high), min(current[2], low))
+
+    def nearest(self, price):
+        """
+        Nivel pendiente más cercano por encima y por debajo de `price` (o None).
+        """
+        up = bisect.bisect_right(self.highs.prices, price)
+        down = bisect.bisect_left(self.lows.prices, price)
+        above = self.highs.levels[up] if up < len(self.highs) else None
+        below = self.lows.levels[down - 1] if down > 0 else None
+        return above, below
+
+    def frame(self):
+        return pd.DataFrame(self.lows.levels + self.highs.levels,
+                            columns=['price', 'side', 'origin', 'timeframe', 'time'])
+
+
+class LiquidityIndex:
+    """
+    Libros de liquidez por (símbolo, timeframe), actualizados solo con las
+    velas cerradas nuevas de cada llamada. Los swings salen del motor de
+    estructura (`structure`, p. ej. el de SMCAnalyst): no se calculan dos veces.
+    """
+
+    def __init__(self, max_age=pd.Timedelta(days=5), fractal=2, structure=None):
+        self.max_age = max_age
+        self.structure = structure or MarketStructure(n=fractal)
+        self.books = {} # (symbol, timeframe) -> LiquidityBook
+
+    def update(self, symbol, timeframe, df):
+        """
+        Sincroniza con `df` (todas sus filas cerradas). Retorna el libro;
+        book.last_sweeps = niveles barridos por la última vela procesada.
+        """
+        key = (symbol, timeframe)
+        book = self.books.get(key)
+        index = df.index
+        n_bars = len(df)
+
+        start = sync_start(index, book.last_time) if book is not None else None
+        if start is None:
+            # Arranque o hueco en los datos: se reconstruye con el histórico disponible
+            book = LiquidityBook(timeframe, self.max_age)
+            self.books[key] = book
+            start = 0
+        if start == n_bars:
+            return book
+
+        # Un fractal se confirma n velas después de su vela central
+        structure, _ = self.structure.update(symbol, timeframe, df)
+        n = self.structure.n
+        oldest = index[max(0, start - n)]
+        confirmed = {}
+        for swing in reversed(structure.swings):
+            if swing[0] < oldest: break
+            confirmed.setdefault(swing[0], []).append(swing)
+
+        highs, lows, closes = df['High'].values, df['Low'].values, df['Close'].values
+        for i in range(start, n_bars):
+            swings = confirmed.get(index[i - n], ()) if i >= n else ()
+            book.push(index[i], highs[i], lows[i], closes[i], swings)
+        return book
@@ -1,48 +1,66 @@
 import sys
-import time
 import os
 # Add parent dir to sys path to locate config and src if run from src
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-# --- Helper for Journaling ---
-import csv
-import os
-
-def log_trade_to_csv(trade_data):
-    file_exists = os.path.isfile('bot_journal.csv')
-    try:
-        with open('bot_journal.csv', 'a', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=[
-                'timestamp', 'symbol', 'action', 'entry', 'sl', 'tp', 'lots', 'reason'
-            ])
-            if not file_exists:
-                writer.writeheader()
-            writer.writerow(trade_data)
-    except Exception as e:
-        print(f"[!] Journal Error: {e}")
-
 from datetime import datetime
-import MetaTrader5 as mt5
+import pandas as pd
 
 from config import settings
 from src.smc_analyst import SMCAnalyst
 from src.execution_bridge import MT5Handler, ExecutionManager
+from src.bar_store import BarStore
 from src.risk_guardian import RiskGuardian
+from src.symbol_specs import SymbolSpecRegistry
+from src.trend_bias import TrendBias
+from src.bar_aggregator import BarAggregator
+from src.timeframes import bar_open_time
+from src.scheduler import BarCloseScheduler, AnalysisMemo, SystemClock
 from src.notifications import TelegramNotifier
+from src.render_service import RenderService
+from src.journal import TradeJournal, SIGNAL, FILL, SKIP
+from src.metrics import Metrics
 
-def main():
+def main(bridge=None, clock=None, notifier=None, symbols=None, charts=True, journal=None, metrics=None):
+    """
+    Live loop. Every dependency can be injected: `bridge` is any broker with the
+    MT5Handler interface and `clock` any object with time()/sleep(), so the same
+    loop runs against a replay feed (see src/replay.py). `journal` is a TradeJournal
+    (default: settings.JOURNAL_PATH). `metrics` collects per-stage latencies; when
+    not injected it is created and served on settings.METRICS_PORT.
+    """
     print("Starting Antigravity Fusion Bot...")
     
     # 1. Initialize Components
-    guardian = RiskGuardian()
-    bridge = MT5Handler(login=settings.MT5_LOGIN, password=settings.MT5_PASSWORD, server=settings.MT5_SERVER)
-    analyst = SMCAnalyst(swing_lookback=settings.SWING_LOOKBACK) 
-    exec_manager = ExecutionManager()
-    notifier = TelegramNotifier(token=settings.TELEGRAM_TOKEN, chat_id=settings.TELEGRAM_CHAT_ID) # Alert System
+    if bridge is None:
+        bridge = MT5Handler(login=settings.MT5_LOGIN, password=settings.MT5_PASSWORD, server=settings.MT5_SERVER,
+                            store=BarStore(settings.BAR_STORE_DIR))
+    clock = clock or SystemClock()
+    symbols = symbols or settings.SYMBOLS
+    specs = SymbolSpecRegistry(bridge, symbols, ttl=settings.SYMBOL_SPEC_TTL_SECONDS, clock=clock) # Contract specs, cached
+    guardian = RiskGuardian(broker=bridge, specs=specs)
+    analyst = SMCAnalyst(swing_lookback=settings.SWING_LOOKBACK, streaming=True) 
+    trend = TrendBias(settings.TIMEFRAME_HTF) # HTF EMA 50/200 bias per symbol
+    aggregator = BarAggregator(settings.TIMEFRAME_LTF, [settings.TIMEFRAME_HTF]) # HTF bars built from LTF
 
     if not bridge.connect():
         print("Failed to connect to MT5. Exiting...")
         return
+
+    # Background workers (threads / render process): only once connected, always closed in `finally`
+    metrics_server = None
+    if metrics is None:
+        metrics = Metrics() # Per-stage latency histograms + counters
+        if settings.METRICS_PORT:
+            metrics_server = metrics.serve(settings.METRICS_PORT, settings.METRICS_HOST)
+    journal = journal or TradeJournal(settings.JOURNAL_PATH, bot='MT5', clock=clock) # Signals, fills, skips, SL moves
+    exec_manager = ExecutionManager(bridge, journal=journal)
+    if notifier is None:
+        notifier = TelegramNotifier(token=settings.TELEGRAM_TOKEN, chat_id=settings.TELEGRAM_CHAT_ID,
+                                    metrics=metrics) # Alert System
+    # Audit charts are rendered in a worker process, off the trading loop
+    renderer = RenderService(max_workers=settings.RENDER_WORKERS, max_pending=settings.RENDER_MAX_PENDING,
+                             metrics=metrics) if charts else None
     
     # Send Startup Alert
     notifier.send_alert(f"🤖 Antigravity Bot STARTED\nRisk: {settings.RISK_PER_TRADE*100}%\nMode: {settings.PROJECT_NAME}")
@@ -50,13 +68,27 @@ def main():
     print("Connected to MT5 Terminal")
     print("All systems GREEN. Entering main loop...")
     
+    # Bar-close scheduling: the analysis pipeline wakes right after each LTF close,
+    # trailing stops and risk checks run every few seconds in between.
+    scheduler = BarCloseScheduler(settings.TIMEFRAME_LTF,
+                                  settle_delay=settings.BAR_SETTLE_SECONDS,
+                                  duty_interval=settings.DUTY_INTERVAL_SECONDS,
+                                  clock=clock)
+    analysis_memo = AnalysisMemo() # (symbol, closed bar time) -> analysis result
+    pending_symbols = set()
+    bar_close_time = None
+    
+    # Memory to prevent duplicate trades on same candle
+    processed_signals = {}
+    processed_logs = {}
+    
     try:
         while True:
             # Check Connection
-            if not mt5.terminal_info():
+            if not bridge.is_connected():
                 print("MT5 Disconnected. Attempting reconnect...")
                 bridge.connect()
-                time.sleep(5)
+                clock.sleep(5)
                 continue
             
             # --- AUTO-PROTECTION (TRAILING STOP) ---
@@ -70,12 +102,29 @@ def main():
             # Check Risk Guardian GLOBAL
             if not guardian.can_trade():
                 print(f"Risk Guardian has blocked trading. Current PnL: {guardian.current_daily_loss:.2f}%")
-                time.sleep(300)
+                clock.sleep(300)
                 continue
             
-            # Check Killzones
             # We use MT5 Symbol Info to get current server time for one symbol
-            time_struct = mt5.symbol_info_tick("EURUSD").time
+            time_struct = bridge.server_time()
+            if time_struct is None:
+                clock.sleep(5)
+                continue
+            scheduler.sync(time_struct)
+            
+            # New LTF bar closed? -> every symbol is due for analysis
+            boundary = scheduler.poll()
+            if boundary is not None:
+                bar_close_time = pd.Timestamp(boundary, unit='s')
+                pending_symbols = set(symbols)
+                metrics.set('last_bar_close_timestamp', boundary)
+            
+            if not pending_symbols:
+                print(f". Waiting for {settings.TIMEFRAME_LTF} close... {datetime.now().strftime('%H:%M:%S')}", end='\r')
+                scheduler.sleep()
+                continue
+            
+            # Check Killzones
             server_time = datetime.fromtimestamp(time_struct)
             current_hour = server_time.hour
             
@@ -83,60 +132,61 @@ def main():
             
             if not in_killzone:
                 print(f". [Zzz] Outside Killzone (Date: {server_time}). Waiting...", end='\r')
-                time.sleep(60)
+                pending_symbols.clear()
+                scheduler.sleep()
                 continue
 
             # --- MULTI-ASSET SCANNING LOOP ---
-            # Memory to prevent duplicate trades on same candle
-            if 'processed_signals' not in locals(): processed_signals = {}
-            if 'processed_logs' not in locals(): processed_logs = {}
-            
-            for symbol in settings.SYMBOLS:
+            # scan_seconds{symbol}: whole pass per symbol (data -> analysis -> order)
+            for symbol in metrics.timed('scan_seconds', [s for s in symbols if s in pending_symbols], 'symbol'):
+                if symbol not in pending_symbols: continue
+                
                 # 2. Data Ingestion
                 # Fetch LTF (Execution)
-                df_ltf = bridge.get_data(symbol, settings.TIMEFRAME_LTF, n_bars=500)
+                with metrics.timer('get_data'):
+                    df_ltf = bridge.get_data(symbol, settings.TIMEFRAME_LTF, n_bars=500)
                 
-                # Fetch HTF (Structure) - Increased to 300 for 200 EMA
-                df_htf = bridge.get_data(symbol, settings.TIMEFRAME_HTF, n_bars=300)
+                if df_ltf is None or len(df_ltf) < 2: continue
                 
-                if df_ltf is None or df_ltf.empty: continue
+                # The broker opens the new bar on its first tick: retry on the next duty pass
+                if df_ltf.index[-1] < bar_close_time: continue
+                pending_symbols.discard(symbol)
+                
+                # Closed-bar analysis: the last row is the bar that just opened
+                df_closed = df_ltf.iloc[:-1]
+                bar_time = df_closed.index[-1]
                 
                 # Determine HTF Trend (EMA 50 & EMA 200)
-                trend_bias = 0
-                if df_htf is not None and not df_htf.empty:
-                    close_htf = df_htf['Close']
-                    if len(close_htf) > 200:
-                        ema_50 = close_htf.ewm(span=50, adjust=False).mean().iloc[-1]
-                        ema_200 = close_htf.ewm(span=200, adjust=False).mean().iloc[-1]
-                        last_close = close_htf.iloc[-1]
-                        
-                        # Strong Trend Layout
-                        if last_close > ema_50 and last_close > ema_200: 
-                            trend_bias = 1   # BUY ONLY (Strong Bull)
-                        elif last_close < ema_50 and last_close < ema_200:
-                            trend_bias = -1  # SELL ONLY (Strong Bear)
-                        else:
-                            # Mixed Trend - Be careful or Neutral
-                            # For safety in recovery mode, we prefer to stay out or follow EMA 200
-                            if last_close > ema_200: trend_bias = 1
-                            else: trend_bias = -1
-                        
-                        # print(f"      [Structure] {symbol} {settings.TIMEFRAME_HTF} Trend: {'BULL' if trend_bias==1 else 'BEAR'}")
-
-                        # print(f"      [Structure] {symbol} {settings.TIMEFRAME_HTF} Trend: {'BULL' if trend_bias==1 else 'BEAR'}")
+                # Incremental state: HTF bars are aggregated from the LTF stream,
+                # the native HTF history (300 bars) is only fetched to (re)seed a symbol.
+                with metrics.timer('trend'):
+                    htf_bars = aggregator.update(symbol, df_closed)
+                    if htf_bars is None or symbol not in trend.states:
+                        df_htf = bridge.get_data(symbol, settings.TIMEFRAME_HTF, n_bars=trend.window)
+                        if df_htf is not None and not df_htf.empty:
+                            forming = bar_open_time(bar_time, settings.TIMEFRAME_HTF)
+                            trend.seed(symbol, df_htf['Close'], forming_time=forming)
+                            aggregator.seed(symbol, df_closed) # Only the forming HTF bar is needed
+                    else:
+                        trend.advance(symbol, htf_bars[settings.TIMEFRAME_HTF])
+                    trend_bias = trend.bias(symbol, df_closed['Close'].iloc[-1])
 
-                # Get Symbol Info for Point Value (Correct JPY support)
-                symbol_info = mt5.symbol_info(symbol)
-                point_val = symbol_info.point if symbol_info else 0.0001
+                # Point Value from the cached specs (Correct JPY support)
+                point_val = specs.point(symbol)
 
-                # Run the full analysis pipeline with Trend Filter
-                analysis_result = analyst.analyze(df_ltf, trend_bias=trend_bias, point=point_val)
+                # Run the full analysis pipeline with Trend Filter (once per closed bar)
+                analysis_result = analysis_memo.get(symbol, bar_time)
+                if analysis_result is None:
+                    with metrics.timer('analyze'):
+                        analysis_result = analyst.analyze(df_closed, trend_bias=trend_bias, point=point_val, symbol=symbol,
+                                                          timeframe=settings.TIMEFRAME_LTF)
+                    analysis_memo.put(symbol, bar_time, analysis_result)
                 
                 trap = analysis_result['trap_zone']
                 signal = analysis_result['signal']
                 
                 # --- [VERBOSE] Heartbeat Status ---
-                last_time = df_ltf.index[-1]
+                last_time = bar_time
                 # Check against processed_logs, NOT processed_signals
                 if last_time != processed_logs.get(symbol):
                     # Si 'trap' existe, muestra los niveles de liquidez
@@ -148,8 +198,16 @@ def main():
                     else:
                         status_msg = "[Initializing]"
 
-                    current_price = df_ltf['Close'].iloc[-1]
-                    print(f"[{symbol} @ {current_price:.5f}] Status: {status_msg} | Bias: {trend_bias}")
+                    current_price = df_closed['Close'].iloc[-1]
+                    fvgs = analysis_result.get('fvgs')
+                    n_fvgs = len(fvgs) if fvgs is not None else 0
+                    structure = analysis_result.get('structure') or {}
+                    liquidity = analysis_result.get('liquidity') or {}
+                    print(f"[{symbol} @ {current_price:.5f}] Status: {status_msg} | Bias: {trend_bias} | "
+                          f"Structure: {structure.get('trend', 0)} | Open FVGs: {n_fvgs} | "
+                          f"Liq. pools: {liquidity.get('levels', 0)}")
+                    for level in liquidity.get('swept_highs', []) + liquidity.get('swept_lows', []):
+                        print(f"      [Liquidity] {symbol} swept {level['origin']} {level['price']:.5f}")
                     sys.stdout.flush()
                     
                     # Update log state
@@ -171,16 +229,20 @@ def main():
                     if symbol in processed_signals and processed_signals[symbol] == signal_time:
                         # Already traded this signal on this bar
                         continue
+                    metrics.inc('signals_total', symbol=symbol)
+                    journal.record(SIGNAL, symbol, signal['action'], entry=signal['price'], sl=signal['sl'],
+                                   reason=signal['reason'], bias=trend_bias)
                         
                     # Filter 2: Anti-Hedging
-                    positions = mt5.positions_get(symbol=symbol)
+                    positions = bridge.positions(symbol=symbol)
                     if positions:
                          # Simple check: if ANY position exists, skip. Keep it simple.
+                         journal.record(SKIP, symbol, signal['action'], reason='OPEN_POSITION', positions=len(positions))
                          processed_signals[symbol] = signal_time
                          continue
 
                     # Filter 3: Slippage Guard (New!)
-                    tick = mt5.symbol_info_tick(symbol)
+                    tick = bridge.get_tick(symbol)
                     if not tick: continue
                     
                     current_market_price = tick.ask if signal['action'] == 'BUY' else tick.bid
@@ -192,6 +254,8 @@ def main():
                     
                     if price_diff > max_allowed_slippage:
                          print(f"      [Shield] Slippage Too High. Skip.")
+                         journal.record(SKIP, symbol, signal['action'], entry=entry_price, reason='SLIPPAGE',
+                                        market_price=current_market_price, max_slippage=max_allowed_slippage)
                          # We don't mark as processed effectively, allowing retry if price comes back?
                          # Or safer to skip this candle entirely? Let's skip.
                          processed_signals[symbol] = signal_time
@@ -207,8 +271,10 @@ def main():
                     # Updated for multi-asset support (Gold/Indices)
                     tp_price = entry_price + (abs(entry_price - sl_price) * settings.RISK_REWARD_RATIO) if signal['action'] == 'BUY' else entry_price - (abs(entry_price - sl_price) * settings.RISK_REWARD_RATIO)
                     
-                    balance = bridge.get_account_info().balance
-                    lot_size = guardian.calculate_lot_size(symbol, entry_price, sl_price, settings.RISK_PER_TRADE, balance)
+                    account_info = bridge.get_account_info()
+                    with metrics.timer('lot_size'):
+                        lot_size = guardian.calculate_lot_size(symbol, entry_price, sl_price, settings.RISK_PER_TRADE,
+                                                               account_info.balance, margin_free=account_info.margin_free)
                     
                     # Debug Info
                     print(f"      Calculated Lot Size: {lot_size}")
@@ -218,33 +284,24 @@ def main():
                         print(f"      [>>>] PLACING LIVE ORDER ({lot_size} lots)...")
                         
                         # Send Order
-                        action_type = mt5.ORDER_TYPE_BUY if signal['action'] == 'BUY' else mt5.ORDER_TYPE_SELL
-                        
                         # Since we are reacting to a completed candle Close, we use Market Order or aggressive Limit
                         # For simplicity and guarantee fill on sweep reclaim: Market Order
-                        res = bridge.place_market_order(symbol, action_type, lot_size, sl_price, tp_price)
+                        with metrics.timer('order_send'):
+                            res = bridge.place_market_order(symbol, signal['action'], lot_size, sl_price, tp_price)
+                        metrics.inc('orders_total', result='filled' if res else 'failed')
                         
                         if res: 
+                            metrics.observe('bar_close_to_order_seconds', scheduler.server_now() - bar_close_time.timestamp())
                             exec_manager.register_primary_entry(res.order)
                             print(f"      [V] ORDER FILLED! Ticket: {res.order}")
                             
-                            # Log to Journal (CSV)
-                            log_data = {
-                                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                'symbol': symbol,
-                                'action': signal['action'],
-                                'entry': entry_price,
-                                'sl': sl_price,
-                                'tp': tp_price,
-                                'lots': lot_size,
-                                'reason': signal['reason']
-                            }
-                            log_trade_to_csv(log_data)
+                            journal.record(FILL, symbol, signal['action'], entry=entry_price, sl=sl_price, tp=tp_price,
+                                           size=lot_size, reason=signal['reason'], ticket=res.order,
+                                           fill_price=getattr(res, 'price', None), balance=account_info.balance,
+                                           risk=settings.RISK_PER_TRADE)
                             
                             # TELEGRAM ALERT (SPECTACULAR VISUALS)
                             try:
-                                from src.visual_backtest import draw_spectacular_trade
-                                
                                 # Extract REAL Liquidity Levels seen by Analyst
                                 real_liq_high = trap['high_liq'] if trap else 0.0
                                 real_liq_low = trap['low_liq'] if trap else 0.0
@@ -262,9 +319,6 @@ def main():
                                     'real_liq_low': real_liq_low    # <--- DATA REAL
                                 }
                                 
-                                chart_name = f"AUDIT_{symbol}_{res.order}_{datetime.now().strftime('%H%M%S')}.png"
-                                draw_spectacular_trade(df_ltf, trade_info, output_file=chart_name)
-                                
                                 # Send Rich Message
                                 msg = (
                                     f"🎯 **SMC EXECUTION**\n\n"
@@ -277,23 +331,35 @@ def main():
                                     f"🧠 **Logic:** {signal['reason']}"
                                 )
                                 
-                                notifier.send_alert(msg, image_path=chart_name)
-                                
-                                # Clean up
-                                if os.path.exists(chart_name): os.remove(chart_name)
+                                # Chart arrives later from the render pool (text-only if dropped/failed)
+                                deliver = lambda png, msg=msg: notifier.send_alert(msg, image_bytes=png)
+                                if renderer is None or not renderer.submit(df_closed, trade_info, deliver):
+                                    notifier.send_alert(msg)
                                 
                             except Exception as e:
                                 print(f"      [!] Alert Error: {e}")
                         else:
                             print("      [X] Order Failed")
+                            journal.record(SKIP, symbol, signal['action'], entry=entry_price, sl=sl_price, tp=tp_price,
+                                           size=lot_size, reason='ORDER_FAILED')
+                    else:
+                        # Sizing rejected the trade (risk / margin / volume limits)
+                        journal.record(SKIP, symbol, signal['action'], entry=entry_price, sl=sl_price, tp=tp_price,
+                                       size=lot_size, reason='ZERO_SIZE', balance=account_info.balance,
+                                       margin_free=account_info.margin_free, risk=settings.RISK_PER_TRADE)
                         
                     processed_signals[symbol] = signal_time # Mark as processed
             
-            print(f". Scanning {len(settings.SYMBOLS)} assets... {datetime.now().strftime('%H:%M:%S')}", end='\r')
-            time.sleep(10) # Scan every 10s
+            print(f". Scanned {len(symbols) - len(pending_symbols)}/{len(symbols)} assets... {datetime.now().strftime('%H:%M:%S')}", end='\r')
+            scheduler.sleep() # Next duty pass or next bar close
             
     except KeyboardInterrupt:
         print("Shutdown signal received.")
+    finally:
+        if renderer: renderer.close()
+        notifier.close() # Deliver queued alerts
+        journal.close() # Write buffered journal events
+        if metrics_server: metrics_server.close()
         bridge.shutdown()
 
 if __name__ == "__main__":
@@ -1,8 +1,5 @@
 import sys
-import time
 import os
-import csv
-from datetime import datetime
 import ccxt
 import pandas as pd
 import numpy as np
@@ -11,20 +8,13 @@ import numpy as np
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from config import settings_ccxt as settings
-
-# --- Helper for Journaling ---
-def log_trade_to_csv(trade_data):
-    file_exists = os.path.isfile('bot_journal.csv')
-    try:
-        with open('bot_journal.csv', 'a', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=[
-                'timestamp', 'symbol', 'action', 'entry', 'sl', 'tp', 'size', 'reason'
-            ])
-            if not file_exists:
-                writer.writeheader()
-            writer.writerow(trade_data)
-    except Exception as e:
-        print(f"[!] Journal Error: {e}")
+from src.trend_bias import TrendBias
+from src.bar_aggregator import BarAggregator
+from src.scheduler import SystemClock, BarCloseScheduler, AnalysisMemo
+from src.bar_store import BarStore
+from src.timeframes import timeframe_seconds, bar_open_time
+from src.journal import TradeJournal, SIGNAL, FILL, SKIP
+from src.metrics import Metrics
 
 # --- Simple SMC Analyst (Lightweight version) ---
 class SimpleSMCAnalyst:
@@ -132,15 +122,31 @@ class RiskGuardian:
 
 # --- Main Bot ---
 class CCXTSMCBot:
-    def __init__(self):
-        self.exchange = self.init_exchange()
+    def __init__(self, exchange=None, symbols=None, journal=None, metrics=None, clock=None, store=None):
+        # Every dependency can be injected: the same loop runs against a replay exchange (see src/replay.py)
+        self.exchange = exchange or self.init_exchange()
+        self.symbols = list(symbols or settings.SYMBOLS)
+        self.clock = clock or SystemClock() # Anything with time()/sleep() (replay: SimulatedClock)
+        self.store = store or BarStore(settings.BAR_STORE_DIR) # Local OHLCV history
+        self.journal = journal or TradeJournal(settings.JOURNAL_PATH, bot='CCXT', clock=self.clock) # Signals, fills, skips
+        self.serve_metrics = metrics is None # Injected metrics are not served on METRICS_PORT
+        self.metrics = metrics or Metrics() # Per-stage latencies (served on METRICS_PORT by run())
         self.guardian = RiskGuardian()
         self.analyst = SimpleSMCAnalyst(swing_lookback=settings.SWING_LOOKBACK)
+        self.trend = TrendBias(settings.TIMEFRAME_HTF, neutral_on_mixed=True)
+        self.aggregator = BarAggregator(settings.TIMEFRAME_LTF, [settings.TIMEFRAME_HTF]) # HTF from the LTF stream
+        self.scheduler = BarCloseScheduler(settings.TIMEFRAME_LTF,
+                                           settle_delay=settings.BAR_SETTLE_SECONDS,
+                                           duty_interval=settings.DUTY_INTERVAL_SECONDS,
+                                           clock=self.clock)
+        self.analysis_memo = AnalysisMemo()
+        self.pending_symbols = set()
+        self.bar_close_time = None
         self.processed_signals = {}
         self.processed_logs = {}
         
         print(f"✅ Bot iniciado con {settings.EXCHANGE_NAME}")
-        print(f"💰 Símbolos: {', '.join(settings.SYMBOLS)}")
+        print(f"💰 Símbolos: {', '.join(self.symbols)}")
         print(f"⚡ Timeframe: {settings.TIMEFRAME_LTF} / {settings.TIMEFRAME_HTF}")
     
     def init_exchange(self):
@@ -162,24 +168,75 @@ class CCXTSMCBot:
     def get_balance(self):
         """Get account balance"""
         try:
-            balance = self.exchange.fetch_balance()
-            return balance['USDT']['free'] if 'USDT' in balance else 0
+            return self.free_usdt(self.exchange.fetch_balance())
         except Exception as e:
             print(f"[!] Error fetching balance: {e}")
             return 0
     
+    @staticmethod
+    def free_usdt(balance):
+        return balance['USDT']['free'] if balance and 'USDT' in balance else 0
+    
     def get_ohlcv(self, symbol, timeframe, limit=500):
-        """Fetch OHLCV data"""
+        """Fetch OHLCV data (incremental when the local bar store covers the window)"""
         try:
-            ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('timestamp', inplace=True)
-            return df
+            since = self.ohlcv_since(symbol, timeframe, limit)
+            if since is not None or limit > settings.OHLCV_PAGE_LIMIT:
+                ohlcv = self.fetch_ohlcv_pages(symbol, timeframe, limit, since)
+            else:
+                ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+            return self.ohlcv_frame(symbol, timeframe, ohlcv, limit)
         except Exception as e:
             print(f"[!] Error fetching {symbol} data: {e}")
             return None
     
+    def fetch_ohlcv_pages(self, symbol, timeframe, limit, since=None):
+        """Candles from `since` (default: the last `limit`) in pages of OHLCV_PAGE_LIMIT (exchanges cap each call)"""
+        candles = []
+        if since is None:
+            since = self.history_since(timeframe, limit)
+        while since is not None:
+            page = self.exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=settings.OHLCV_PAGE_LIMIT)
+            since = self.next_page(candles, page, timeframe)
+        return candles
+    
+    def history_since(self, timeframe, limit):
+        return self.exchange.milliseconds() - limit * timeframe_seconds(timeframe) * 1000
+    
+    @staticmethod
+    def next_page(candles, page, timeframe):
+        """Appends the new candles of `page`; returns the next `since` or None when done"""
+        last_time = candles[-1][0] if candles else None
+        fresh = [candle for candle in page or [] if last_time is None or candle[0] > last_time]
+        candles.extend(fresh)
+        if not fresh or len(page) < settings.OHLCV_PAGE_LIMIT:
+            return None
+        return fresh[-1][0] + timeframe_seconds(timeframe) * 1000
+    
+    def ohlcv_since(self, symbol, timeframe, limit):
+        """
+        `since` (ms) for an incremental fetch, or None for a full `limit` fetch.
+        A stale store is backfilled from its tail (paged), never left with a hole.
+        """
+        if self.store is None or self.store.length(symbol, timeframe) < limit:
+            return None
+        return self.store.last_time(symbol, timeframe) * 1000
+    
+    def ohlcv_frame(self, symbol, timeframe, ohlcv, limit):
+        """Raw CCXT candles -> DataFrame (merged through the bar store)"""
+        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        df.set_index('timestamp', inplace=True)
+        
+        if self.store is not None:
+            self.store.append_frame(symbol, timeframe, df)
+            stored = self.store.read(symbol, timeframe, n_bars=limit)
+            # The store is append-only: history older than its head is served as downloaded
+            if len(stored) >= min(limit, len(df)):
+                df = stored
+                df.index.name = 'timestamp'
+        return df
+    
     def place_order(self, symbol, side, amount, price, sl_price, tp_price):
         """Place market order with SL/TP"""
         try:
@@ -203,131 +260,217 @@ class CCXTSMCBot:
             print(f"❌ Order failed: {e}")
             return None
     
-    def has_open_position(self, symbol):
-        """Check if we have open position for symbol"""
+    def has_open_position(self, symbol, balance=None):
+        """Check if we have open position for symbol (reuses `balance` if already fetched)"""
         try:
             # For spot: check if we have base currency balance
             base = symbol.split('/')[0]
-            balance = self.exchange.fetch_balance()
+            if balance is None:
+                balance = self.exchange.fetch_balance()
             return balance.get(base, {}).get('free', 0) > 0
         except:
             return False
     
+    def closed_bars(self, symbol, df_ltf):
+        """
+        Velas cerradas listas para analizar, o None si la vela nueva aún no está publicada.
+        """
+        if df_ltf is None or len(df_ltf) < 2:
+            return None
+        
+        # New candle not published yet: retry on the next pass
+        if df_ltf.index[-1] < self.bar_close_time:
+            return None
+        self.pending_symbols.discard(symbol)
+        
+        # Closed-bar analysis: the last row is the candle that just opened
+        return df_ltf.iloc[:-1]
+    
+    def advance_trend(self, symbol, df_closed):
+        """
+        Avanza el sesgo HTF con las velas agregadas desde el LTF.
+        Retorna False si el símbolo hay que sembrarlo (sin estado o hueco en los datos).
+        """
+        htf_bars = self.aggregator.update(symbol, df_closed)
+        if htf_bars is None or symbol not in self.trend.states:
+            return False
+        self.trend.advance(symbol, htf_bars[settings.TIMEFRAME_HTF], close_col='close')
+        return True
+    
+    def seed_trend(self, symbol, df_htf, df_closed):
+        """
+        Siembra el sesgo con una sola petición HTF nativa (mismas aperturas que
+        bar_open_time) y el agregador con las velas LTF ya descargadas: solo
+        necesita la vela HTF en formación.
+        """
+        if df_htf is None or df_htf.empty:
+            return False
+        forming = bar_open_time(df_closed.index[-1], settings.TIMEFRAME_HTF)
+        self.trend.seed(symbol, df_htf['close'], forming_time=forming)
+        self.aggregator.seed(symbol, df_closed)
+        return True
+    
+    def evaluate_symbol(self, symbol, df_closed, balance, account=None):
+        """
+        Sesgo + análisis (memoizado por vela) + filtros. Retorna el plan de orden o None.
+        account: balance completo ya descargado (evita otra llamada a fetch_balance).
+        """
+        bar_time = df_closed.index[-1]
+        trend_bias = self.trend.bias(symbol, df_closed['close'].iloc[-1])
+        
+        # Analyze (once per closed candle)
+        result = self.analysis_memo.get(symbol, bar_time)
+        if result is None:
+            with self.metrics.timer('analyze'):
+                result = self.analyst.analyze(df_closed, trend_bias)
+            self.analysis_memo.put(symbol, bar_time, result)
+        trap = result['trap_zone']
+        signal = result['signal']
+        
+        # Log status
+        last_time = bar_time
+        if last_time != self.processed_logs.get(symbol):
+            current_price = df_closed['close'].iloc[-1]
+            bias_str = "BULL" if trend_bias == 1 else "BEAR" if trend_bias == -1 else "NEUTRAL"
+            
+            if trap:
+                print(f"[{symbol} @ ${current_price:.4f}] Liq: {trap['low_liq']:.4f}/{trap['high_liq']:.4f} | {bias_str}")
+            else:
+                print(f"[{symbol} @ ${current_price:.4f}] Inicializando... | {bias_str}")
+            
+            self.processed_logs[symbol] = last_time
+        
+        if not signal:
+            return None
+        signal_time = signal['timestamp']
+        
+        # Check if already processed
+        if symbol in self.processed_signals and self.processed_signals[symbol] == signal_time:
+            return None
+        self.processed_signals[symbol] = signal_time
+        self.metrics.inc('signals_total', symbol=symbol)
+        self.journal.record(SIGNAL, symbol, signal['action'], entry=signal['price'], sl=signal['sl'],
+                            reason=signal['reason'], bias=trend_bias)
+        
+        # Check if we have position
+        if self.has_open_position(symbol, account):
+            self.journal.record(SKIP, symbol, signal['action'], reason='OPEN_POSITION')
+            return None
+        
+        # Calculate position size
+        entry_price = signal['price']
+        sl_price = signal['sl']
+        tp_price = entry_price + (abs(entry_price - sl_price) * settings.RISK_REWARD_RATIO) if signal['action'] == 'BUY' else entry_price - (abs(entry_price - sl_price) * settings.RISK_REWARD_RATIO)
+        
+        with self.metrics.timer('lot_size'):
+            position_size = self.guardian.calculate_position_size(symbol, entry_price, sl_price, balance)
+        if position_size <= 0:
+            self.journal.record(SKIP, symbol, signal['action'], entry=entry_price, sl=sl_price, tp=tp_price,
+                                size=position_size, reason='ZERO_SIZE', balance=balance)
+            return None
+        
+        print(f"\n🎯 SEÑAL: {symbol} {signal['action']} @ ${entry_price:.4f}")
+        print(f"   SL: ${sl_price:.4f} | TP: ${tp_price:.4f}")
+        print(f"   Tamaño: {position_size:.6f}")
+        print(f"   Razón: {signal['reason']}")
+        return {
+            'symbol': symbol,
+            'action': signal['action'],
+            'entry': entry_price,
+            'sl': sl_price,
+            'tp': tp_price,
+            'size': position_size,
+            'reason': signal['reason']
+        }
+    
+    def record_order(self, plan, order):
+        """Journal + métricas: FILL con el id de la orden, o SKIP si el exchange la rechazó"""
+        self.metrics.inc('orders_total', result='filled' if order else 'failed')
+        if order:
+            if self.bar_close_time is not None:
+                self.metrics.observe('bar_close_to_order_seconds',
+                                     self.scheduler.server_now() - self.bar_close_time.timestamp())
+            self.journal.record(FILL, plan['symbol'], plan['action'], entry=plan['entry'], sl=plan['sl'],
+                                tp=plan['tp'], size=plan['size'], reason=plan['reason'], ticket=order.get('id'),
+                                fill_price=order.get('average') or order.get('price'))
+        else:
+            self.journal.record(SKIP, plan['symbol'], plan['action'], entry=plan['entry'], sl=plan['sl'],
+                                tp=plan['tp'], size=plan['size'], reason='ORDER_FAILED')
+    
     def run(self):
         """Main loop"""
         print("\n🚀 Bot corriendo...\n")
+        metrics_server = self.metrics.serve(settings.METRICS_PORT, settings.METRICS_HOST) \
+            if settings.METRICS_PORT and self.serve_metrics else None
         
         try:
+            # Candles are aligned to exchange time
+            try:
+                self.scheduler.sync(self.exchange.fetch_time() / 1000)
+            except Exception:
+                pass
+            
             while True:
+                # New LTF bar closed? -> every symbol is due for analysis
+                boundary = self.scheduler.poll()
+                if boundary is not None:
+                    self.bar_close_time = pd.Timestamp(boundary, unit='s')
+                    self.pending_symbols = set(self.symbols)
+                    self.metrics.set('last_bar_close_timestamp', boundary)
+                
+                if not self.pending_symbols:
+                    self.scheduler.sleep()
+                    continue
+                
                 # Update balance and risk
                 balance = self.get_balance()
                 self.guardian.update_daily_pnl(balance)
                 
                 if not self.guardian.can_trade():
                     print(f"🛑 Risk Guardian bloqueó trading. PnL: {self.guardian.current_daily_loss:.2%}")
-                    time.sleep(300)
+                    self.clock.sleep(300)
                     continue
                 
                 # Scan symbols
-                for symbol in settings.SYMBOLS:
+                # scan_seconds{symbol}: whole pass per symbol (data -> analysis -> order)
+                for symbol in self.metrics.timed('scan_seconds', [s for s in self.symbols if s in self.pending_symbols], 'symbol'):
                     try:
                         # Fetch data
-                        df_ltf = self.get_ohlcv(symbol, settings.TIMEFRAME_LTF, 500)
-                        df_htf = self.get_ohlcv(symbol, settings.TIMEFRAME_HTF, 300)
-                        
-                        if df_ltf is None or df_htf is None:
+                        with self.metrics.timer('get_data'):
+                            df_ltf = self.get_ohlcv(symbol, settings.TIMEFRAME_LTF, 500)
+                        df_closed = self.closed_bars(symbol, df_ltf)
+                        if df_closed is None:
                             continue
                         
-                        # Determine trend bias (simple EMA)
-                        trend_bias = 0
-                        if len(df_htf) > 200:
-                            ema_50 = df_htf['close'].ewm(span=50, adjust=False).mean().iloc[-1]
-                            ema_200 = df_htf['close'].ewm(span=200, adjust=False).mean().iloc[-1]
-                            last_close = df_htf['close'].iloc[-1]
-                            
-                            if last_close > ema_50 and last_close > ema_200:
-                                trend_bias = 1  # Bullish
-                            elif last_close < ema_50 and last_close < ema_200:
-                                trend_bias = -1  # Bearish
-                        
-                        # Analyze
-                        result = self.analyst.analyze(df_ltf, trend_bias)
-                        trap = result['trap_zone']
-                        signal = result['signal']
-                        
-                        # Log status
-                        last_time = df_ltf.index[-1]
-                        if last_time != self.processed_logs.get(symbol):
-                            current_price = df_ltf['close'].iloc[-1]
-                            bias_str = "BULL" if trend_bias == 1 else "BEAR" if trend_bias == -1 else "NEUTRAL"
-                            
-                            if trap:
-                                print(f"[{symbol} @ ${current_price:.4f}] Liq: {trap['low_liq']:.4f}/{trap['high_liq']:.4f} | {bias_str}")
-                            else:
-                                print(f"[{symbol} @ ${current_price:.4f}] Inicializando... | {bias_str}")
-                            
-                            self.processed_logs[symbol] = last_time
+                        # Determine trend bias (simple EMA): HTF bars aggregated from the LTF stream,
+                        # seeded once from the native HTF history
+                        with self.metrics.timer('trend'):
+                            seeded = self.advance_trend(symbol, df_closed)
+                            if not seeded:
+                                df_htf = self.get_ohlcv(symbol, settings.TIMEFRAME_HTF, self.trend.window)
+                                seeded = self.seed_trend(symbol, df_htf, df_closed)
+                        if not seeded:
+                            continue
                         
-                        # Execute signal
-                        if signal:
-                            signal_time = signal['timestamp']
-                            
-                            # Check if already processed
-                            if symbol in self.processed_signals and self.processed_signals[symbol] == signal_time:
-                                continue
-                            
-                            # Check if we have position
-                            if self.has_open_position(symbol):
-                                self.processed_signals[symbol] = signal_time
-                                continue
-                            
-                            # Calculate position size
-                            entry_price = signal['price']
-                            sl_price = signal['sl']
-                            tp_price = entry_price + (abs(entry_price - sl_price) * settings.RISK_REWARD_RATIO) if signal['action'] == 'BUY' else entry_price - (abs(entry_price - sl_price) * settings.RISK_REWARD_RATIO)
-                            
-                            position_size = self.guardian.calculate_position_size(symbol, entry_price, sl_price, balance)
-                            
-                            if position_size > 0:
-                                print(f"\n🎯 SEÑAL: {symbol} {signal['action']} @ ${entry_price:.4f}")
-                                print(f"   SL: ${sl_price:.4f} | TP: ${tp_price:.4f}")
-                                print(f"   Tamaño: {position_size:.6f}")
-                                print(f"   Razón: {signal['reason']}")
-                                
-                                # Place order
-                                order = self.place_order(
-                                    symbol,
-                                    signal['action'],
-                                    position_size,
-                                    entry_price,
-                                    sl_price,
-                                    tp_price
-                                )
-                                
-                                if order:
-                                    # Log to CSV
-                                    log_trade_to_csv({
-                                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                        'symbol': symbol,
-                                        'action': signal['action'],
-                                        'entry': entry_price,
-                                        'sl': sl_price,
-                                        'tp': tp_price,
-                                        'size': position_size,
-                                        'reason': signal['reason']
-                                    })
-                            
-                            self.processed_signals[symbol] = signal_time
+                        # Analyze + execute signal
+                        plan = self.evaluate_symbol(symbol, df_closed, balance)
+                        if plan:
+                            with self.metrics.timer('order_send'):
+                                order = self.place_order(symbol, plan['action'], plan['size'], plan['entry'], plan['sl'], plan['tp'])
+                            self.record_order(plan, order)
                     
                     except Exception as e:
                         print(f"[!] Error procesando {symbol}: {e}")
                         continue
                 
-                # Sleep between scans
-                time.sleep(10)
+                # Sleep until the next pass or the next candle close
+                self.scheduler.sleep()
         
         except KeyboardInterrupt:
             print("\n👋 Bot detenido por usuario")
+        finally:
+            self.journal.close()
+            if metrics_server: metrics_server.close()
 
 if __name__ == "__main__":
     bot = CCXTSMCBot()
@@ -0,0 +1,195 @@
+import sys
+import os
+import asyncio
+import ccxt.async_support as ccxt_async
+import pandas as pd
+
+# Add parent dir to sys path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import settings_ccxt as settings
+from src.main_ccxt import CCXTSMCBot
+from src.scheduler import SystemClock
+
+class AsyncCCXTSMCBot(CCXTSMCBot):
+    """
+    Variante asyncio de CCXTSMCBot: en cada cierre de vela lanza a la vez el
+    balance y el OHLCV de todos los símbolos pendientes (y después el HTF de
+    los que haya que sembrar), limitado por un semáforo y por el rate
+    limiter de ccxt.
+    El análisis y los filtros son los mismos que en el bot síncrono.
+    """
+
+    def __init__(self, exchange=None, symbols=None, max_concurrency=None, journal=None, metrics=None, clock=None,
+                 store=None):
+        super().__init__(exchange=exchange, symbols=symbols, journal=journal, metrics=metrics, clock=clock,
+                         store=store)
+        self.semaphore = asyncio.Semaphore(max_concurrency or settings.MAX_CONCURRENT_REQUESTS)
+
+    def init_exchange(self):
+        """Initialize CCXT exchange (async client)"""
+        exchange_class = getattr(ccxt_async, settings.EXCHANGE_NAME)
+
+        exchange = exchange_class({
+            'apiKey': settings.API_KEY,
+            'secret': settings.API_SECRET,
+            'enableRateLimit': True,
+            'options': {'defaultType': 'spot'}  # or 'future' for futures
+        })
+
+        if hasattr(settings, 'API_PASSWORD') and settings.API_PASSWORD:
+            exchange.password = settings.API_PASSWORD
+
+        return exchange
+
+    async def sleep(self, seconds):
+        """Espera sin bloquear el event loop; un reloj simulado (replay) avanza al instante"""
+        if isinstance(self.clock, SystemClock):
+            await asyncio.sleep(seconds)
+        else:
+            self.clock.sleep(seconds)
+
+    async def call(self, method, *args, **kwargs):
+        """Llamada REST con límite de peticiones en vuelo"""
+        async with self.semaphore:
+            return await getattr(self.exchange, method)(*args, **kwargs)
+
+    async def fetch_account(self):
+        """Full balance once per scan (USDT free + base assets for position checks)"""
+        try:
+            return await self.call('fetch_balance')
+        except Exception as e:
+            print(f"[!] Error fetching balance: {e}")
+            return None
+
+    async def get_ohlcv(self, symbol, timeframe, limit=500):
+        """Fetch OHLCV data (incremental when the local bar store covers the window)"""
+        try:
+            since = self.ohlcv_since(symbol, timeframe, limit)
+            if since is not None or limit > settings.OHLCV_PAGE_LIMIT:
+                ohlcv = await self.fetch_ohlcv_pages(symbol, timeframe, limit, since)
+            else:
+                ohlcv = await self.call('fetch_ohlcv', symbol, timeframe, limit=limit)
+            return self.ohlcv_frame(symbol, timeframe, ohlcv, limit)
+        except Exception as e:
+            print(f"[!] Error fetching {symbol} data: {e}")
+            return None
+
+    async def fetch_ohlcv_pages(self, symbol, timeframe, limit, since=None):
+        """Candles from `since` (default: the last `limit`) in pages of OHLCV_PAGE_LIMIT (sequential per symbol)"""
+        candles = []
+        if since is None:
+            since = self.history_since(timeframe, limit)
+        while since is not None:
+            page = await self.call('fetch_ohlcv', symbol, timeframe, since=since, limit=settings.OHLCV_PAGE_LIMIT)
+            since = self.next_page(candles, page, timeframe)
+        return candles
+
+    def has_open_position(self, symbol, balance=None):
+        """Position check on the scan's balance only: never a blocking fetch on the async client"""
+        if balance is None:
+            return True # Unknown -> treated as open (SKIP)
+        return super().has_open_position(symbol, balance)
+
+    async def place_order(self, symbol, side, amount, price, sl_price, tp_price):
+        """Place market order (SL/TP are logged only, same as the sync bot)"""
+        try:
+            order = await self.call('create_order', symbol=symbol, type='market', side=side.lower(), amount=amount)
+            print(f"✅ Order placed: {order['id']}")
+            return order
+        except Exception as e:
+            print(f"❌ Order failed: {e}")
+            return None
+
+    async def scan(self):
+        """
+        Una pasada sobre los símbolos pendientes. Retorna False si el Risk Guardian bloquea.
+        """
+        symbols = [symbol for symbol in self.symbols if symbol in self.pending_symbols]
+        with self.metrics.timer('get_data'): # One concurrent fetch for the whole pass
+            account, *frames = await asyncio.gather(
+                self.fetch_account(),
+                *[self.get_ohlcv(symbol, settings.TIMEFRAME_LTF, 500) for symbol in symbols]
+            )
+
+        # Without the account the open-position guard cannot run: symbols stay pending for the next pass
+        if account is None:
+            print("[!] Balance unavailable: scan skipped")
+            return True
+
+        # Update balance and risk
+        balance = self.free_usdt(account)
+        self.guardian.update_daily_pnl(balance)
+        if not self.guardian.can_trade():
+            print(f"🛑 Risk Guardian bloqueó trading. PnL: {self.guardian.current_daily_loss:.2%}")
+            return False
+
+        ready = {}
+        for symbol, df_ltf in zip(symbols, frames):
+            df_closed = self.closed_bars(symbol, df_ltf)
+            if df_closed is not None:
+                ready[symbol] = df_closed
+
+        # HTF history only for symbols whose trend state needs (re)seeding
+        with self.metrics.timer('trend'):
+            unseeded = [symbol for symbol, df_closed in ready.items() if not self.advance_trend(symbol, df_closed)]
+            htf_frames = await asyncio.gather(*[self.get_ohlcv(symbol, settings.TIMEFRAME_HTF, self.trend.window)
+                                                for symbol in unseeded])
+            for symbol, df_htf in zip(unseeded, htf_frames):
+                if not self.seed_trend(symbol, df_htf, ready[symbol]):
+                    del ready[symbol]
+
+        plans = []
+        for symbol, df_closed in ready.items():
+            try:
+                plan = self.evaluate_symbol(symbol, df_closed, balance, account)
+                if plan:
+                    plans.append(plan)
+            except Exception as e:
+                print(f"[!] Error procesando {symbol}: {e}")
+
+        with self.metrics.timer('order_send'):
+            orders = await asyncio.gather(*[self.place_order(plan['symbol'], plan['action'], plan['size'],
+                                                             plan['entry'], plan['sl'], plan['tp']) for plan in plans])
+        for plan, order in zip(plans, orders):
+            self.record_order(plan, order)
+        return True
+
+    async def run(self):
+        """Main loop"""
+        print("\n🚀 Bot (async) corriendo...\n")
+        metrics_server = self.metrics.serve(settings.METRICS_PORT, settings.METRICS_HOST) \
+            if settings.METRICS_PORT and self.serve_metrics else None
+
+        try:
+            # Candles are aligned to exchange time
+            try:
+                self.scheduler.sync(await self.call('fetch_time') / 1000)
+            except Exception:
+                pass
+
+            while True:
+                # New LTF bar closed? -> every symbol is due for analysis
+                boundary = self.scheduler.poll()
+                if boundary is not None:
+                    self.bar_close_time = pd.Timestamp(boundary, unit='s')
+                    self.pending_symbols = set(self.symbols)
+                    self.metrics.set('last_bar_close_timestamp', boundary)
+
+                if self.pending_symbols and not await self.scan():
+                    await self.sleep(300)
+                    continue
+
+                # Sleep until the next pass or the next candle close
+                await self.sleep(self.scheduler.next_wait())
+        finally:
+            await self.exchange.close()
+            self.journal.close()
+            if metrics_server: metrics_server.close()
+
+if __name__ == "__main__":
+    bot = AsyncCCXTSMCBot()
+    try:
+        asyncio.run(bot.run())
+    except KeyboardInterrupt:
+        print("\n👋 Bot detenido por usuario")
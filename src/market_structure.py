@@ -0,0 +1,233 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+from collections import deque
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import settings
+from src.trade_engine import RangeExtremes
+from src.timeframes import sync_start
+
+SWING_COLUMNS = ['Time', 'Pos', 'Kind', 'Price', 'Confirmed']
+EVENT_COLUMNS = ['Time', 'Pos', 'Type', 'Direction', 'Level', 'SwingTime', 'Streak', 'Trap']
+
+
+def fractal_swings(highs, lows, n=2):
+    """
+    Fractales de Williams: high[i] estrictamente mayor que las `n` velas a cada
+    lado (swing high); low[i] estrictamente menor (swing low).
+    Un fractal en i se confirma al cierre de la vela i + n.
+    Retorna (is_high, is_low) booleanos por vela.
+    """
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    size = len(highs)
+    is_high = np.zeros(size, dtype=bool)
+    is_low = np.zeros(size, dtype=bool)
+    if size < 2 * n + 1:
+        return is_high, is_low
+
+    core = slice(n, size - n)
+    is_high[core] = True
+    is_low[core] = True
+    for k in range(1, n + 1):
+        is_high[core] &= (highs[n:size - n] > highs[n - k:size - n - k]) & (highs[n:size - n] > highs[n + k:size - n + k])
+        is_low[core] &= (lows[n:size - n] < lows[n - k:size - n - k]) & (lows[n:size - n] < lows[n + k:size - n + k])
+    return is_high, is_low
+
+
+def _label_events(breaks, trend=0, streak=0, trap_bos_count=2):
+    """
+    Etiqueta rupturas ordenadas (pos, direction, level, swing_pos) como BOS o CHOCH.
+    BOS: ruptura a favor de la tendencia (o la primera). CHOCH: en contra.
+    Trap: CHOCH tras `trap_bos_count` BOS seguidos (la tendencia estaba extendida).
+    """
+    events = []
+    for pos, direction, level, swing_pos in breaks:
+        if trend == -direction:
+            events.append((pos, 'CHOCH', direction, level, swing_pos, streak, streak >= trap_bos_count))
+            streak = 0
+        else:
+            streak += 1
+            events.append((pos, 'BOS', direction, level, swing_pos, streak, False))
+        trend = direction
+    return events, trend, streak
+
+
+def structure_frame(df, n=2, trap_bos_count=None):
+    """
+    Modo batch (backtests): swings y eventos BOS/CHOCH de todo el histórico.
+
+    El swing vigente de cada lado es el último confirmado; se rompe con el primer
+    cierre más allá de su nivel antes de que se confirme el siguiente del mismo lado.
+    Retorna (swings, events, state) con el mismo estado final que MarketStructure.
+    """
+    trap_bos_count = settings.TRAP_BOS_COUNT if trap_bos_count is None else trap_bos_count
+    highs = df['High'].values.astype(np.float64)
+    lows = df['Low'].values.astype(np.float64)
+    closes = df['Close'].values.astype(np.float64)
+    size = len(df)
+    is_high, is_low = fractal_swings(highs, lows, n)
+
+    engine = RangeExtremes(closes, closes)
+    breaks = []
+    last = {}
+    for kind, mask, prices, direction in (('HIGH', is_high, highs, 1), ('LOW', is_low, lows, -1)):
+        pos = np.flatnonzero(mask)
+        levels = prices[pos]
+        confirmed = pos + n
+        # Vigente desde la vela siguiente a la confirmación hasta la confirmación del siguiente
+        until = np.r_[confirmed[1:], size - 1]
+        hit = engine.first_above(confirmed + 1, levels) if direction == 1 else engine.first_below(confirmed + 1, levels)
+        broken = hit <= until
+        breaks += [(int(b), direction, lvl, int(p)) for b, lvl, p in zip(hit[broken], levels[broken], pos[broken])]
+        if len(pos):
+            last[kind] = (df.index[pos[-1]], float(levels[-1]), bool(broken[-1]))
+
+    # A igualdad de vela, la ruptura alcista primero (mismo orden que push())
+    breaks.sort(key=lambda b: (b[0], -b[1]))
+    events, trend, streak = _label_events(breaks, trap_bos_count=trap_bos_count)
+
+    index = df.index
+    hi, lo = np.flatnonzero(is_high), np.flatnonzero(is_low)
+    pos = np.r_[hi, lo]
+    swings = pd.DataFrame({
+        'Time': index[pos],
+        'Pos': pos,
+        'Kind': ['HIGH'] * len(hi) + ['LOW'] * len(lo),
+        'Price': np.r_[highs[hi], lows[lo]],
+        'Confirmed': pos + n
+    }, columns=SWING_COLUMNS).sort_values(['Pos', 'Kind'], kind='stable').reset_index(drop=True)
+
+    events = pd.DataFrame([(index[e[0]], e[0], e[1], e[2], e[3], index[e[4]], e[5], e[6]) for e in events],
+                          columns=EVENT_COLUMNS)
+
+    state = {
+        'trend': trend,
+        'streak': streak,
+        'swing_high': last.get('HIGH'),
+        'swing_low': last.get('LOW'),
+    }
+    return swings, events, state
+
+
+class StructureBook:
+    """
+    Estado de estructura de un (símbolo, timeframe): últimas 2n+1 velas,
+    swing vigente de cada lado, tendencia y racha de BOS. Coste O(1) por vela.
+    """
+
+    def __init__(self, n=2, trap_bos_count=2, max_events=500):
+        self.n = n
+        self.trap_bos_count = trap_bos_count
+        self.count = 0
+        self.last_time = None
+        self.trend = 0   # +1 alcista / -1 bajista / 0 sin estructura
+        self.streak = 0  # BOS seguidos en la dirección actual
+        self.swing_high = None # (time, price, broken)
+        self.swing_low = None
+        self._bars = deque(maxlen=2 * n + 1) # (time, high, low)
+        self.swings = deque(maxlen=max_events)
+        self.events = deque(maxlen=max_events)
+
+    def seed(self, df):
+        """
+        Estado inicial desde el batch (arranque o hueco en los datos).
+        """
+        swings, events, state = structure_frame(df, self.n, self.trap_bos_count)
+        index = df.index
+        self.trend, self.streak = state['trend'], state['streak']
+        self.swing_high, self.swing_low = state['swing_high'], state['swing_low']
+        self.swings.extend(swings[['Time', 'Kind', 'Price']].itertuples(index=False, name=None))
+        self.events.extend(events.to_dict('records'))
+        self._bars.extend(zip(index[-(2 * self.n + 1):], df['High'].values[-(2 * self.n + 1):],
+                              df['Low'].values[-(2 * self.n + 1):]))
+        self.count = len(df)
+        self.last_time = index[-1] if len(df) else None
+
+    def push(self, timestamp, high, low, close):
+        """
+        Procesa una vela cerrada. Retorna la lista de eventos nuevos.
+        """
+        new_events = []
+
+        # 1. Rupturas por cierre de los swings vigentes
+        for side, direction in (('swing_high', 1), ('swing_low', -1)):
+            swing = getattr(self, side)
+            if swing is None or swing[2]: continue
+            swing_time, level, _ = swing
+            if (direction == 1 and close > level) or (direction == -1 and close < level):
+                setattr(self, side, (swing_time, level, True))
+                labeled, self.trend, self.streak = _label_events(
+                    [(self.count, direction, level, swing_time)], self.trend, self.streak, self.trap_bos_count)
+                _, kind, _, _, _, streak, trap = labeled[0]
+                event = {'Time': timestamp, 'Pos': self.count, 'Type': kind, 'Direction': direction,
+                         'Level': level, 'SwingTime': swing_time, 'Streak': streak, 'Trap': trap}
+                self.events.append(event)
+                new_events.append(event)
+
+        # 2. Fractal confirmado: la vela central de las últimas 2n+1
+        self._bars.append((timestamp, high, low))
+        if len(self._bars) == self._bars.maxlen:
+            bars = list(self._bars)
+            mid_time, mid_high, mid_low = bars[self.n]
+            others = bars[:self.n] + bars[self.n + 1:]
+            if all(mid_high > h for _, h, _ in others):
+                self.swing_high = (mid_time, mid_high, False)
+                self.swings.append((mid_time, 'HIGH', mid_high))
+            if all(mid_low < l for _, _, l in others):
+                self.swing_low = (mid_time, mid_low, False)
+                self.swings.append((mid_time, 'LOW', mid_low))
+
+        self.count += 1
+        self.last_time = timestamp
+        return new_events
+
+    def snapshot(self):
+        return {
+            'trend': self.trend,
+            'streak': self.streak,
+            'swing_high': self.swing_high,
+            'swing_low': self.swing_low,
+            'last_event': self.events[-1] if self.events else None,
+        }
+
+
+class MarketStructure:
+    """
+    Motor de estructura (swings, BOS, CHOCH) por (símbolo, timeframe).
+    update() solo procesa las velas cerradas nuevas desde la llamada anterior.
+    """
+
+    def __init__(self, n=2, trap_bos_count=None, max_events=500):
+        self.n = n
+        self.trap_bos_count = settings.TRAP_BOS_COUNT if trap_bos_count is None else trap_bos_count
+        self.max_events = max_events
+        self.books = {} # (symbol, timeframe) -> StructureBook
+
+    def update(self, symbol, timeframe, df):
+        """
+        Sincroniza con `df` (todas sus filas cerradas). Retorna (book, eventos nuevos).
+        """
+        key = (symbol, timeframe)
+        book = self.books.get(key)
+        index = df.index
+        n_bars = len(df)
+
+        start = sync_start(index, book.last_time) if book is not None else None
+        if start is None:
+            book = StructureBook(self.n, self.trap_bos_count, self.max_events)
+            book.seed(df)
+            self.books[key] = book
+            return book, []
+
+        highs, lows, closes = df['High'].values, df['Low'].values, df['Close'].values
+        new_events = []
+        for i in range(start, n_bars):
+            new_events += book.push(index[i], highs[i], lows[i], closes[i])
+        return book, new_events
+
+    def state(self, symbol, timeframe):
+        book = self.books.get((symbol, timeframe))
+        return book.snapshot() if book is not None else None
@@ -0,0 +1,191 @@
+import time
+import bisect
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Límites de los buckets (segundos): de 1 ms a 1 minuto
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    """
+    Buckets acumulativos al estilo Prometheus + ventana con las últimas
+    `window` muestras para cuantiles recientes (p50/p90/p99).
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=500):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # El último es +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantiles(self):
+        values = sorted(self.recent)
+        if not values: return {}
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES}
+
+
+class Timer:
+    """
+    Context manager: observa la duración del bloque (perf_counter) en el histograma.
+    """
+    __slots__ = ('metrics', 'name', 'labels', 'start')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def _labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items: return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in items)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(items, escaped)) + '}'
+
+
+class Metrics:
+    """
+    Registro de métricas del loop en vivo: histogramas de latencia por etapa,
+    contadores y gauges, con etiquetas. Thread-safe (el endpoint lee desde otro hilo).
+
+        with metrics.timer('analyze'): ...
+        metrics.inc('orders_total', result='filled')
+    """
+
+    def __init__(self, prefix='smc_bot', buckets=DEFAULT_BUCKETS, window=500):
+        self.prefix = prefix
+        self.buckets = buckets
+        self.window = window
+        self.histograms = {} # name -> {labels: Histogram}
+        self.counters = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets, self.window)
+            histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self.gauges.setdefault(name, {})[key] = value
+
+    def timer(self, stage, **labels):
+        """
+        Latencia de una etapa del pipeline -> stage_seconds{stage=...}.
+        """
+        return Timer(self, 'stage_seconds', dict(labels, stage=stage))
+
+    def timed(self, name, items, label):
+        """
+        Itera `items` midiendo el cuerpo del bucle de cada uno (también con continue).
+        """
+        for item in items:
+            start = time.perf_counter()
+            yield item
+            self.observe(name, time.perf_counter() - start, **{label: item})
+
+    def snapshot(self):
+        """
+        {(name, labels): {'count', 'sum', p50/p90/p99}} de los histogramas.
+        """
+        with self._lock:
+            return {(name, key): {'count': h.count, 'sum': h.sum, **h.quantiles()}
+                    for name, series in self.histograms.items() for key, h in series.items()}
+
+    def render(self):
+        """
+        Exposición en formato de texto de Prometheus (0.0.4).
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.histograms.items()):
+                full = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {full} histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(list(self.buckets) + ['+Inf'], histogram.counts):
+                        cumulative += count
+                        lines.append(f"{full}_bucket{_labels(key, ('le', bound))} {cumulative}")
+                    lines.append(f"{full}_sum{_labels(key)} {histogram.sum:.6f}")
+                    lines.append(f"{full}_count{_labels(key)} {histogram.count}")
+                # Ventana reciente (últimas `window` muestras) como gauge por cuantil
+                lines.append(f"# TYPE {full}_recent gauge")
+                for key, histogram in sorted(series.items()):
+                    for q, value in histogram.quantiles().items():
+                        lines.append(f"{full}_recent{_labels(key, ('quantile', q))} {value:.6f}")
+            for kind, families in (('counter', self.counters), ('gauge', self.gauges)):
+                for name, series in sorted(families.items()):
+                    full = f"{self.prefix}_{name}"
+                    lines.append(f"# TYPE {full} {kind}")
+                    for key, value in sorted(series.items()):
+                        lines.append(f"{full}{_labels(key)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='127.0.0.1'):
+        """
+        Arranca el endpoint HTTP /metrics en un hilo en segundo plano.
+        """
+        return MetricsServer(self, port, host)
+
+
+class MetricsServer:
+    """
+    GET /metrics en http://host:port (hilo daemon, no bloquea el loop).
+    """
+
+    def __init__(self, metrics, port, host='127.0.0.1'):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass # Sin ruido en la consola del bot
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True)
+        self.thread.start()
+        print(f"[Metrics] Serving http://{host}:{self.port}/metrics")
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -1,33 +1,188 @@
 import requests
 import os
+import time
+import queue
+import threading
 from datetime import datetime
 
+# Límite de Telegram por mensaje de texto
+MAX_MESSAGE_CHARS = 4096
+
 class TelegramNotifier:
-    def __init__(self, token, chat_id):
+    """
+    Alertas de Telegram sin bloquear el loop de trading.
+
+    send_alert() solo encola; un hilo en segundo plano entrega los mensajes
+    con una sesión HTTP persistente, timeouts, reintentos con backoff y
+    respeto de `retry_after` en los 429. Las ráfagas de texto que llegan
+    dentro de `digest_window` segundos se agrupan en un solo mensaje.
+    Si la cola está llena la alerta nueva se descarta (y se cuenta).
+    """
+
+    def __init__(self, token, chat_id, base_url="https://api.telegram.org", max_queue=100,
+                 timeout=10, max_retries=3, backoff=1.0, digest_window=2.0, session=None, metrics=None):
         self.token = token
         self.chat_id = chat_id
-        
-    def send_alert(self, message, image_path=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.digest_window = digest_window
+        self.session = session or requests.Session()
+        self.metrics = metrics # Optional Metrics: delivery latency (stage="telegram")
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def send_alert(self, message, image_path=None, image_bytes=None):
         """
-        Envía una alerta a Telegram con texto y opcionalmente una imagen.
+        Encola una alerta con texto y opcionalmente una imagen (ruta o bytes PNG).
+        La imagen se lee al encolar: el llamador puede borrar el fichero al volver.
         """
         if not self.token or not self.chat_id:
             print("[Notifications] Telegram credentials missing. Skipping alert.")
-            return
+            return False
+
+        if image_bytes is None and image_path and os.path.exists(image_path):
+            with open(image_path, 'rb') as photo:
+                image_bytes = photo.read()
+
+        self._ensure_worker()
+        try:
+            self.queue.put_nowait((message, image_bytes))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"      [Telegram] Queue full, alert dropped ({self.dropped} so far).")
+            return False
+
+    def flush(self, timeout=None):
+        """
+        Espera a que la cola se vacíe. Retorna False si vence el timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
 
-        # Enviar Mensaje
-        url_msg = f"https://api.telegram.org/bot{self.token}/sendMessage"
+    def close(self, timeout=10):
+        """
+        Entrega lo pendiente (hasta `timeout`) y detiene el hilo.
+        """
+        if self._worker is None: return True
+        drained = self.flush(timeout)
         try:
-            payload = {'chat_id': self.chat_id, 'text': message}
-            requests.post(url_msg, data=payload)
-            
-            # Enviar Imagen (opcional)
-            if image_path and os.path.exists(image_path):
-                url_img = f"https://api.telegram.org/bot{self.token}/sendPhoto"
-                with open(image_path, 'rb') as photo:
-                    requests.post(url_img, data={'chat_id': self.chat_id}, files={'photo': photo})
-            
-            print("      [Telegram] Alert sent successfully.")
-            
-        except Exception as e:
-            print(f"      [!] Telegram Error: {e}")
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._worker.join(timeout=1)
+        self._worker = None
+        return drained
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="telegram-notifier", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            batch = [item]
+            stop = False
+
+            # Coalesce the burst: everything that arrives inside the digest window
+            deadline = time.monotonic() + self.digest_window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: break
+                try:
+                    extra = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if extra is None:
+                    stop = True
+                    self.queue.task_done()
+                    break
+                batch.append(extra)
+
+            start = time.perf_counter()
+            try:
+                self._deliver(batch)
+            except Exception as e:
+                print(f"      [!] Telegram Error: {e}")
+            finally:
+                if self.metrics is not None:
+                    self.metrics.observe('stage_seconds', time.perf_counter() - start, stage='telegram')
+                for _ in batch:
+                    self.queue.task_done()
+            if stop:
+                return
+
+    def _deliver(self, batch):
+        messages = [message for message, _ in batch]
+        if len(messages) == 1:
+            texts = messages
+        else:
+            texts = self._digest(messages)
+
+        for text in texts:
+            self._post('sendMessage', data={'chat_id': self.chat_id, 'text': text})
+        for _, image_bytes in batch:
+            if image_bytes:
+                self._post('sendPhoto', data={'chat_id': self.chat_id},
+                           files={'photo': ('chart.png', image_bytes, 'image/png')})
+
+    @staticmethod
+    def _digest(messages):
+        """
+        Un mensaje resumen para la ráfaga, partido si supera el límite de Telegram.
+        """
+        header = f"📬 {len(messages)} alerts ({datetime.now().strftime('%H:%M:%S')})"
+        chunks = []
+        current = header
+        for message in messages:
+            block = "\n\n— — —\n\n" + message
+            if len(current) + len(block) > MAX_MESSAGE_CHARS:
+                chunks.append(current)
+                current = message[:MAX_MESSAGE_CHARS]
+            else:
+                current += block
+        chunks.append(current)
+        return chunks
+
+    def _post(self, method, data, files=None):
+        """
+        POST con timeout; reintenta errores de red, 5xx y 429 (usando retry_after).
+        """
+        url = f"{self.base_url}/bot{self.token}/{method}"
+        for attempt in range(self.max_retries + 1):
+            wait = self.backoff * (2 ** attempt)
+            try:
+                response = self.session.post(url, data=data, files=files, timeout=self.timeout)
+                if response.status_code == 200:
+                    self.sent += 1
+                    print("      [Telegram] Alert sent successfully.")
+                    return True
+                if response.status_code == 429:
+                    try:
+                        wait = float(response.json().get('parameters', {}).get('retry_after', wait))
+                    except ValueError:
+                        pass
+                elif response.status_code < 500:
+                    print(f"      [!] Telegram Error: HTTP {response.status_code} {response.text[:200]}")
+                    break
+            except requests.RequestException as e:
+                print(f"      [!] Telegram Error: {e}")
+            if attempt < self.max_retries:
+                time.sleep(wait)
+        self.failed += 1
+        return False
@@ -12,15 +12,20 @@ from datetime import datetime
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from config import settings
-from src.execution_bridge import MT5Handler
+from src.bar_store import BarStore
+from src.trend_bias import TrendBias
+from src.bar_aggregator import aggregate
+from src.trade_engine import RangeExtremes, first_touch, resolve_first_touch
 try:
     from src.smc_analyst import SMCAnalyst
 except ImportError:
     pass
 
-def simulate_trade_vectorized(df, entries, sl_pips, rr_ratio):
+def simulate_trade_vectorized(df, entries, sl_pips, rr_ratio, engine=None):
     """
     Simula trades de forma vectorizada usando Pandas/Numpy.
+    El primer toque de SL/TP se resuelve con RangeExtremes (O(log n) por entrada);
+    pasa `engine` para reutilizar la sparse table entre llamadas.
     Retorna: Net Profit (R-Multiples)
     """
     # Convert pips to price diff
@@ -35,65 +40,200 @@ def simulate_trade_vectorized(df, entries, sl_pips, rr_ratio):
     if len(entry_indices) == 0:
         return 0.0
     
-    wins = 0
-    losses = 0
-    
-    highs = df['High'].values
-    lows = df['Low'].values
-    
-    for i, idx in enumerate(entry_indices):
-        entry_price = entry_prices[i]
-        direction = entry_directions[i]
-        
-        if direction == 1: # BUY
-            tp_price = entry_price + tp_dist
-            sl_price = entry_price - sl_dist
-        else: # SELL
-            tp_price = entry_price - tp_dist
-            sl_price = entry_price + sl_dist
-        
-        # Look forward
-        future_highs = highs[idx+1:]
-        future_lows = lows[idx+1:]
-        
-        if len(future_highs) == 0: continue
-            
-        # Find hits
-        if direction == 1: # BUY
-            sl_hits = future_lows < sl_price
-            tp_hits = future_highs > tp_price
-        else: # SELL
-            sl_hits = future_highs > sl_price  # Stop Hit (High goes above SL)
-            tp_hits = future_lows < tp_price   # TP Hit (Low goes below TP)
-        
-        if not sl_hits.any() and not tp_hits.any():
-            continue 
-            
-        first_sl = np.argmax(sl_hits) if sl_hits.any() else 999999
-        first_tp = np.argmax(tp_hits) if tp_hits.any() else 999999
-        
-        if first_tp < first_sl:
-            wins += 1
-        else:
-            losses += 1
+    if engine is None:
+        engine = RangeExtremes(df['High'].values, df['Low'].values)
+    
+    is_buy = entry_directions == 1
+    tp_prices = np.where(is_buy, entry_prices + tp_dist, entry_prices - tp_dist)
+    sl_prices = np.where(is_buy, entry_prices - sl_dist, entry_prices + sl_dist)
+    
+    first_sl, first_tp = resolve_first_touch(engine, entry_indices, entry_directions, sl_prices, tp_prices)
+    
+    # No hit on either side -> trade still open, ignored. Same-bar hit counts as loss.
+    wins = int(np.sum(first_tp < first_sl))
+    losses = int(np.sum((first_sl <= first_tp) & (first_sl < engine.n)))
             
     total_r = (wins * rr_ratio) - (losses * 1.0)
     return total_r
 
-def run_optimization():
-    print("--- Starting NATIVE Optimization Pipeline (Pandas) ---")
-    
-    # 1. Connect & Fetch Data
-    bridge = MT5Handler(login=settings.MT5_LOGIN, password=settings.MT5_PASSWORD, server=settings.MT5_SERVER)
-    if not bridge.connect(): return
+def resolve_grid_outcomes(engine, entry_indices, entry_prices, entry_directions, stops_pips, rr_ratios, pip_size=0.0001, chunk_size=4096, return_exits=False):
+    """
+    Resuelve TODAS las entradas contra TODA la rejilla SL x RR en una pasada.
+    Solo se buscan los niveles de precio distintos (|SL| + |SL*RR| únicos por entrada),
+    las celdas se combinan después por broadcasting.
+    Retorna matriz int8 (entradas, SL, RR): 1 = TP, -1 = SL, 0 = abierto.
+    return_exits=True: también la vela de salida por celda (int32, n = abierto).
+    """
+    sl_dists = np.asarray(stops_pips, dtype=np.float64) * pip_size
+    rr = np.asarray(rr_ratios, dtype=np.float64)
+    tp_grid = sl_dists[:, None] * rr[None, :]
+    tp_dists, tp_cell = np.unique(tp_grid, return_inverse=True)
+    tp_cell = tp_cell.reshape(tp_grid.shape)
+
+    entry_indices = np.asarray(entry_indices)
+    entry_prices = np.asarray(entry_prices, dtype=np.float64)
+    sign = np.where(np.asarray(entry_directions) == 1, 1.0, -1.0)
+
+    outcomes = np.zeros((len(entry_indices), len(sl_dists), len(rr)), dtype=np.int8)
+    exits = np.empty(outcomes.shape, dtype=np.int32) if return_exits else None
+    for start in range(0, len(entry_indices), chunk_size):
+        part = slice(start, start + chunk_size)
+        idx, price, sgn, direction = entry_indices[part], entry_prices[part], sign[part], entry_directions[part]
+
+        # BUY: SL = entry - dist / TP = entry + dist (SELL al revés)
+        sl_prices = np.where(sgn[:, None] > 0, price[:, None] - sl_dists, price[:, None] + sl_dists)
+        tp_prices = np.where(sgn[:, None] > 0, price[:, None] + tp_dists, price[:, None] - tp_dists)
+        first_sl = first_touch(engine, idx, direction, sl_prices, adverse=True)      # (E, SL)
+        first_tp = first_touch(engine, idx, direction, tp_prices, adverse=False)     # (E, TP únicos)
+
+        cell_sl = first_sl[:, :, None]
+        cell_tp = first_tp[:, tp_cell]                                               # (E, SL, RR)
+        win = cell_tp < cell_sl
+        loss = (cell_sl <= cell_tp) & (cell_sl < engine.n)
+        outcomes[part] = win.astype(np.int8) - loss.astype(np.int8)
+        if return_exits:
+            exits[part] = np.minimum(cell_sl, cell_tp)
+    if return_exits:
+        return outcomes, exits
+    return outcomes
+
+def summarize_grid(outcomes, stops_pips, rr_ratios):
+    """
+    Total_R, Win_Rate y Trades por celda a partir de la matriz de resultados.
+    """
+    rr = np.asarray(rr_ratios, dtype=np.float64)
+    wins = (outcomes == 1).sum(axis=0)
+    losses = (outcomes == -1).sum(axis=0)
+    trades = wins + losses
+    total_r = wins * rr[None, :] - losses * 1.0
+    win_rate = np.divide(wins, trades, out=np.zeros(trades.shape), where=trades > 0)
+
+    sl_col, rr_col = np.meshgrid(stops_pips, rr_ratios, indexing='ij')
+    return pd.DataFrame({
+        'SL_Pips': sl_col.ravel(),
+        'RR': rr_col.ravel(),
+        'Total_R': total_r.ravel(),
+        'Win_Rate': win_rate.ravel(),
+        'Trades': trades.ravel()
+    })
+
+def evaluate_grid(df, entries, stops_pips, rr_ratios, engine=None, pip_size=0.0001):
+    """
+    Evalúa la rejilla completa SL x RR (equivale a simulate_trade_vectorized por celda).
+    """
+    entry_indices = np.where(entries != 0)[0]
+    entry_prices = df['Close'].values[entry_indices]
+    entry_directions = np.asarray(entries)[entry_indices]
+    if engine is None:
+        engine = RangeExtremes(df['High'].values, df['Low'].values)
+    outcomes = resolve_grid_outcomes(engine, entry_indices, entry_prices, entry_directions, stops_pips, rr_ratios, pip_size=pip_size)
+    return summarize_grid(outcomes, stops_pips, rr_ratios)
+
+def walk_forward(df, entries, stops_pips, rr_ratios, in_sample_bars, out_sample_bars, engine=None, pip_size=0.0001):
+    """
+    Walk-forward sobre la rejilla SL x RR: ventanas IS/OOS rodantes de `out_sample_bars`.
+    Señales, matriz de resultados y R acumulados se calculan UNA vez para todo el
+    histórico; cada fold solo hace restas de sumas acumuladas.
+    En IS solo cuentan los trades cerrados antes del final de la ventana (sin mirar al OOS).
+    Retorna (folds DataFrame, equity OOS cosida como Serie de R acumulados).
+    """
+    entries = np.asarray(entries)
+    entry_indices = np.flatnonzero(entries)
+    if engine is None:
+        engine = RangeExtremes(df['High'].values, df['Low'].values)
+    outcomes, exits = resolve_grid_outcomes(engine, entry_indices, df['Close'].values[entry_indices],
+                                            entries[entry_indices], stops_pips, rr_ratios,
+                                            pip_size=pip_size, return_exits=True)
+
+    rr = np.asarray(rr_ratios, dtype=np.float64)
+    r_values = np.where(outcomes == 1, rr[None, None, :], np.where(outcomes == -1, -1.0, 0.0))
+    cum_r = np.concatenate([np.zeros((1,) + r_values.shape[1:]), np.cumsum(r_values, axis=0)])
+    last_exit = exits.reshape(len(exits), -1).max(axis=1) if len(exits) else exits.reshape(0)
+
+    folds = []
+    oos_parts = []
+    n_bars = len(df)
+    for is_start in range(0, n_bars - in_sample_bars, out_sample_bars):
+        is_end = is_start + in_sample_bars
+        oos_end = min(is_end + out_sample_bars, n_bars)
+        lo, mid, hi = np.searchsorted(entry_indices, [is_start, is_end, oos_end])
+
+        # R del IS por celda; se descuentan los trades que siguen abiertos al cierre del IS
+        is_r = cum_r[mid] - cum_r[lo]
+        late = lo + np.flatnonzero(last_exit[lo:mid] >= is_end)
+        if len(late):
+            is_r = is_r - np.where(exits[late] >= is_end, r_values[late], 0.0).sum(axis=0)
+
+        s_best, r_best = np.unravel_index(np.argmax(is_r), is_r.shape)
+        oos_r = r_values[mid:hi, s_best, r_best]
+        oos_parts.append(pd.Series(oos_r, index=df.index[entry_indices[mid:hi]]))
+        folds.append({
+            'IS_Start': df.index[is_start],
+            'OOS_Start': df.index[is_end],
+            'OOS_End': df.index[oos_end - 1],
+            'SL_Pips': stops_pips[s_best],
+            'RR': rr_ratios[r_best],
+            'IS_R': is_r[s_best, r_best],
+            'OOS_R': oos_r.sum(),
+            'OOS_Trades': int(np.count_nonzero(oos_r))
+        })
+
+    folds = pd.DataFrame(folds, columns=['IS_Start', 'OOS_Start', 'OOS_End', 'SL_Pips', 'RR', 'IS_R', 'OOS_R', 'OOS_Trades'])
+    equity = pd.concat(oos_parts).cumsum() if oos_parts else pd.Series(dtype=np.float64)
+    return folds, equity
 
-    # Fetch significant history
-    # 10k bars is fast now with vectorized logic
-    N_BARS = 10000 
-    TARGET_SYMBOL = "EURUSD" # Optimize on EURUSD
-    print(f"Fetching last {N_BARS} candles for {TARGET_SYMBOL}...")
-    df = bridge.get_data(TARGET_SYMBOL, settings.TIMEFRAME_LTF, n_bars=N_BARS)
+def load_history(symbol, n_bars, source="mt5"):
+    """
+    Histórico LTF desde MT5 (y se guarda en el BarStore) o solo desde el BarStore local.
+    source="store" no necesita terminal: sirve para optimizar offline en Linux.
+    """
+    store = BarStore(settings.BAR_STORE_DIR)
+    if source == "store":
+        df = store.read(symbol, settings.TIMEFRAME_LTF, n_bars=n_bars)
+        if df is None:
+            print(f"No stored data for {symbol} in {settings.BAR_STORE_DIR}")
+            return None
+        gaps = store.gaps(symbol, settings.TIMEFRAME_LTF, df.index[0], df.index[-1])
+        if gaps:
+            print(f"⚠️ {symbol}: {len(gaps)} gap(s) with missing bars in the stored history "
+                  f"(first: {pd.Timestamp(gaps[0][0], unit='s')} -> {pd.Timestamp(gaps[0][1], unit='s')})")
+        return df
+
+    from src.execution_bridge import MT5Handler # MetaTrader5 only needed for live data
+    bridge = MT5Handler(login=settings.MT5_LOGIN, password=settings.MT5_PASSWORD, server=settings.MT5_SERVER, store=store)
+    if not bridge.connect(): return None
+    df = bridge.get_data(symbol, settings.TIMEFRAME_LTF, n_bars=n_bars)
     bridge.shutdown()
+    return df
+
+def generate_entries(analyst, df, pip_size=0.0001):
+    """
+    Vector de entradas (1 BUY / -1 SELL / 0) con la lógica completa de producción.
+    El sesgo HTF se reconstruye desde las propias velas LTF.
+    """
+    htf_closes = aggregate(df, settings.TIMEFRAME_HTF)['Close']
+    trend_bias = TrendBias(settings.TIMEFRAME_HTF).bias_series(df, htf_closes)
+    signals = analyst.generate_signal_frame(df, trend_bias=trend_bias.values, point=pip_size / 10)
+    return signals['direction']
+
+def run_optimization(symbol="EURUSD", n_bars=10000, source="mt5", pip_size=0.0001, df=None,
+                     output_file='optimization_results.csv'):
+    """
+    Rejilla SL x RR sobre el histórico de `symbol`.
+    df: velas ya cargadas (benchmarks / datos sintéticos) en lugar de MT5 / BarStore.
+    output_file: CSV del heatmap (None = no guardar). Retorna el DataFrame de resultados.
+    """
+    print("--- Starting NATIVE Optimization Pipeline (Pandas) ---")
+    
+    # 1. Fetch Data (MT5 terminal or local bar store)
+    # First-touch search is O(log n) per trade, so 1M+ bars are fine
+    N_BARS = n_bars
+    TARGET_SYMBOL = symbol # Optimize on EURUSD by default
+    if df is None:
+        print(f"Fetching last {N_BARS} candles for {TARGET_SYMBOL} ({source})...")
+        df = load_history(TARGET_SYMBOL, N_BARS, source=source)
+    else:
+        df = df.copy()
     
     if df is None: return
 
@@ -102,12 +242,12 @@ def run_optimization():
     if 'Time' in df.columns: df.set_index('Time', inplace=True)
     df.index = pd.to_datetime(df.index)
 
-    # 3. Generate Signals
+    # 3. Generate Signals (same rules as live: direction, strength, trend gate)
     analyst = SMCAnalyst(swing_lookback=settings.SWING_LOOKBACK)
     print("Analyzing structure and generating signal vector...")
-    entries = analyst.generate_historical_signals(df)
+    entries = generate_entries(analyst, df, pip_size=pip_size)
     
-    n_signals = entries.sum()
+    n_signals = int((entries != 0).sum())
     print(f"Total Signals Generated: {n_signals}")
     
     if n_signals == 0:
@@ -121,26 +261,14 @@ def run_optimization():
     stops_pips = [5, 10, 15, 20, 30] # Pips
     rr_ratios = [1.5, 2.0, 3.0, 5.0, 10.0]
     
-    results = [] # (SL, RR, Total_R, WinRate)
+    # Sparse table built once, every (SL, RR) cell resolved in one batched pass
+    engine = RangeExtremes(df['High'].values, df['Low'].values)
+    res_df = evaluate_grid(df, entries, stops_pips, rr_ratios, engine=engine, pip_size=pip_size)
     
-    # We assume signals are BUY for the simulation logic above.
-    # The analyst 'TRAP SWEEP' logic returns BUY for Bull Trap sweep.
-    # So we simulate Longs.
-    
-    for sl in stops_pips:
-        row_res = []
-        for rr in rr_ratios:
-            total_r = simulate_trade_vectorized(df, entries, sl, rr)
-            results.append({
-                'SL_Pips': sl,
-                'RR': rr,
-                'Total_R': total_r
-            })
-            print(f". Tested SL={sl} pips, RR=1:{rr} -> Result: {total_r:.2f} R")
+    for row in res_df.itertuples():
+        print(f". Tested SL={row.SL_Pips} pips, RR=1:{row.RR} -> Result: {row.Total_R:.2f} R (WR {row.Win_Rate:.0%}, {row.Trades} trades)")
     
     # 5. Analysis
-    res_df = pd.DataFrame(results)
-    
     # Create Pivot Table (Heatmap style)
     pivot = res_df.pivot(index='SL_Pips', columns='RR', values='Total_R')
     
@@ -154,8 +282,47 @@ def run_optimization():
     print(f"Total Gain: {best['Total_R']:.2f} R")
     
     # Save
-    pivot.to_csv('optimization_results.csv')
-    print("Saved to optimization_results.csv")
+    if output_file:
+        pivot.to_csv(output_file)
+        print(f"Saved to {output_file}")
+    return res_df
+
+def run_walk_forward(symbol="EURUSD", n_bars=100000, source="mt5", pip_size=0.0001, in_sample_bars=8000, out_sample_bars=2000):
+    print("--- Starting WALK-FORWARD Optimization ---")
+    print(f"Fetching last {n_bars} candles for {symbol} ({source})...")
+    df = load_history(symbol, n_bars, source=source)
+    if df is None: return
+
+    df.columns = [x.capitalize() for x in df.columns]
+    if 'Time' in df.columns: df.set_index('Time', inplace=True)
+    df.index = pd.to_datetime(df.index)
+    if len(df) <= in_sample_bars:
+        print(f"Not enough bars for one fold ({len(df)} <= {in_sample_bars}).")
+        return
+
+    # Signals once for the whole history (rolling windows only look back)
+    analyst = SMCAnalyst(swing_lookback=settings.SWING_LOOKBACK)
+    entries = generate_entries(analyst, df, pip_size=pip_size)
+    print(f"Total Signals Generated: {int((entries != 0).sum())}")
+
+    stops_pips = [5, 10, 15, 20, 30] # Pips
+    rr_ratios = [1.5, 2.0, 3.0, 5.0, 10.0]
+    folds, equity = walk_forward(df, entries.values, stops_pips, rr_ratios, in_sample_bars, out_sample_bars, pip_size=pip_size)
+
+    print(f"\n=== WALK-FORWARD FOLDS (IS {in_sample_bars} / OOS {out_sample_bars} bars) ===")
+    print(folds.to_string(index=False))
+
+    total_oos = equity.iloc[-1] if len(equity) else 0.0
+    max_dd = (equity.cummax().clip(lower=0) - equity).max() if len(equity) else 0.0
+    print(f"\nStitched OOS: {total_oos:.2f} R over {int(folds['OOS_Trades'].sum())} trades | Max DD: {max_dd:.2f} R")
+
+    # Save
+    folds.to_csv('walk_forward_results.csv', index=False)
+    equity.rename('OOS_Equity_R').to_csv('walk_forward_equity.csv')
+    print("Saved to walk_forward_results.csv / walk_forward_equity.csv")
 
 if __name__ == "__main__":
-    run_optimization()
+    if "--walk-forward" in sys.argv:
+        run_walk_forward()
+    else:
+        run_optimization()
@@ -0,0 +1,179 @@
+import sys
+import os
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+# Add parent dir to sys path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import settings
+from src.smc_analyst import SMCAnalyst
+from src.bar_store import BarStore
+from src.trade_engine import RangeExtremes
+from src.optimization import resolve_grid_outcomes, summarize_grid, generate_entries
+
+# Filas del bloque compartido por símbolo
+ROW_HIGH, ROW_LOW, ROW_CLOSE, ROW_ENTRY = range(4)
+
+# Cache por proceso worker: nombre de memoria compartida -> (shm, datos, motor)
+_WORKER_CACHE = {}
+
+def pip_size_for(symbol, point=None):
+    """
+    Tamaño del pip: 10 puntos si conocemos el punto del broker, si no 0.01 para JPY.
+    """
+    if point:
+        return point * 10
+    return 0.01 if 'JPY' in symbol.upper() else 0.0001
+
+def _attach(shm_name, n_bars):
+    """
+    Adjunta (una vez por proceso) el bloque OHLC compartido y su sparse table.
+    """
+    cached = _WORKER_CACHE.get(shm_name)
+    if cached is None:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        data = np.ndarray((4, n_bars), dtype=np.float64, buffer=shm.buf)
+        engine = RangeExtremes(data[ROW_HIGH], data[ROW_LOW])
+        cached = (shm, data, engine)
+        _WORKER_CACHE[shm_name] = cached
+    return cached
+
+def _run_shard(symbol, shm_name, n_bars, pip_size, stops_block, rr_ratios):
+    """
+    Worker: evalúa un bloque de stops para un símbolo sobre la memoria compartida.
+    """
+    shm, data, engine = _attach(shm_name, n_bars)
+    directions = data[ROW_ENTRY]
+    entry_indices = np.flatnonzero(directions)
+    outcomes = resolve_grid_outcomes(engine, entry_indices, data[ROW_CLOSE][entry_indices],
+                                     directions[entry_indices], stops_block, rr_ratios, pip_size=pip_size)
+    res = summarize_grid(outcomes, stops_block, rr_ratios)
+    res.insert(0, 'Symbol', symbol)
+    return res
+
+def _share_symbol(df, entries):
+    """
+    Copia High/Low/Close + vector de entradas a un bloque de memoria compartida.
+    """
+    n_bars = len(df)
+    shm = shared_memory.SharedMemory(create=True, size=4 * n_bars * 8)
+    data = np.ndarray((4, n_bars), dtype=np.float64, buffer=shm.buf)
+    data[ROW_HIGH] = df['High'].values
+    data[ROW_LOW] = df['Low'].values
+    data[ROW_CLOSE] = df['Close'].values
+    data[ROW_ENTRY] = np.asarray(entries, dtype=np.float64)
+    return shm
+
+def fetch_history(symbols, n_bars, source="mt5"):
+    """
+    Histórico LTF de cada símbolo (proceso principal).
+    source="mt5": terminal (y se guarda en el BarStore); "store": solo BarStore local.
+    Retorna {symbol: (df, pip_size)}.
+    """
+    store = BarStore(settings.BAR_STORE_DIR)
+    history = {}
+    if source == "store":
+        for symbol in symbols:
+            df = store.read(symbol, settings.TIMEFRAME_LTF, n_bars=n_bars)
+            if df is None or df.empty:
+                print(f"No stored data for {symbol}")
+                continue
+            df.columns = [x.capitalize() for x in df.columns]
+            history[symbol] = (df, pip_size_for(symbol))
+        return history
+
+    from src.execution_bridge import MT5Handler
+    import MetaTrader5 as mt5
+
+    bridge = MT5Handler(login=settings.MT5_LOGIN, password=settings.MT5_PASSWORD, server=settings.MT5_SERVER, store=store)
+    if not bridge.connect(): return {}
+
+    for symbol in symbols:
+        print(f"Fetching last {n_bars} candles for {symbol}...")
+        df = bridge.get_data(symbol, settings.TIMEFRAME_LTF, n_bars=n_bars)
+        if df is None or df.empty: continue
+        info = mt5.symbol_info(symbol)
+        history[symbol] = (df, pip_size_for(symbol, info.point if info else None))
+    bridge.shutdown()
+    return history
+
+def run_parallel_optimization(history, stops_pips, rr_ratios, max_workers=None, block_size=2):
+    """
+    Reparte (símbolo, bloque de stops) en un pool de procesos.
+    history: {symbol: (df, pip_size)}. Retorna el resultado largo de todas las celdas.
+    """
+    analyst = SMCAnalyst(swing_lookback=settings.SWING_LOOKBACK)
+    shared = []
+    results = []
+    try:
+        jobs = []
+        for symbol, (df, pip_size) in history.items():
+            entries = generate_entries(analyst, df, pip_size=pip_size)
+            print(f"[{symbol}] {len(df)} bars, {int(np.count_nonzero(entries))} signals")
+            shm = _share_symbol(df, entries)
+            shared.append(shm)
+            for start in range(0, len(stops_pips), block_size):
+                jobs.append((symbol, shm.name, len(df), pip_size, list(stops_pips[start:start + block_size]), list(rr_ratios)))
+
+        max_workers = max_workers or os.cpu_count()
+        print(f"Running {len(jobs)} shards on {max_workers} workers...")
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_run_shard, *job) for job in jobs]
+            for future in as_completed(futures):
+                results.append(future.result())
+    finally:
+        for shm in shared:
+            shm.close()
+            shm.unlink()
+
+    if not results:
+        return pd.DataFrame(columns=['Symbol', 'SL_Pips', 'RR', 'Total_R', 'Win_Rate', 'Trades'])
+    report = pd.concat(results, ignore_index=True)
+    return report.sort_values(['Symbol', 'SL_Pips', 'RR']).reset_index(drop=True)
+
+def merge_heatmaps(report):
+    """
+    Heatmap por símbolo + heatmap agregado de la cesta (suma de R).
+    """
+    heatmaps = {symbol: grp.pivot(index='SL_Pips', columns='RR', values='Total_R')
+                for symbol, grp in report.groupby('Symbol')}
+    basket = report.groupby(['SL_Pips', 'RR'], as_index=False)['Total_R'].sum()
+    heatmaps['BASKET'] = basket.pivot(index='SL_Pips', columns='RR', values='Total_R')
+    return heatmaps
+
+def run_basket_optimization(symbols=None, n_bars=10000, max_workers=None, source="mt5"):
+    print("--- Starting PARALLEL Basket Optimization ---")
+    symbols = symbols or settings.SYMBOLS
+
+    # Grid
+    stops_pips = [5, 10, 15, 20, 30] # Pips
+    rr_ratios = [1.5, 2.0, 3.0, 5.0, 10.0]
+
+    history = fetch_history(symbols, n_bars, source=source)
+    if not history:
+        print("No data available.")
+        return
+
+    t0 = time.time()
+    report = run_parallel_optimization(history, stops_pips, rr_ratios, max_workers=max_workers)
+    print(f"Grid evaluated in {time.time() - t0:.1f}s")
+
+    heatmaps = merge_heatmaps(report)
+    for name, pivot in heatmaps.items():
+        print(f"\n=== {name} HEATMAP (Total R-Multiples) ===")
+        print(pivot.to_string())
+
+    best = report.loc[report.groupby('Symbol')['Total_R'].idxmax()]
+    print("\nWINNER CONFIGURATION PER SYMBOL:")
+    print(best[['Symbol', 'SL_Pips', 'RR', 'Total_R', 'Win_Rate', 'Trades']].to_string(index=False))
+
+    # Save
+    report.to_csv('optimization_report.csv', index=False)
+    print("Saved to optimization_report.csv")
+
+if __name__ == "__main__":
+    run_basket_optimization()
@@ -0,0 +1,79 @@
+import sys
+import os
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Add parent dir to sys path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Velas que necesita el gráfico (draw_spectacular_trade usa las últimas 200)
+SNAPSHOT_BARS = 200
+SNAPSHOT_COLUMNS = ['Open', 'High', 'Low', 'Close']
+
+def _warm_up():
+    # Importa matplotlib/mplfinance al arrancar el worker, no en el primer trade
+    import src.visual_backtest  # noqa: F401
+
+def _render(snapshot, trade_info):
+    from src.visual_backtest import render_trade_png
+    return render_trade_png(snapshot, trade_info)
+
+
+class RenderService:
+    """
+    Renderizado de gráficos de auditoría en un pool de procesos.
+
+    submit() copia un snapshot pequeño (cola del DataFrame + trade_info) y
+    vuelve al instante; cuando el PNG está listo (bytes en memoria, sin
+    disco) se llama a `callback(png_bytes)`, o `callback(None)` si falló.
+    Con `max_pending` trabajos en curso los nuevos se descartan (submit
+    devuelve False) para que una ráfaga de fills nunca frene al loop.
+    """
+
+    def __init__(self, max_workers=1, max_pending=4, metrics=None):
+        self.max_pending = max_pending
+        self.metrics = metrics # Optional Metrics: submit -> PNG latency (stage="render")
+        self.pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_warm_up)
+        self.pending = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self.pool.submit(int) # Spawn the workers now, not on the first fill
+
+    def submit(self, df, trade_info, callback):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.dropped += 1
+                print(f"      [Render] Backlog full, chart dropped ({self.dropped} so far).")
+                return False
+            self.pending += 1
+
+        snapshot = df[SNAPSHOT_COLUMNS].tail(SNAPSHOT_BARS).copy()
+        try:
+            future = self.pool.submit(_render, snapshot, dict(trade_info))
+        except Exception as e:
+            with self._lock:
+                self.pending -= 1
+            print(f"      [Render] Error: {e}")
+            return False
+        start = time.perf_counter()
+        future.add_done_callback(lambda done: self._finished(done, callback, start))
+        return True
+
+    def _finished(self, future, callback, start):
+        with self._lock:
+            self.pending -= 1
+        if self.metrics is not None:
+            self.metrics.observe('stage_seconds', time.perf_counter() - start, stage='render')
+        png = None
+        try:
+            png = future.result()
+        except Exception as e:
+            print(f"      [Render] Error: {e}")
+        try:
+            callback(png)
+        except Exception as e:
+            print(f"      [Render] Callback Error: {e}")
+
+    def close(self, wait=True):
+        self.pool.shutdown(wait=wait)
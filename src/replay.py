@@ -0,0 +1,517 @@
+import sys
+import os
+import io
+import time
+import asyncio
+import tempfile
+import contextlib
+import numpy as np
+import pandas as pd
+from types import SimpleNamespace
+
+# Add parent dir to sys path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import settings
+from src.bar_store import BarStore
+from src.timeframes import timeframe_seconds
+from src.bar_aggregator import aggregate_arrays
+from src.execution_bridge import ORDER_TYPE_BUY, ORDER_TYPE_SELL
+from src.journal import TradeJournal
+from src.metrics import Metrics
+from src.analytics import deal_arrays, trade_frame, performance_stats
+
+class ReplayFinished(Exception):
+    """
+    El reloj simulado llegó al final del histórico: fin del replay.
+    """
+
+
+class SimulatedClock:
+    """
+    Reloj con la interfaz de SystemClock: sleep() avanza el tiempo al instante.
+    gaps: [(inicio, fin)] con el mercado cerrado (fines de semana); el reloj
+    salta al fin del hueco en lugar de simular pasadas en las que nada cambia.
+    """
+
+    def __init__(self, start, end, gaps=None):
+        self.now = float(start)
+        self.end = float(end)
+        gaps = np.asarray(gaps if gaps is not None else [], dtype=np.float64).reshape(-1, 2)
+        self.gap_starts, self.gap_ends = gaps[:, 0], gaps[:, 1]
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+        k = int(np.searchsorted(self.gap_starts, self.now, side='right')) - 1
+        if k >= 0 and self.now < self.gap_ends[k]:
+            self.now = float(self.gap_ends[k])
+        if self.now >= self.end:
+            raise ReplayFinished()
+
+
+class ReplayNotifier:
+    """
+    Sustituye a TelegramNotifier: solo cuenta las alertas.
+    """
+
+    def __init__(self):
+        self.sent = []
+
+    def send_alert(self, message, image_path=None, image_bytes=None):
+        self.sent.append(message)
+        return True
+
+    def close(self, timeout=None):
+        return True
+
+
+def default_spec(symbol, price):
+    """
+    Especificación aproximada cuando no hay symbol_info real (cuenta en divisa cotizada).
+    """
+    name = symbol.upper()
+    if 'XAU' in name:
+        point, contract = 0.01, 100
+    elif 'JPY' in name:
+        point, contract = 0.001, 100000
+    elif price > 500:
+        point, contract = 0.01, 1 # Indices / crypto CFDs
+    else:
+        point, contract = 0.00001, 100000
+    return SimpleNamespace(name=symbol, point=point, digits=int(round(-np.log10(point))),
+                           trade_contract_size=contract, trade_tick_size=point,
+                           trade_tick_value=point * contract,
+                           volume_min=0.01, volume_max=100.0, volume_step=0.01)
+
+
+class ReplayBroker:
+    """
+    Broker con la interfaz de MT5Handler que reproduce velas del BarStore
+    contra un SimulatedClock, para correr el loop real (main.main) offline.
+
+    - get_data: velas con apertura <= ahora; la última es la vela en formación,
+      reconstruida como su primer tick (O = H = L = C = Open).
+    - Ticks: bid = apertura de la vela en formación, ask = bid + spread.
+    - Posiciones: SL/TP se resuelven con las velas LTF cerradas (SL primero
+      si ambos caen en la misma vela, como en el optimizador).
+    """
+
+    def __init__(self, store, symbols, clock=None, timeframes=None, balance=10000.0,
+                 spread_points=10, leverage=100, specs=None):
+        self.store = store
+        self.symbols = list(symbols)
+        self.clock = clock
+        self.timeframes = timeframes or [settings.TIMEFRAME_LTF, settings.TIMEFRAME_HTF]
+        self.ltf = self.timeframes[0]
+        self.balance = float(balance)
+        self.spread_points = spread_points
+        self.leverage = leverage
+        self.bars = {}       # (symbol, tf) -> dict de arrays
+        self.specs = {}
+        self.open_positions = {} # ticket -> SimpleNamespace
+        self.closed_trades = []
+        self.next_ticket = 1
+        self.connected = False
+
+        for symbol in self.symbols:
+            for timeframe in self.timeframes:
+                self.bars[(symbol, timeframe)] = self._load(symbol, timeframe)
+            ltf = self.bars[(symbol, self.ltf)]
+            self.specs[symbol] = (specs or {}).get(symbol) or default_spec(symbol, float(ltf['close'][-1]))
+
+    def _load(self, symbol, timeframe):
+        arrays = self.store.read_arrays(symbol, timeframe)
+        if arrays is not None:
+            return {column: np.asarray(values) for column, values in arrays.items()}
+        if timeframe == self.ltf:
+            raise ValueError(f"No stored {timeframe} bars for {symbol}")
+        # HTF no guardado: se agrega desde el LTF
+        ltf = self._load(symbol, self.ltf)
+        volumes = ltf['tick_volume'] if 'tick_volume' in ltf else None
+        bars = aggregate_arrays(pd.to_datetime(ltf['time'], unit='s'), ltf['open'], ltf['high'], ltf['low'],
+                                ltf['close'], volumes, timeframe)
+        return {
+            'time': bars['time'].values.astype('datetime64[s]').astype(np.int64),
+            'open': bars['open'],
+            'high': bars['high'],
+            'low': bars['low'],
+            'close': bars['close'],
+            'tick_volume': bars['volume'],
+        }
+
+    def time_range(self, warmup_bars=500):
+        """
+        (inicio, fin) en epoch segundos comunes a todos los símbolos, dejando `warmup_bars` de histórico.
+        """
+        period = timeframe_seconds(self.ltf)
+        start = max(int(self.bars[(s, self.ltf)]['time'][min(warmup_bars, len(self.bars[(s, self.ltf)]['time']) - 1)]) for s in self.symbols)
+        end = min(int(self.bars[(s, self.ltf)]['time'][-1]) + period for s in self.symbols)
+        return start, end
+
+    def closed_gaps(self):
+        """
+        Tramos (inicio, fin) sin ninguna vela LTF de ningún símbolo: el mercado cerrado.
+        """
+        period = timeframe_seconds(self.ltf)
+        times = np.unique(np.concatenate([self.bars[(s, self.ltf)]['time'] for s in self.symbols]))
+        gaps = np.flatnonzero(np.diff(times) > period)
+        return np.column_stack([times[gaps] + period, times[gaps + 1]])
+
+    # --- Broker interface (same as MT5Handler) ---
+
+    def connect(self):
+        self.connected = True
+        return True
+
+    def shutdown(self):
+        self.connected = False
+
+    def is_connected(self):
+        return self.connected
+
+    def server_time(self, symbol=None):
+        """
+        Hora del último tick, como MT5: con el mercado cerrado se congela en el
+        último segundo de la última vela abierta.
+        """
+        now = int(self.clock.time())
+        period = timeframe_seconds(self.ltf)
+        symbols = [symbol] if symbol in self.symbols else self.symbols
+        opens = [t for t in (self._last_open(s) for s in symbols) if t is not None]
+        if not opens: return None
+        return min(now, max(opens) + period - 1)
+
+    def _last_open(self, symbol):
+        stop = self._visible(symbol, self.ltf)
+        return int(self.bars[(symbol, self.ltf)]['time'][stop - 1]) if stop else None
+
+    def _visible(self, symbol, timeframe):
+        # Número de velas abiertas hasta ahora (la última está en formación)
+        times = self.bars[(symbol, timeframe)]['time']
+        return int(np.searchsorted(times, self.clock.time(), side='right'))
+
+    def get_data(self, symbol, timeframe, n_bars=1000):
+        data = self.bars.get((symbol, timeframe))
+        if data is None: return None
+        stop = self._visible(symbol, timeframe)
+        if stop == 0: return None
+        start = max(0, stop - n_bars)
+
+        frame = pd.DataFrame({
+            'Open': data['open'][start:stop],
+            'High': data['high'][start:stop].copy(),
+            'Low': data['low'][start:stop].copy(),
+            'Close': data['close'][start:stop].copy(),
+            'Volume': data['tick_volume'][start:stop] if 'tick_volume' in data else 0.0,
+        }, index=pd.DatetimeIndex(pd.to_datetime(data['time'][start:stop], unit='s'), name='Time'))
+        # Vela en formación: solo su primer tick
+        opening = frame['Open'].iat[-1]
+        frame.iloc[-1, 1:4] = opening
+        return frame
+
+    def get_tick(self, symbol):
+        data = self.bars[(symbol, self.ltf)]
+        stop = self._visible(symbol, self.ltf)
+        if stop == 0: return None
+        bid = float(data['open'][stop - 1])
+        ask = bid + self.spread_points * self.specs[symbol].point
+        return SimpleNamespace(time=int(self.clock.time()), bid=bid, ask=ask, last=bid)
+
+    def symbol_info(self, symbol):
+        return self.specs.get(symbol)
+
+    def get_account_info(self):
+        self._settle()
+        floating = sum(self._pnl(pos, self._mark(pos)) for pos in self.open_positions.values())
+        margin = sum(self.calc_margin(pos.type, pos.symbol, pos.volume, pos.price_open) for pos in self.open_positions.values())
+        equity = self.balance + floating
+        return SimpleNamespace(balance=self.balance, equity=equity, margin=margin, margin_free=equity - margin)
+
+    def positions(self, symbol=None, ticket=None):
+        self._settle()
+        found = [pos for pos in self.open_positions.values()
+                 if (symbol is None or pos.symbol == symbol) and (ticket is None or pos.ticket == ticket)]
+        return tuple(found)
+
+    def calc_margin(self, order_type, symbol, volume, price):
+        return volume * self.specs[symbol].trade_contract_size * price / self.leverage
+
+    def modify_position(self, ticket, symbol, stop_loss, take_profit):
+        pos = self.open_positions.get(ticket)
+        if pos is None: return False
+        pos.sl, pos.tp = stop_loss, take_profit
+        return True
+
+    def place_market_order(self, symbol, order_type, volume, stop_loss, take_profit):
+        tick = self.get_tick(symbol)
+        if tick is None: return None
+        is_buy = order_type in ('BUY', ORDER_TYPE_BUY)
+        price = tick.ask if is_buy else tick.bid
+        # Mismo rechazo que el servidor: stops del lado equivocado
+        if (is_buy and not stop_loss < price < take_profit) or (not is_buy and not take_profit < price < stop_loss):
+            print("Order Failed: Invalid stops")
+            return None
+
+        ticket = self.next_ticket
+        self.next_ticket += 1
+        self.open_positions[ticket] = SimpleNamespace(
+            ticket=ticket, symbol=symbol, type=ORDER_TYPE_BUY if is_buy else ORDER_TYPE_SELL,
+            volume=float(volume), price_open=price, sl=float(stop_loss), tp=float(take_profit),
+            time=tick.time, next_bar=self._visible(symbol, self.ltf) - 1, profit=0.0)
+        return SimpleNamespace(order=ticket, retcode=10009, price=price, volume=float(volume), comment="Replay")
+
+    def place_limit_order(self, symbol, order_type, price, stop_loss, take_profit, volume):
+        return None # Pending orders are not simulated
+
+    def history_deals(self, date_from, date_to):
+        """
+        Deals de las operaciones cerradas (entrada + salida), con los campos de history_deals_get.
+        """
+        self._settle()
+        deals = []
+        for trade in self.closed_trades:
+            exit_type = ORDER_TYPE_SELL if trade['type'] == ORDER_TYPE_BUY else ORDER_TYPE_BUY
+            for entry, deal_type, deal_time, price, profit in ((0, trade['type'], trade['open_time'], trade['entry'], 0.0),
+                                                               (1, exit_type, trade['close_time'], trade['exit'], trade['profit'])):
+                if date_from <= deal_time <= date_to:
+                    deals.append({'time': int(deal_time), 'ticket': len(deals) + 1, 'position_id': trade['ticket'],
+                                  'symbol': trade['symbol'], 'type': deal_type, 'entry': entry, 'volume': trade['volume'],
+                                  'price': price, 'profit': profit, 'commission': 0.0, 'swap': 0.0})
+        return deals
+
+    # --- Simulación de posiciones ---
+
+    def _mark(self, pos):
+        tick = self.get_tick(pos.symbol)
+        return tick.bid if pos.type == ORDER_TYPE_BUY else tick.ask
+
+    def _pnl(self, pos, exit_price):
+        spec = self.specs[pos.symbol]
+        direction = 1 if pos.type == ORDER_TYPE_BUY else -1
+        return (exit_price - pos.price_open) * direction / spec.trade_tick_size * spec.trade_tick_value * pos.volume
+
+    def _settle(self):
+        """
+        Cierra las posiciones cuyo SL/TP tocaron las velas LTF cerradas desde la última revisión.
+        """
+        if not self.open_positions: return
+        period = timeframe_seconds(self.ltf)
+        for ticket, pos in list(self.open_positions.items()):
+            data = self.bars[(pos.symbol, self.ltf)]
+            closed = int(np.searchsorted(data['time'], self.clock.time() - period, side='right'))
+            if closed <= pos.next_bar:
+                continue
+            window = slice(pos.next_bar, closed)
+            if pos.type == ORDER_TYPE_BUY:
+                hit_sl = data['low'][window] <= pos.sl
+                hit_tp = data['high'][window] >= pos.tp
+            else:
+                hit_sl = data['high'][window] >= pos.sl
+                hit_tp = data['low'][window] <= pos.tp
+            hits = hit_sl | hit_tp
+            if not hits.any():
+                pos.next_bar = closed
+                continue
+
+            first = int(np.argmax(hits))
+            exit_price = pos.sl if hit_sl[first] else pos.tp
+            profit = self._pnl(pos, exit_price)
+            self.balance += profit
+            self.closed_trades.append({
+                'ticket': ticket, 'symbol': pos.symbol, 'type': pos.type, 'volume': pos.volume,
+                'entry': pos.price_open, 'exit': exit_price, 'profit': profit,
+                'open_time': pos.time, 'close_time': int(data['time'][pos.next_bar + first]) + period
+            })
+            del self.open_positions[ticket]
+
+
+class ReplayExchange:
+    """
+    Exchange con la interfaz CCXT que usan CCXTSMCBot / AsyncCCXTSMCBot, servido
+    con las velas y el reloj de un ReplayBroker (misma vela en formación).
+    Spot: las órdenes market se llenan al bid/ask y mueven la cartera
+    (USDT <-> activo base); sin saldo suficiente se rechazan, como en el exchange.
+    """
+
+    def __init__(self, broker, quote='USDT'):
+        self.broker = broker
+        self.quote = quote
+        self.balances = {quote: broker.balance}
+        self.markets = {symbol.split('/')[0]: symbol for symbol in broker.symbols} # Activo base -> símbolo
+        self.orders = []
+        self.requests = 0
+
+    def _timeframe(self, timeframe):
+        # "15m" -> "M15": mismo periodo con el nombre del BarStore
+        seconds = timeframe_seconds(timeframe)
+        for name in self.broker.timeframes:
+            if timeframe_seconds(name) == seconds:
+                return name
+        raise ValueError(f"No replay bars for timeframe {timeframe}")
+
+    def milliseconds(self):
+        return int(self.broker.clock.time() * 1000)
+
+    def fetch_time(self):
+        return self.milliseconds()
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.requests += 1
+        name = self._timeframe(timeframe)
+        data = self.broker.bars[(symbol, name)]
+        visible = self.broker._visible(symbol, name)
+        if since is not None:
+            # Como CCXT: las `limit` primeras velas desde `since`
+            start = int(np.searchsorted(data['time'], since / 1000))
+            stop = visible if limit is None else min(visible, start + limit)
+        else:
+            stop = visible
+            start = max(0, stop - (limit or 500))
+        if start >= stop: return []
+
+        window = slice(start, stop)
+        volume = data['tick_volume'][window] if 'tick_volume' in data else np.zeros(stop - start)
+        rows = np.column_stack([data['open'][window], data['high'][window], data['low'][window],
+                                data['close'][window], volume])
+        if stop == visible:
+            rows[-1, 1:4] = rows[-1, 0] # Vela en formación: solo su primer tick
+        return [[int(t) * 1000] + row for t, row in zip(data['time'][window], rows.tolist())]
+
+    def fetch_balance(self):
+        self.requests += 1
+        return {currency: {'free': amount, 'used': 0.0, 'total': amount} for currency, amount in self.balances.items()}
+
+    def create_order(self, symbol, type, side, amount, price=None, params=None):
+        self.requests += 1
+        tick = self.broker.get_tick(symbol)
+        if tick is None:
+            raise ValueError(f"No market for {symbol}")
+        base = symbol.split('/')[0]
+        fill = tick.ask if side == 'buy' else tick.bid
+        cost = amount * fill
+        pay, pay_amount, get, get_amount = (self.quote, cost, base, amount) if side == 'buy' else (base, amount, self.quote, cost)
+        if self.balances.get(pay, 0.0) < pay_amount:
+            raise ValueError(f"Insufficient {pay} balance")
+        self.balances[pay] -= pay_amount
+        self.balances[get] = self.balances.get(get, 0.0) + get_amount
+
+        order = {'id': str(len(self.orders) + 1), 'symbol': symbol, 'type': type, 'side': side, 'amount': amount,
+                 'filled': amount, 'price': fill, 'average': fill, 'cost': cost, 'status': 'closed',
+                 'timestamp': self.milliseconds()}
+        self.orders.append(order)
+        return order
+
+    def equity(self):
+        """
+        Cartera valorada al bid actual (en divisa cotizada).
+        """
+        return sum(amount if currency == self.quote else amount * self.broker.get_tick(self.markets[currency]).bid
+                   for currency, amount in self.balances.items())
+
+
+class AsyncReplayExchange(ReplayExchange):
+    """
+    Misma fuente con la interfaz de ccxt.async_support.
+    """
+
+    async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        return super().fetch_ohlcv(symbol, timeframe, since, limit)
+
+    async def fetch_balance(self):
+        return super().fetch_balance()
+
+    async def fetch_time(self):
+        return super().fetch_time()
+
+    async def create_order(self, symbol, type, side, amount, price=None, params=None):
+        return super().create_order(symbol, type, side, amount, price, params)
+
+    async def close(self):
+        pass
+
+
+ENGINES = ('mt5', 'ccxt', 'ccxt_async')
+
+def run_replay(symbols=None, days=30, store_dir=None, quiet=True, engine='mt5'):
+    """
+    Reproduce `days` días del BarStore a través del loop real y mide el throughput.
+    engine: 'mt5' (main.main), 'ccxt' (CCXTSMCBot.run) o 'ccxt_async' (AsyncCCXTSMCBot.run).
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown replay engine: {engine} (expected one of {ENGINES})")
+
+    symbols = symbols or settings.SYMBOLS
+    store = BarStore(store_dir or settings.BAR_STORE_DIR)
+    broker = ReplayBroker(store, symbols)
+    first, last = broker.time_range()
+    start = max(first, last - days * 86400)
+    clock = SimulatedClock(start, last, gaps=broker.closed_gaps())
+    broker.clock = clock
+    notifier = ReplayNotifier()
+    journal = TradeJournal(os.path.join(tempfile.mkdtemp(), 'replay_journal.db'), bot='MT5' if engine == 'mt5' else 'CCXT',
+                           clock=clock)
+    metrics = Metrics()
+    exchange = None
+
+    n_bars = sum(int(np.count_nonzero((broker.bars[(s, broker.ltf)]['time'] >= start) &
+                                      (broker.bars[(s, broker.ltf)]['time'] < last))) for s in symbols)
+    print(f"[Replay] {engine} | {len(symbols)} symbols | {pd.Timestamp(start, unit='s')} -> {pd.Timestamp(last, unit='s')} | {n_bars} bars")
+
+    t0 = time.perf_counter()
+    output = io.StringIO() if quiet else sys.stdout
+    try:
+        with contextlib.redirect_stdout(output):
+            if engine == 'mt5':
+                from src.main import main
+                main(bridge=broker, clock=clock, notifier=notifier, symbols=symbols, charts=False, journal=journal,
+                     metrics=metrics)
+            elif engine == 'ccxt':
+                from src.main_ccxt import CCXTSMCBot
+                exchange = ReplayExchange(broker)
+                CCXTSMCBot(exchange=exchange, symbols=symbols, journal=journal, metrics=metrics, clock=clock,
+                           store=BarStore(tempfile.mkdtemp())).run()
+            else:
+                from src.main_ccxt_async import AsyncCCXTSMCBot
+                exchange = AsyncReplayExchange(broker)
+                asyncio.run(AsyncCCXTSMCBot(exchange=exchange, symbols=symbols, journal=journal, metrics=metrics,
+                                            clock=clock, store=BarStore(tempfile.mkdtemp())).run())
+    except ReplayFinished:
+        pass
+    elapsed = time.perf_counter() - t0
+    journal.close()
+
+    simulated = clock.time() - start
+    print(f"[Replay] {elapsed:.1f}s wall | {n_bars / elapsed:,.0f} bars/s | x{simulated / elapsed:,.0f} real time")
+    if exchange is None:
+        wins = sum(1 for trade in broker.closed_trades if trade['profit'] > 0)
+        print(f"[Replay] Orders: {broker.next_ticket - 1} | Closed: {len(broker.closed_trades)} ({wins} wins) | "
+              f"Open: {len(broker.open_positions)} | Balance: {broker.balance:.2f} | Alerts: {len(notifier.sent)}")
+        trades = trade_frame(deal_arrays(broker.history_deals(start, clock.time())))
+        stats = performance_stats(trades['pnl'], start_balance=broker.balance - trades['pnl'].sum())
+        print(f"[Replay] PF: {stats['profit_factor']:.2f} | Expectancy: {stats['expectancy']:.2f} | "
+              f"Max DD: {stats['max_drawdown']:.2f} ({stats['max_drawdown_pct']:.2%})")
+        orders, balance = broker.next_ticket - 1, broker.balance
+    else:
+        # Spot sin SL/TP en el exchange (el bot solo los registra): no hay operaciones cerradas
+        holdings = sum(1 for currency, amount in exchange.balances.items() if currency != exchange.quote and amount > 0)
+        print(f"[Replay] Orders: {len(exchange.orders)} | Requests: {exchange.requests} | Holdings: {holdings} | "
+              f"{exchange.quote}: {exchange.balances[exchange.quote]:.2f} | Equity: {exchange.equity():.2f}")
+        orders, balance = len(exchange.orders), exchange.equity()
+    stages = sorted(((labels[0][1], h) for (name, labels), h in metrics.snapshot().items() if name == 'stage_seconds'),
+                    key=lambda item: -item[1]['sum'])
+    print("[Replay] Stages: " + ' | '.join(f"{stage} {h['sum']:.2f}s (p50 {h[0.5] * 1e3:.2f} ms, p99 {h[0.99] * 1e3:.2f} ms)"
+                                          for stage, h in stages))
+    counts = journal.query()['event'].value_counts().to_dict()
+    print(f"[Replay] Journal: {journal.path} | " + ' | '.join(f"{event}: {n}" for event, n in sorted(counts.items())))
+    return {
+        'symbols': len(symbols), 'bars': n_bars, 'seconds': elapsed, 'bars_per_second': n_bars / elapsed,
+        'orders': orders, 'closed_trades': broker.closed_trades, 'balance': balance
+    }
+
+if __name__ == "__main__":
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    engine = sys.argv[2] if len(sys.argv) > 2 else 'mt5'
+    run_replay(days=days, engine=engine)
@@ -0,0 +1,107 @@
+import sys
+import os
+import time
+from collections import OrderedDict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.timeframes import timeframe_seconds
+
+class SystemClock:
+    """
+    Reloj real (el replay puede inyectar uno simulado con la misma interfaz).
+    """
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class BarCloseScheduler:
+    """
+    Planificador por cierre de vela.
+    Conoce los límites del timeframe en hora del servidor y despierta el
+    análisis justo después de cada cierre (+ settle_delay). Entre cierres
+    solo se ejecutan tareas ligeras cada `duty_interval` segundos.
+    """
+
+    def __init__(self, timeframe, settle_delay=2.0, duty_interval=10.0, clock=None):
+        self.period = timeframe_seconds(timeframe)
+        self.settle_delay = settle_delay
+        self.duty_interval = duty_interval
+        self.clock = clock or SystemClock()
+        self.offset = 0.0           # Hora servidor - hora local (segundos)
+        self.last_boundary = None   # Último cierre entregado al pipeline
+
+    def sync(self, server_timestamp):
+        """
+        Ajusta el desfase con la hora del servidor (ej: tick.time de MT5).
+        """
+        self.offset = server_timestamp - self.clock.time()
+
+    def server_now(self):
+        return self.clock.time() + self.offset
+
+    def current_boundary(self, now=None):
+        """
+        Epoch (hora servidor) del último cierre de vela.
+        """
+        now = self.server_now() if now is None else now
+        return int(now // self.period) * self.period
+
+    def poll(self):
+        """
+        Devuelve el epoch del cierre pendiente de analizar o None.
+        El primer poll entrega el cierre actual para analizar al arrancar.
+        """
+        now = self.server_now()
+        boundary = self.current_boundary(now)
+        if self.last_boundary is not None:
+            if boundary <= self.last_boundary: return None
+            if now - boundary < self.settle_delay: return None
+        self.last_boundary = boundary
+        return boundary
+
+    def seconds_to_next_close(self):
+        """
+        Segundos hasta que el siguiente cierre (no entregado) esté listo.
+        """
+        now = self.server_now()
+        if self.last_boundary is None:
+            next_boundary = self.current_boundary(now) + self.period
+        else:
+            # Tras un hueco (mercado cerrado) el siguiente cierre es el actual, no last + period
+            next_boundary = max(self.last_boundary + self.period, self.current_boundary(now))
+        return next_boundary + self.settle_delay - now
+
+    def next_wait(self):
+        """
+        Segundos hasta la siguiente tarea ligera o el siguiente cierre, lo que llegue antes.
+        """
+        return max(0.0, min(self.duty_interval, self.seconds_to_next_close()))
+
+    def sleep(self):
+        self.clock.sleep(self.next_wait())
+
+
+class AnalysisMemo:
+    """
+    Resultados de análisis por (symbol, bar_time) de vela cerrada.
+    Una vela cerrada no cambia, así que su análisis se calcula una sola vez.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, symbol, bar_time):
+        return self._items.get((symbol, bar_time))
+
+    def put(self, symbol, bar_time, result):
+        self._items[(symbol, bar_time)] = result
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
@@ -3,10 +3,54 @@ import pandas as pd
 import numpy as np
 import sys
 import os
+from collections import deque
 
 # Ensure we can import config
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from config import settings
+from src.fvg import FVGIndex, open_fvgs
+from src.market_structure import MarketStructure, structure_frame
+from src.liquidity_levels import LiquidityIndex
+from src.timeframes import sync_start
+
+class LiquidityWindow:
+    """
+    Máximo/mínimo rodante de las últimas `lookback` velas cerradas.
+    Deques monótonas: cada vela entra y sale una sola vez (O(1) amortizado).
+    """
+
+    def __init__(self, lookback):
+        self.lookback = lookback
+        self.count = 0            # Velas cerradas procesadas
+        self.last_time = None     # Timestamp de la última vela cerrada
+        self._highs = deque()     # (pos, high) decreciente
+        self._lows = deque()      # (pos, low) creciente
+
+    def push(self, timestamp, high, low):
+        pos = self.count
+        while self._highs and self._highs[-1][1] <= high:
+            self._highs.pop()
+        self._highs.append((pos, high))
+        while self._lows and self._lows[-1][1] >= low:
+            self._lows.pop()
+        self._lows.append((pos, low))
+
+        self.count += 1
+        self.last_time = timestamp
+        expired = self.count - self.lookback
+        while self._highs[0][0] < expired:
+            self._highs.popleft()
+        while self._lows[0][0] < expired:
+            self._lows.popleft()
+
+    @property
+    def high(self):
+        return self._highs[0][1] if self._highs else np.nan
+
+    @property
+    def low(self):
+        return self._lows[0][1] if self._lows else np.nan
+
 
 class SMCAnalyst:
     """
@@ -14,26 +58,119 @@ class SMCAnalyst:
     Estrategia: Liquidity Sweep + Range Reclaim (Turtle Soup Pattern)
     """
 
-    def __init__(self, swing_lookback=96):
+    def __init__(self, swing_lookback=96, streaming=False):
         # 96 velas M15 = 24 horas (Daily Cycle)
         self.swing_lookback = swing_lookback 
+        # Modo streaming: ventana de liquidez incremental por símbolo
+        self.streaming = streaming
+        self.windows = {} # symbol -> LiquidityWindow
+        # Fair Value Gaps abiertos por (símbolo, timeframe)
+        self.fvgs = FVGIndex()
+        # Estructura (swings, BOS, CHOCH) por (símbolo, timeframe)
+        self.structure = MarketStructure()
+        # Pools de liquidez (PDH/PDL, sesiones, swings) ordenados por precio; swings de self.structure
+        self.liquidity = LiquidityIndex(structure=self.structure)
         print(f"SMC_Analyst Pro initialized (Daily Liquidity Window={swing_lookback}).")
 
-    def analyze(self, df: pd.DataFrame, trend_bias=0, point=0.0001):
+    def analyze(self, df: pd.DataFrame, trend_bias=0, point=0.0001, symbol=None, timeframe=None):
         """
         Analiza setups con Liquidez Diaria + Reclamo.
         point: Valor del punto (ej: 0.00001 EURUSD, 0.001 JPY) para el calculo de SL.
+        symbol: En modo streaming, clave del estado incremental de liquidez.
+        Con symbol el resultado incluye además 'fvgs' (FVG abiertos), 'structure'
+        (tendencia, swings vigentes y último BOS/CHOCH) y 'liquidity' (niveles
+        barridos por la última vela y pools pendientes más cercanos), todos de
+        libros incrementales. Sin symbol no se recorre el histórico completo:
+        los backtests usan open_fvgs / structure_frame directamente.
         """
-        signal = self._check_candle_signal(df, -1, trend_bias, point)
-        
-        last_high = df['High'].iloc[-self.swing_lookback-1:-1].max()
-        last_low = df['Low'].iloc[-self.swing_lookback-1:-1].min()
-        
+        if self.streaming and symbol is not None:
+            result = self._analyze_streaming(df, symbol, trend_bias, point)
+        else:
+            signal = self._check_candle_signal(df, -1, trend_bias, point)
+
+            last_high = df['High'].iloc[-self.swing_lookback-1:-1].max()
+            last_low = df['Low'].iloc[-self.swing_lookback-1:-1].min()
+
+            result = {
+                'trap_zone': {'high_liq': last_high, 'low_liq': last_low},
+                'signal': signal
+            }
+
+        if symbol is not None:
+            result['fvgs'] = self.open_fvgs(df, symbol, timeframe)
+            result['structure'] = self.market_structure(df, symbol, timeframe)
+            result['liquidity'] = self.liquidity_pools(df, symbol, timeframe)
+        return result
+
+    def open_fvgs(self, df, symbol=None, timeframe=None):
+        """
+        FVG sin rellenar: libro incremental por (symbol, timeframe) o cálculo directo.
+        """
+        if symbol is None:
+            return open_fvgs(df).drop(columns='Pos')
+        return self.fvgs.update(symbol, timeframe, df).frame()
+
+    def market_structure(self, df, symbol=None, timeframe=None):
+        """
+        Estado de estructura: libro incremental por (symbol, timeframe) o batch.
+        """
+        if symbol is None:
+            _, events, state = structure_frame(df)
+            state['last_event'] = events.iloc[-1].to_dict() if len(events) else None
+            return state
+        book, _ = self.structure.update(symbol, timeframe, df)
+        return book.snapshot()
+
+    def liquidity_pools(self, df, symbol, timeframe=None):
+        """
+        Barridos de la última vela cerrada contra todos los pools del símbolo.
+        """
+        book = self.liquidity.update(symbol, timeframe, df)
+        above, below = book.nearest(df['Close'].iloc[-1])
         return {
-            'trap_zone': {'high_liq': last_high, 'low_liq': last_low},
+            'swept_highs': book.last_sweeps[0],
+            'swept_lows': book.last_sweeps[1],
+            'above': above,
+            'below': below,
+            'levels': len(book.highs) + len(book.lows)
+        }
+
+    def _analyze_streaming(self, df, symbol, trend_bias, point):
+        """
+        Igual que analyze() pero la liquidez sale de la ventana incremental:
+        solo se procesan las velas cerradas nuevas desde la última llamada.
+        """
+        window = self._sync_window(df, symbol)
+
+        signal = None
+        if len(df) >= self.swing_lookback + 2:
+            current = df.iloc[-1]
+            signal = self._evaluate_candle(current, window.high, window.low, trend_bias, point)
+
+        return {
+            'trap_zone': {'high_liq': window.high, 'low_liq': window.low},
             'signal': signal
         }
 
+    def _sync_window(self, df, symbol):
+        # La última fila es la vela en formación: la ventana solo ve cerradas
+        index = df.index
+        n_closed = len(df) - 1
+        window = self.windows.get(symbol)
+
+        start = sync_start(index[:n_closed], window.last_time) if window is not None else None
+        if start is None:
+            # Arranque o hueco: sembramos con las últimas `lookback` cerradas
+            window = LiquidityWindow(self.swing_lookback)
+            self.windows[symbol] = window
+            start = max(0, n_closed - self.swing_lookback)
+
+        highs = df['High'].values
+        lows = df['Low'].values
+        for i in range(start, n_closed):
+            window.push(index[i], highs[i], lows[i])
+        return window
+
     def _check_candle_signal(self, df, idx, trend_bias=0, point=0.0001):
         if len(df) < self.swing_lookback + 2: return None
         
@@ -49,6 +186,12 @@ class SMCAnalyst:
         liq_high = window['High'].max()
         liq_low = window['Low'].min()
         
+        return self._evaluate_candle(current, liq_high, liq_low, trend_bias, point)
+
+    def _evaluate_candle(self, current, liq_high, liq_low, trend_bias=0, point=0.0001):
+        """
+        Reglas de la vela gatillo contra una ventana de liquidez ya calculada.
+        """
         # Métricas de la vela
         open_p, close_p, high_p, low_p = current['Open'], current['Close'], current['High'], current['Low']
         total_range = high_p - low_p
@@ -57,9 +200,6 @@ class SMCAnalyst:
         is_bullish = close_p > open_p
         is_bearish = close_p < open_p
         
-        last_candle_high = df['High'].iloc[idx-1]
-        last_candle_low = df['Low'].iloc[idx-1]
-        
         # --- FILTRO PRO: DESPLAZAMIENTO > 0.7 ---
         
         # SEÑAL COMPRA
@@ -134,3 +274,56 @@ class SMCAnalyst:
         signals = buy_cond | sell_cond
         
         return signals
+
+    def generate_signal_frame(self, df: pd.DataFrame, trend_bias=0, point=0.0001):
+        """
+        Versión vectorizada y completa de _check_candle_signal para todas las velas.
+        Aplica las mismas reglas que en vivo: dirección, fuerza > 0.7, SL mínimo
+        (FIXED_SL_PIPS) o 50% del rango, y filtro de tendencia.
+        trend_bias: escalar o array por vela (+1 / -1 / 0).
+        Retorna DataFrame: direction (1/-1/0), entry, sl, strength, reason.
+        """
+        n = len(df)
+        opens = df['Open'].values
+        highs = df['High'].values
+        lows = df['Low'].values
+        closes = df['Close'].values
+        bias = np.broadcast_to(np.asarray(trend_bias), (n,))
+
+        # Liquidez previa: ventana [i - lookback, i) como en el análisis en vivo
+        liq_high = df['High'].rolling(window=self.swing_lookback, closed='left').max().values
+        liq_low = df['Low'].rolling(window=self.swing_lookback, closed='left').min().values
+
+        total_range = highs - lows
+        valid = total_range != 0
+        if n < self.swing_lookback + 2:
+            valid = np.zeros(n, dtype=bool)
+        safe_range = np.where(valid, total_range, 1.0)
+
+        # SEÑAL COMPRA: barrido del mínimo + cierre en el 30% superior
+        buy_strength = (closes - lows) / safe_range
+        buy = (valid & (bias >= 0) & (lows < liq_low) & (closes > liq_low)
+               & (closes > opens) & (buy_strength > 0.7))
+
+        # SEÑAL VENTA: barrido del máximo + cierre en el 30% inferior
+        sell_strength = (highs - closes) / safe_range
+        sell = (valid & (bias <= 0) & (highs > liq_high) & (closes < liq_high)
+                & (closes < opens) & (sell_strength > 0.7) & ~buy)
+
+        # BLINDAJE: SL = max(FIXED_SL_PIPS, 50% de la vela)
+        min_sl_dist = settings.FIXED_SL_PIPS * (point * 10)
+        sl_dist = np.maximum(min_sl_dist, total_range * 0.5)
+
+        direction = np.where(buy, 1, np.where(sell, -1, 0)).astype(np.int8)
+        active = direction != 0
+        reason = np.full(n, None, dtype=object)
+        reason[buy] = 'DAILY_LOW_SWEEP_STRONG'
+        reason[sell] = 'DAILY_HIGH_SWEEP_STRONG'
+
+        return pd.DataFrame({
+            'direction': direction,
+            'entry': np.where(active, closes, np.nan),
+            'sl': np.where(buy, lows - sl_dist, np.where(sell, highs + sl_dist, np.nan)),
+            'strength': np.where(buy, buy_strength, np.where(sell, sell_strength, np.nan)),
+            'reason': reason
+        }, index=df.index)
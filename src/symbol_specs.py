@@ -0,0 +1,137 @@
+import sys
+import os
+import numpy as np
+
+# Add parent dir to sys path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.scheduler import SystemClock
+
+# Campos de symbol_info que necesita el cálculo de lotes
+SPEC_FIELDS = ('point', 'trade_tick_size', 'trade_tick_value', 'trade_contract_size',
+               'volume_step', 'volume_min', 'volume_max')
+
+
+def lot_sizes(entry, stop, risk_cash, point, tick_size, tick_value, volume_step, volume_min, volume_max,
+              margin_per_lot=None, margin_free=None):
+    """
+    Fórmula maestra de RiskGuardian.calculate_lot_size, vectorizada.
+    Todos los argumentos se combinan por broadcasting; 0.0 = no operar.
+    margin_per_lot / margin_free (opcionales): ajuste final por margen libre.
+    """
+    entry = np.asarray(entry, dtype=np.float64)
+    stop = np.asarray(stop, dtype=np.float64)
+    points_at_risk = np.abs(entry - stop)
+    tick_size = np.asarray(tick_size, dtype=np.float64)
+    tick_value = np.asarray(tick_value, dtype=np.float64)
+    step = np.asarray(volume_step, dtype=np.float64)
+
+    # LotSize = RiskCash / ((PointsAtRisk / TickSize) * TickValue)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        loss_per_lot = points_at_risk / tick_size * tick_value
+        raw_lot = risk_cash / loss_per_lot
+        lots = np.where(step > 0, np.round(raw_lot / step) * step, raw_lot)
+
+        # Margin Check (Final Guard)
+        if margin_per_lot is not None and margin_free is not None:
+            margin_req = lots * margin_per_lot
+            over = np.nan_to_num(margin_req) > margin_free
+            scaled = lots * (np.asarray(margin_free) * 0.95) / margin_req
+            scaled = np.where(step > 0, np.round(scaled / step) * step, scaled)
+            lots = np.where(over, scaled, lots)
+
+    lots = np.maximum(volume_min, np.minimum(lots, volume_max))
+    valid = ((entry != 0) & (stop != 0) & (points_at_risk >= point) &
+             (tick_size != 0) & (tick_value != 0) & (loss_per_lot != 0))
+    return np.where(valid, np.round(lots, 2), 0.0)
+
+
+class SymbolSpecRegistry:
+    """
+    Especificaciones de contrato por símbolo (point, tick size/value, volúmenes)
+    cargadas una vez del broker y refrescadas cada `ttl` segundos.
+    El cálculo de lotes queda en memoria; sin broker se rellenan con register()
+    (backtests).
+    """
+
+    def __init__(self, broker=None, symbols=None, ttl=3600, clock=None):
+        self.broker = broker
+        self.symbols = list(symbols or [])
+        self.ttl = ttl
+        self.clock = clock or SystemClock()
+        self.specs = {} # symbol -> dict
+        self.loaded_at = None
+
+    def register(self, symbol, info, margin_per_lot=np.nan):
+        """
+        Añade o sustituye la especificación de un símbolo (objeto tipo symbol_info o dict).
+        """
+        get = info.get if isinstance(info, dict) else lambda field: getattr(info, field)
+        spec = {field: float(get(field)) for field in SPEC_FIELDS}
+        spec['margin_per_lot'] = float(margin_per_lot)
+        self.specs[symbol] = spec
+        if symbol not in self.symbols:
+            self.symbols.append(symbol)
+        return spec
+
+    def refresh(self, symbols=None):
+        """
+        Recarga del broker; si un símbolo falla se conserva la especificación anterior.
+        """
+        if self.broker is None: return
+        for symbol in symbols or self.symbols:
+            info = self.broker.symbol_info(symbol)
+            if info is None:
+                print(f"[Specs] No symbol info for {symbol}")
+                continue
+            margin_per_lot = np.nan
+            try:
+                tick = self.broker.get_tick(symbol)
+                margin = self.broker.calc_margin('BUY', symbol, 1.0, tick.ask) if tick else None
+                if margin:
+                    margin_per_lot = margin
+            except Exception:
+                pass
+            self.register(symbol, info, margin_per_lot)
+        self.loaded_at = self.clock.time()
+
+    def get(self, symbol):
+        """
+        Especificación del símbolo (None si el broker no la conoce).
+        """
+        if self.loaded_at is None or self.clock.time() - self.loaded_at > self.ttl:
+            self.refresh()
+        if symbol not in self.specs and self.broker is not None:
+            self.refresh([symbol])
+        return self.specs.get(symbol)
+
+    def point(self, symbol, default=0.0001):
+        spec = self.get(symbol)
+        return spec['point'] if spec else default
+
+    def columns(self, symbols):
+        """
+        Columnas de especificación alineadas con `symbols` (una fila por elemento).
+        """
+        symbols = np.asarray(symbols)
+        names, inverse = np.unique(symbols, return_inverse=True)
+        specs = [self.get(name) for name in names]
+        missing = [name for name, spec in zip(names, specs) if spec is None]
+        if missing:
+            raise KeyError(f"No symbol specs for {missing}")
+        return {field: np.array([spec[field] for spec in specs])[inverse]
+                for field in SPEC_FIELDS + ('margin_per_lot',)}
+
+    def lot_sizes(self, symbols, entries, stops, risk_pct, balance, margin_free=None):
+        """
+        Lotes para un lote de (símbolo, entrada, stop); `symbols` puede ser un solo nombre.
+        """
+        entries = np.asarray(entries, dtype=np.float64)
+        symbols = np.broadcast_to(np.asarray(symbols), entries.shape)
+        spec = self.columns(symbols.ravel())
+        spec = {field: values.reshape(entries.shape) for field, values in spec.items()}
+        return lot_sizes(entries, stops, np.asarray(balance) * risk_pct,
+                         spec['point'], spec['trade_tick_size'], spec['trade_tick_value'],
+                         spec['volume_step'], spec['volume_min'], spec['volume_max'],
+                         margin_per_lot=spec['margin_per_lot'] if margin_free is not None else None,
+                         margin_free=margin_free)
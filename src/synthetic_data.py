@@ -0,0 +1,214 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import settings
+from src.timeframes import timeframe_seconds
+from src.liquidity_levels import SESSIONS
+
+# Perfil por símbolo: precio inicial, punto (tick) y volatilidad relativa por vela M15
+SYMBOL_PROFILES = {
+    'EURUSD': {'price': 1.10, 'point': 0.00001, 'vol': 0.00035},
+    'GBPUSD': {'price': 1.27, 'point': 0.00001, 'vol': 0.00045},
+    'AUDUSD': {'price': 0.66, 'point': 0.00001, 'vol': 0.00045},
+    'USDCAD': {'price': 1.36, 'point': 0.00001, 'vol': 0.00030},
+    'USDJPY': {'price': 150.0, 'point': 0.001, 'vol': 0.00040},
+    'GBPJPY': {'price': 190.0, 'point': 0.001, 'vol': 0.00055},
+    'XAUUSD': {'price': 2000.0, 'point': 0.01, 'vol': 0.00080},
+}
+DEFAULT_PROFILE = SYMBOL_PROFILES['EURUSD']
+
+# Multiplicadores de volatilidad: regímenes (calma / normal / expansión) y hora del servidor
+REGIMES = (0.5, 1.0, 2.2)
+SESSION_VOL = np.full(24, 0.7)
+for _name, (_start, _end) in SESSIONS.items():
+    SESSION_VOL[_start:_end] = {'ASIA': 0.6, 'LONDON': 1.3, 'NEW_YORK': 1.5}.get(_name, 1.0)
+
+GAP_VOL = 8.0 # Hueco de apertura del lunes (en velas de volatilidad)
+SWEEP_COLUMNS = ['Time', 'Pos', 'Direction', 'Level', 'Extreme', 'Entry']
+PLANTED_FVG_COLUMNS = ['Time', 'Pos', 'Direction', 'Top', 'Bottom']
+
+
+def trading_times(n_bars, start='2024-01-01', timeframe='M15', weekend_gaps=True):
+    """
+    Epoch (s) de apertura de `n_bars` velas; sin sábados ni domingos si weekend_gaps.
+    """
+    step = timeframe_seconds(timeframe)
+    first = int(pd.Timestamp(start).value // 10**9)
+    if not weekend_gaps:
+        return first + np.arange(n_bars, dtype=np.int64) * step
+    # 5 de cada 7 días son laborables (+ una semana de margen)
+    total = n_bars * 7 // 5 + 7 * 86400 // step + 1
+    times = first + np.arange(total, dtype=np.int64) * step
+    weekday = (times // 86400 + 3) % 7 # 1970-01-01 fue jueves -> lunes = 0
+    return times[weekday < 5][:n_bars]
+
+
+def regime_path(n_bars, rng, regimes=REGIMES, mean_bars=500):
+    """
+    Multiplicador de volatilidad por vela: tramos de duración geométrica con régimen aleatorio.
+    """
+    runs = n_bars // mean_bars * 2 + 16
+    lengths = rng.geometric(1.0 / mean_bars, runs)
+    while lengths.sum() < n_bars:
+        lengths = np.r_[lengths, rng.geometric(1.0 / mean_bars, runs)]
+    states = rng.integers(0, len(regimes), len(lengths))
+    return np.repeat(np.asarray(regimes, dtype=np.float64)[states], lengths)[:n_bars]
+
+
+def _plant_slots(rng, n_bars, n_plants, lookback):
+    """
+    Posiciones separadas al menos lookback + 2 velas: una plantación por hueco de
+    2 * (lookback + 2) velas, así la ventana de liquidez de un barrido nunca
+    contiene otra vela plantada ni un tramo desplazado a medias.
+    """
+    width = 2 * (lookback + 2)
+    n_slots = max(0, (n_bars - lookback - 4) // width)
+    n_plants = min(n_plants, n_slots)
+    slots = np.sort(rng.choice(n_slots, n_plants, replace=False))
+    jitter = rng.integers(0, width - lookback - 2, n_plants)
+    return lookback + 2 + slots * width + jitter
+
+
+def _plant_fvgs(opens, highs, lows, closes, pos, direction, gap):
+    """
+    FVG de 3 velas en `pos` (tercera vela): la vela pos-1 se convierte en el
+    desplazamiento y todo lo posterior se traslada hasta abrir el hueco.
+    """
+    bull = direction == 1
+    delta = np.where(bull, np.maximum(0.0, highs[pos - 2] + gap - lows[pos]),
+                     np.minimum(0.0, lows[pos - 2] - gap - highs[pos]))
+    shift = np.zeros(len(closes))
+    shift[pos] = delta
+    shift = np.cumsum(shift)
+    for values in (opens, highs, lows, closes):
+        values += shift
+    middle = pos - 1
+    closes[middle] += delta
+    highs[middle] = np.maximum(highs[middle], closes[middle])
+    lows[middle] = np.minimum(lows[middle], closes[middle])
+
+
+def _plant_sweeps(opens, highs, lows, closes, pos, direction, depth, reclaim, lookback):
+    """
+    Barrido + reclamo en `pos`: la mecha rompe el extremo de las `lookback` velas
+    previas y el cierre vuelve dentro con fuerza 0.91 (> 0.7) y el color correcto.
+    Retorna el nivel barrido de cada vela.
+    """
+    bull = direction == 1
+    window = pos[:, None] - lookback + np.arange(lookback)
+    level = np.where(bull, lows[window].min(axis=1), highs[window].max(axis=1))
+
+    sign = np.where(bull, 1.0, -1.0)
+    extreme = level - sign * depth
+    close = level + sign * reclaim
+    body = close - extreme
+    tip = close + 0.1 * body
+    # Apertura = cierre previo salvo que quede por encima de la mitad del cuerpo
+    half = extreme + 0.5 * body
+    open_ = np.where(bull, np.minimum(closes[pos - 1], half), np.maximum(closes[pos - 1], half))
+
+    # Todo lo posterior se traslada para continuar desde el nuevo cierre
+    delta = close - closes[pos]
+    shift = np.zeros(len(closes))
+    shift[pos + 1] = delta
+    shift = np.cumsum(shift)
+    for values in (opens, highs, lows, closes):
+        values += shift
+
+    base = shift[pos]
+    opens[pos] = open_ + base
+    closes[pos] = close + base
+    highs[pos] = np.where(bull, tip, extreme) + base
+    lows[pos] = np.where(bull, extreme, tip) + base
+    return level + base
+
+
+def generate_ohlc(n_bars, symbol='EURUSD', timeframe='M15', start='2024-01-01', seed=0,
+                  sweep_rate=0.002, fvg_rate=0.002, swing_lookback=None, weekend_gaps=True):
+    """
+    OHLCV sintético vectorizado con sesiones, regímenes de volatilidad, huecos de
+    fin de semana y precios redondeados al punto del símbolo (JPY: 0.001).
+    Planta barridos con vela de reclamo fuerte y FVG en posiciones conocidas.
+    Retorna (df, truth); truth = {'sweeps': DataFrame, 'fvgs': DataFrame}.
+    """
+    profile = SYMBOL_PROFILES.get(symbol, DEFAULT_PROFILE)
+    lookback = swing_lookback or settings.SWING_LOOKBACK
+    point = profile['point']
+    decimals = int(round(-np.log10(point)))
+    rng = np.random.default_rng(seed)
+
+    times = trading_times(n_bars, start, timeframe, weekend_gaps)
+    n_bars = len(times)
+    step = timeframe_seconds(timeframe)
+    hours = (times % 86400) // 3600
+    activity = SESSION_VOL[hours] * regime_path(n_bars, rng)
+    vol = profile['vol'] * np.sqrt(step / 900) * activity
+
+    # Log-precio: retorno dentro de la vela + hueco de apertura tras cada cierre de semana
+    returns = rng.standard_normal(n_bars) * vol
+    jumps = np.zeros(n_bars)
+    gaps = np.flatnonzero(np.diff(times) > step) + 1
+    jumps[gaps] = rng.standard_normal(len(gaps)) * profile['vol'] * GAP_VOL
+    log_close = np.log(profile['price']) + np.cumsum(jumps + returns)
+    closes = np.exp(log_close)
+    opens = np.exp(log_close - returns)
+    opens[0] = profile['price']
+
+    # Mechas exponenciales con picos ocasionales (4%) que barren liquidez por sí solos
+    scale = closes * vol
+    spikes = 1.0 + 6.0 * (rng.random(n_bars) < 0.04)
+    highs = np.maximum(opens, closes) + rng.standard_exponential(n_bars) * 0.5 * scale * spikes
+    lows = np.minimum(opens, closes) - rng.standard_exponential(n_bars) * 0.5 * scale * spikes
+    volume = (100 * activity * (0.5 + rng.random(n_bars))).astype(np.int64) + 1
+
+    n_sweeps = int(n_bars * sweep_rate)
+    pos = _plant_slots(rng, n_bars, n_sweeps + int(n_bars * fvg_rate), lookback)
+    order = rng.permutation(len(pos))
+    sweep_pos = np.sort(pos[order[:n_sweeps]])
+    fvg_pos = np.sort(pos[order[n_sweeps:]])
+    sweep_dir = rng.choice(np.array([1, -1], dtype=np.int8), len(sweep_pos))
+    fvg_dir = rng.choice(np.array([1, -1], dtype=np.int8), len(fvg_pos))
+
+    # Márgenes de al menos 3 puntos: las desigualdades sobreviven al redondeo
+    _plant_fvgs(opens, highs, lows, closes, fvg_pos, fvg_dir,
+                rng.uniform(0.5, 1.5, len(fvg_pos)) * scale[fvg_pos] + 3 * point)
+    level = _plant_sweeps(opens, highs, lows, closes, sweep_pos, sweep_dir,
+                          rng.uniform(0.3, 1.5, len(sweep_pos)) * scale[sweep_pos] + 3 * point,
+                          rng.uniform(0.3, 1.2, len(sweep_pos)) * scale[sweep_pos] + 3 * point, lookback)
+
+    index = pd.to_datetime(times, unit='s')
+    df = pd.DataFrame({'Open': np.round(opens, decimals), 'High': np.round(highs, decimals),
+                       'Low': np.round(lows, decimals), 'Close': np.round(closes, decimals),
+                       'Volume': volume}, index=index)
+
+    bull = sweep_dir == 1
+    sweeps = pd.DataFrame({
+        'Time': index[sweep_pos],
+        'Pos': sweep_pos,
+        'Direction': sweep_dir,
+        'Level': np.round(level, decimals),
+        'Extreme': np.where(bull, df['Low'].values[sweep_pos], df['High'].values[sweep_pos]),
+        'Entry': df['Close'].values[sweep_pos],
+    }, columns=SWEEP_COLUMNS)
+    bull = fvg_dir == 1
+    fvgs = pd.DataFrame({
+        'Time': index[fvg_pos],
+        'Pos': fvg_pos,
+        'Direction': fvg_dir,
+        'Top': np.where(bull, df['Low'].values[fvg_pos], df['Low'].values[fvg_pos - 2]),
+        'Bottom': np.where(bull, df['High'].values[fvg_pos - 2], df['High'].values[fvg_pos]),
+    }, columns=PLANTED_FVG_COLUMNS)
+    return df, {'sweeps': sweeps, 'fvgs': fvgs}
+
+
+def generate_market(symbols, n_bars, timeframe='M15', start='2024-01-01', seed=0, **kwargs):
+    """
+    Varios símbolos sobre el mismo calendario con semillas independientes.
+    Retorna {symbol: (df, truth)}.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(len(symbols))
+    return {symbol: generate_ohlc(n_bars, symbol, timeframe, start, seed=child, **kwargs)
+            for symbol, child in zip(symbols, seeds)}
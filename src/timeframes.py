@@ -0,0 +1,48 @@
+import pandas as pd
+
+# Duración de cada timeframe en segundos (nomenclatura MT5 y CCXT)
+TIMEFRAME_SECONDS = {
+    "M1": 60, "M5": 300, "M15": 900, "M30": 1800,
+    "H1": 3600, "H4": 14400, "D1": 86400,
+    "1m": 60, "5m": 300, "15m": 900, "30m": 1800,
+    "1h": 3600, "4h": 14400, "1d": 86400,
+}
+
+def timeframe_seconds(timeframe):
+    """
+    Segundos por vela del timeframe ("M15", "H4", "15m", "4h"...).
+    """
+    if timeframe not in TIMEFRAME_SECONDS:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return TIMEFRAME_SECONDS[timeframe]
+
+def sync_start(index, last_time):
+    """
+    Primera fila de `index` posterior a `last_time` (última vela ya procesada
+    por un estado incremental). len(index) si no hay velas nuevas; None si hay
+    que reconstruir el estado (sin estado, sin datos o `last_time` fuera de
+    `index`, es decir, un hueco).
+    """
+    n = len(index)
+    if last_time is None or n == 0:
+        return None
+    if index[-1] == last_time:
+        return n # Sin velas nuevas (caso habitual)
+    pos = index.searchsorted(last_time)
+    if pos < n and index[pos] == last_time:
+        return pos + 1
+    return None
+
+def timeframe_delta(timeframe):
+    return pd.Timedelta(seconds=timeframe_seconds(timeframe))
+
+def bar_open_time(ts, timeframe, offset=None):
+    """
+    Hora de apertura de la vela que contiene `ts` (Timestamp o DatetimeIndex).
+    Las velas MT5 se alinean a medianoche del servidor y las de CCXT a UTC,
+    en ambos casos basta con redondear hacia abajo sobre el epoch.
+    offset (Timedelta): inicio de sesión distinto de medianoche (p. ej. 17:00 NY).
+    """
+    if offset is None:
+        return ts.floor(timeframe_delta(timeframe))
+    return (ts - offset).floor(timeframe_delta(timeframe)) + offset
@@ -0,0 +1,84 @@
+import numpy as np
+
+class RangeExtremes:
+    """
+    Motor de resolución de trades: primer toque de SL/TP en O(log n) por entrada.
+
+    Sparse table con el máximo de highs y el mínimo de lows en bloques de 2^k
+    velas. Para encontrar la primera vela que cruza un nivel se avanza por
+    bloques de mayor a menor tamaño mientras el bloque no lo toque
+    (búsqueda binaria sobre el rango), para todas las entradas a la vez.
+    """
+
+    def __init__(self, highs, lows):
+        highs = np.ascontiguousarray(highs, dtype=np.float64)
+        lows = np.ascontiguousarray(lows, dtype=np.float64)
+        self.n = len(highs)
+        self.max_table = [highs]
+        self.min_table = [lows]
+        k = 1
+        while (1 << k) <= self.n:
+            half = 1 << (k - 1)
+            prev_max = self.max_table[-1]
+            prev_min = self.min_table[-1]
+            self.max_table.append(np.maximum(prev_max[:-half], prev_max[half:]))
+            self.min_table.append(np.minimum(prev_min[:-half], prev_min[half:]))
+            k += 1
+
+    def first_above(self, starts, levels):
+        """
+        Primer índice j >= start con high[j] > level (n si nunca ocurre).
+        starts y levels se combinan por broadcasting.
+        """
+        return self._first_touch(self.max_table, starts, levels, above=True)
+
+    def first_below(self, starts, levels):
+        """
+        Primer índice j >= start con low[j] < level (n si nunca ocurre).
+        """
+        return self._first_touch(self.min_table, starts, levels, above=False)
+
+    def _first_touch(self, table, starts, levels, above):
+        levels = np.asarray(levels, dtype=np.float64)
+        pos = np.broadcast_to(np.asarray(starts, dtype=np.int64), np.broadcast(starts, levels).shape).copy()
+        levels = np.broadcast_to(levels, pos.shape)
+
+        for k in range(len(table) - 1, -1, -1):
+            size = 1 << k
+            block = table[k]
+            fits = pos + size <= self.n
+            values = block[np.where(fits, pos, 0)]
+            # El bloque completo no toca el nivel -> el primer toque está más allá
+            clear = values <= levels if above else values >= levels
+            pos += np.where(fits & clear, size, 0)
+        return pos
+
+
+def first_touch(engine, entry_indices, directions, prices, adverse):
+    """
+    Índice de la primera vela tras cada entrada que toca `prices` (n = nunca).
+    adverse=True: nivel de SL (BUY por debajo, SELL por encima); False: TP.
+    El eje 0 de `prices` es la entrada; ejes extra = niveles a probar.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    starts = np.asarray(entry_indices, dtype=np.int64) + 1
+    starts = starts.reshape((-1,) + (1,) * (prices.ndim - 1))
+    is_buy = np.asarray(directions) == 1
+    # BUY: SL por debajo (low < sl), TP por encima (high > tp). SELL al revés.
+    below = is_buy if adverse else ~is_buy
+
+    result = np.empty(prices.shape, dtype=np.int64)
+    if below.any():
+        result[below] = engine.first_below(starts[below], prices[below])
+    if (~below).any():
+        result[~below] = engine.first_above(starts[~below], prices[~below])
+    return result
+
+
+def resolve_first_touch(engine, entry_indices, directions, sl_prices, tp_prices):
+    """
+    Índice de la primera vela que toca SL y TP tras cada entrada (n = nunca).
+    """
+    first_sl = first_touch(engine, entry_indices, directions, sl_prices, adverse=True)
+    first_tp = first_touch(engine, entry_indices, directions, tp_prices, adverse=False)
+    return first_sl, first_tp
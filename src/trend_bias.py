@@ -0,0 +1,164 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+from collections import deque
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.timeframes import bar_open_time
+
+class WindowedEMA:
+    """
+    EMA (adjust=False) sobre las últimas `window` velas, en O(1) por vela.
+
+    Equivale a `closes.tail(window).ewm(span=span, adjust=False).mean()`:
+    con Z_t = d*Z_(t-1) + a*x_t, la EMA que arranca en x_s vale
+    y_t = d^(t-s) * (x_s - Z_s) + Z_t, así que basta guardar (x - Z)
+    de las velas de la ventana.
+    """
+
+    def __init__(self, span, window):
+        self.alpha = 2.0 / (span + 1)
+        self.decay = 1.0 - self.alpha
+        self.window = window
+        self.z = 0.0
+        self._offsets = deque(maxlen=window - 1) # x_k - Z_k de las cerradas
+        self._powers = self.decay ** np.arange(window)
+
+    def push(self, close):
+        self.z = self.decay * self.z + self.alpha * close
+        self._offsets.append(close - self.z)
+
+    def value(self, price):
+        """
+        EMA con `price` como última vela (en formación) de la ventana.
+        """
+        if not self._offsets:
+            return price
+        z = self.decay * self.z + self.alpha * price
+        return self._powers[len(self._offsets)] * self._offsets[0] + z
+
+
+class TrendBias:
+    """
+    Sesgo de tendencia HTF (EMA 50 / EMA 200) con estado incremental por símbolo.
+    Se siembra una vez con el histórico HTF nativo (una sola petición) y después
+    solo avanza cuando cierra una vela HTF, construida localmente desde las
+    velas LTF (BarAggregator).
+    """
+
+    def __init__(self, timeframe, fast=50, slow=200, window=300, neutral_on_mixed=False):
+        self.timeframe = timeframe
+        self.fast = fast
+        self.slow = slow
+        self.window = window # Velas HTF que veía el cálculo original (incluye la que se forma)
+        # MT5: tendencia mixta sigue a la EMA 200 / CCXT: neutral
+        self.neutral_on_mixed = neutral_on_mixed
+        self.states = {} # symbol -> dict
+
+    def seed(self, symbol, closes, forming_time=None):
+        """
+        Siembra el estado con una serie de cierres HTF (índice temporal).
+        forming_time: apertura de la vela HTF en formación según el LTF; solo se
+        siembran las anteriores. Por defecto la última fila es la que se forma,
+        igual que en get_data.
+        """
+        state = {
+            'fast': WindowedEMA(self.fast, self.window),
+            'slow': WindowedEMA(self.slow, self.window),
+            'count': 0,
+            'last_time': None,
+        }
+        self.states[symbol] = state
+        closed = closes.index < forming_time if forming_time is not None else np.arange(len(closes)) < len(closes) - 1
+        for bar_time, close in zip(closes.index[closed], closes.values[closed]):
+            self._push(state, bar_time, close)
+
+    def update(self, symbol, bar_time, close):
+        """
+        Añade una vela HTF cerrada (se ignora si no es más nueva que la última).
+        """
+        state = self.states.get(symbol)
+        if state is None: return
+        if state['last_time'] is not None and bar_time <= state['last_time']: return
+        self._push(state, bar_time, close)
+
+    def _push(self, state, bar_time, close):
+        state['fast'].push(close)
+        state['slow'].push(close)
+        state['count'] += 1
+        state['last_time'] = bar_time
+
+    def advance(self, symbol, htf_closed, close_col='Close'):
+        """
+        Añade las velas HTF cerradas que entrega BarAggregator.update().
+        """
+        if symbol not in self.states: return
+        for bar_time, close in zip(htf_closed.index, htf_closed[close_col].values):
+            self.update(symbol, bar_time, close)
+
+    def bias(self, symbol, price):
+        """
+        +1 / -1 / 0 con `price` como cierre de la vela HTF en formación.
+        """
+        state = self.states.get(symbol)
+        if state is None: return 0
+
+        # Mismo mínimo que antes: len(close_htf) > 200 con la ventana de `window` velas
+        n_bars = min(state['count'], self.window - 1) + 1
+        if n_bars <= self.slow: return 0
+
+        ema_fast = state['fast'].value(price)
+        ema_slow = state['slow'].value(price)
+
+        # Strong Trend Layout
+        if price > ema_fast and price > ema_slow:
+            return 1   # BUY ONLY (Strong Bull)
+        elif price < ema_fast and price < ema_slow:
+            return -1  # SELL ONLY (Strong Bear)
+        if self.neutral_on_mixed:
+            return 0
+        # Mixed Trend - follow EMA 200
+        return 1 if price > ema_slow else -1
+
+    def bias_series(self, df_ltf, htf_closes, close_col='Close'):
+        """
+        Sesgo vectorizado para backtests: para cada vela LTF usa las velas HTF
+        cerradas antes de su bloque y su propio cierre como vela HTF en formación,
+        igual que bias() en vivo tras cada cierre.
+        htf_closes: Serie de cierres HTF indexada por hora de apertura.
+        """
+        prices = df_ltf[close_col].values
+        forming = bar_open_time(df_ltf.index, self.timeframe)
+        closed = htf_closes.index.searchsorted(forming)   # Velas HTF cerradas por vela LTF
+        x = htf_closes.values.astype(np.float64)
+
+        in_window = np.minimum(closed, self.window - 1)
+        emas = []
+        for span in (self.fast, self.slow):
+            alpha = 2.0 / (span + 1)
+            decay = 1.0 - alpha
+            if len(x):
+                # Z_t (sin semilla) a partir de la EMA clásica que arranca en x_0
+                ewm = htf_closes.astype(np.float64).ewm(span=span, adjust=False).mean().values
+                z = ewm - decay ** np.arange(1, len(x) + 1) * x[0]
+                offsets = x - z
+                start = closed - in_window
+                z_prev = z[np.maximum(closed - 1, 0)]
+                ema = decay ** in_window * offsets[np.minimum(start, len(x) - 1)] + decay * z_prev + alpha * prices
+                emas.append(np.where(closed > 0, ema, prices))
+            else:
+                emas.append(prices.astype(np.float64))
+        ema_fast, ema_slow = emas
+
+        bull = (prices > ema_fast) & (prices > ema_slow)
+        bear = (prices < ema_fast) & (prices < ema_slow)
+        if self.neutral_on_mixed:
+            mixed = np.zeros(len(prices), dtype=np.int8)
+        else:
+            mixed = np.where(prices > ema_slow, 1, -1).astype(np.int8)
+        bias = np.where(bull, 1, np.where(bear, -1, mixed)).astype(np.int8)
+
+        # Mismo mínimo que bias(): más de `slow` velas en la ventana
+        bias[in_window + 1 <= self.slow] = 0
+        return pd.Series(bias, index=df_ltf.index)
@@ -3,13 +3,16 @@ import numpy as np
 import mplfinance as mpf
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
+from matplotlib.collections import PatchCollection, PolyCollection
 from datetime import datetime
+import io
 import sys
 import os
 
 # Add parent dir to sys path for settings if needed
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from config import settings
+from src.fvg import detect_fvgs
 
 def draw_spectacular_trade(df, trade_data, output_file="trade_audit.png"):
     """
@@ -19,6 +22,7 @@ def draw_spectacular_trade(df, trade_data, output_file="trade_audit.png"):
     - Killzones Sutiles
     - Panel de Info Flotante
     - DETECCIÓN DE FAIR VALUE GAPS (FVG)
+    output_file: ruta o cualquier objeto tipo fichero (p.ej. io.BytesIO).
     """
     # 0. Validación de Datos
     if df is None or df.empty: return
@@ -70,58 +74,41 @@ def draw_spectacular_trade(df, trade_data, output_file="trade_audit.png"):
     # Analizamos las velas visibles para encontrar desequilibrios
     # Un FVG es el hueco entre la mecha de la vela i-2 y la vela i
     
-    start_fvg_scan = 2
+    n = len(plot_df)
+    idx, direction, top, bottom = detect_fvgs(plot_df['High'].values, plot_df['Low'].values)
     
-    opens = plot_df['Open'].values
-    highs = plot_df['High'].values
-    lows = plot_df['Low'].values
-    closes = plot_df['Close'].values
+    # Limitamos FVGs a las ultimas 60 velas para no saturar
+    recent = idx >= n - 60
+    idx, direction, top, bottom = idx[recent], direction[recent], top[recent], bottom[recent]
     
-    # Limitamos FVGs a las ultimas 50 velas para no saturar
-    scan_start_idx = max(start_fvg_scan, len(plot_df) - 60)
-    
-    for i in range(scan_start_idx, len(plot_df)):
-        width_box = min(15, len(plot_df)-i) # Definición Global para el bucle
+    if len(idx):
+        width_box = np.minimum(15, n - idx)
+        colors = np.where(direction == 1, '#00e676', '#ff1744') # Alcista / Bajista
         
-        # BULLISH FVG (Gap Alcista)
-        if lows[i] > highs[i-2]:
-            top = lows[i]
-            bottom = highs[i-2]
-            # Caja más brillante (Alpha 0.3) y color Neon
-            rect = mpatches.Rectangle((i-2, bottom), width_box, top - bottom, 
-                                      color='#00e676', alpha=0.25, linewidth=0)
-            ax.add_patch(rect)
-            
-            # Etiqueta
-            if i > len(plot_df) - 30: # Solo etiquetar los muy recientes
-                ax.text(i, (top+bottom)/2, "FVG", color='#00e676', fontsize=7, fontweight='bold', va='center', ha='left')
-            
-        # BEARISH FVG (Gap Bajista)
-        elif highs[i] < lows[i-2]:
-            top = lows[i-2]
-            bottom = highs[i]
-            rect = mpatches.Rectangle((i-2, bottom), width_box, top - bottom, 
-                                      color='#ff1744', alpha=0.25, linewidth=0)
-            ax.add_patch(rect)
-            
-            # Etiqueta
-            if i > len(plot_df) - 30:
-                ax.text(i, (top+bottom)/2, "FVG", color='#ff1744', fontsize=7, fontweight='bold', va='center', ha='left')
+        # Todas las cajas en un solo artista (Alpha 0.25, color Neon)
+        boxes = [mpatches.Rectangle((i - 2, b), w, t - b) for i, b, t, w in zip(idx, bottom, top, width_box)]
+        ax.add_collection(PatchCollection(boxes, facecolors=colors, edgecolors=colors, alpha=0.25, linewidths=0))
+        
+        # Etiqueta: solo los muy recientes
+        for i, b, t, c in zip(idx, bottom, top, colors):
+            if i > n - 30:
+                ax.text(i, (t + b) / 2, "FVG", color=c, fontsize=7, fontweight='bold', va='center', ha='left')
 
     # --- 2. DIBUJO DE SESIONES (Sombreado Vertical) ---
-    for i in range(len(plot_df)):
-        dt = plot_df.index[i]
-        hour = dt.hour
-        
-        # Killzone Londres (Azul Soft)
-        if 8 <= hour < 12:
-            ax.axvspan(i-0.5, i+0.5, color='#2962ff', alpha=0.08, linewidth=0)
-        # Killzone NY (Naranja Soft)
-        elif 13 <= hour < 17:
-            ax.axvspan(i-0.5, i+0.5, color='#ff9800', alpha=0.08, linewidth=0)
-        # Rango Asia (Gris/Caja)
-        elif 0 <= hour < 8:
-            ax.axvspan(i-0.5, i+0.5, color='#787b86', alpha=0.05, linewidth=0)
+    # Máscara de sesión por vela y un rectángulo por tramo contiguo
+    hours = plot_df.index.hour.values
+    sessions = [
+        ((hours >= 8) & (hours < 12), '#2962ff', 0.08),   # Killzone Londres (Azul Soft)
+        ((hours >= 13) & (hours < 17), '#ff9800', 0.08),  # Killzone NY (Naranja Soft)
+        (hours < 8, '#787b86', 0.05),                     # Rango Asia (Gris/Caja)
+    ]
+    for mask, color, alpha in sessions:
+        edges = np.diff(np.r_[0, mask.astype(np.int8), 0])
+        starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        if len(starts) == 0: continue
+        spans = [[(a - 0.5, 0), (a - 0.5, 1), (b - 0.5, 1), (b - 0.5, 0)] for a, b in zip(starts, stops)]
+        ax.add_collection(PolyCollection(spans, facecolors=color, alpha=alpha, linewidths=0,
+                                         transform=ax.get_xaxis_transform()), autolim=False)
 
     # --- 3. NIVELES DE LIQUIDEZ CON ETIQUETAS ---
     # Usamos los datos reales pasados por el Analyst
@@ -193,13 +180,34 @@ def draw_spectacular_trade(df, trade_data, output_file="trade_audit.png"):
 
     # Guardar
     try:
-        fig.savefig(output_file, dpi=150, bbox_inches='tight', facecolor='#131722')
-        print(f"      [Visual] Elite FVG Chart saved: {output_file}")
+        _save_tight_png(fig, output_file, dpi=150, facecolor='#131722')
+        if isinstance(output_file, str):
+            print(f"      [Visual] Elite FVG Chart saved: {output_file}")
     except Exception as e:
         print(f"      [Visual] Error saving chart: {e}")
     finally:
         plt.close(fig)
 
+def _save_tight_png(fig, output_file, dpi=150, facecolor='#131722', pad_inches=0.1):
+    """
+    Equivalente a savefig(bbox_inches='tight') con una sola rasterización:
+    el bbox se mide en una pasada de solo layout y después se congela el
+    layout (si no, savefig repetiría tight_layout dibujando otra vez).
+    """
+    fig.draw_without_rendering()
+    tight = fig.get_tightbbox().padded(pad_inches)
+    fig.set_layout_engine('none')
+    fig.savefig(output_file, dpi=dpi, bbox_inches=tight, facecolor=facecolor, format='png',
+                pil_kwargs={'compress_level': 1}) # zlib rápido: el gráfico es casi todo color plano
+
+def render_trade_png(df, trade_data):
+    """
+    Igual que draw_spectacular_trade pero devuelve el PNG en memoria (bytes).
+    """
+    buffer = io.BytesIO()
+    draw_spectacular_trade(df, trade_data, output_file=buffer)
+    return buffer.getvalue() or None
+
 # Alias for compatibility if needed, but we will update main.py to call draw_spectacular_trade
 def draw_professional_chart(df, output_file="audit.png"):
     draw_spectacular_trade(df, {}, output_file)
@@ -0,0 +1,102 @@
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.analytics import DealCache, DealHistory, trade_frame, performance_stats, breakdown, equity_curve
+
+SYMBOLS = ['EURUSD', 'GBPUSD', 'USDJPY', 'XAUUSD', 'AUDUSD']
+START = 1704067200 # 2024-01-01
+
+def make_deals(n_trades, seed=0):
+    """
+    Deals de un año: entrada + salida por posición, con un depósito inicial (type 2).
+    """
+    rng = np.random.default_rng(seed)
+    open_time = np.sort(rng.integers(START, START + 365 * 86400, n_trades))
+    close_time = open_time + rng.integers(600, 86400, n_trades)
+    side = rng.integers(0, 2, n_trades)
+    profit = np.round(rng.normal(5, 100, n_trades), 2)
+    position = np.arange(1, n_trades + 1) + seed * 10**7
+    symbols = np.array(SYMBOLS)[rng.integers(0, len(SYMBOLS), n_trades)]
+    n = 2 * n_trades + 1
+    deals = pd.DataFrame({
+        'time': np.r_[START - 86400, open_time, close_time],
+        'ticket': np.arange(n) + seed * 10**8,
+        'position_id': np.r_[0, position, position],
+        'symbol': np.r_[[''], symbols, symbols],
+        'type': np.r_[2, side, 1 - side],
+        'entry': np.r_[0, np.zeros(n_trades, dtype=int), np.ones(n_trades, dtype=int)],
+        'volume': np.r_[0.0, np.full(2 * n_trades, 0.1)],
+        'price': np.r_[0.0, np.full(2 * n_trades, 1.1)],
+        'profit': np.r_[10000.0, np.zeros(n_trades), profit],
+        'commission': np.r_[0.0, np.full(2 * n_trades, -0.35)],
+        'swap': np.r_[0.0, np.zeros(n_trades), np.where(close_time // 86400 > open_time // 86400, -0.5, 0.0)],
+    })
+    return deals.sort_values('time', kind='stable').reset_index(drop=True)
+
+def naive_stats(deals):
+    """
+    Referencia deal a deal (como el audit_pnl original): PnL por posición y drawdown.
+    """
+    positions = {}
+    for deal in deals.itertuples(index=False):
+        if deal.type not in (0, 1): continue
+        trade = positions.setdefault(deal.position_id, {'symbol': deal.symbol, 'pnl': 0.0, 'close': 0, 'exits': 0})
+        trade['pnl'] += deal.profit + deal.commission + deal.swap
+        if deal.entry != 0:
+            trade['exits'] += 1
+            trade['close'] = max(trade['close'], deal.time)
+    closed = sorted((t['close'], pid, t) for pid, t in positions.items() if t['exits'])
+    equity = peak = max_dd = 0.0
+    by_symbol = {}
+    for _, _, trade in closed:
+        equity += trade['pnl']
+        peak = max(peak, equity)
+        max_dd = max(max_dd, peak - equity)
+        by_symbol[trade['symbol']] = by_symbol.get(trade['symbol'], 0.0) + trade['pnl']
+    return len(closed), equity, max_dd, by_symbol
+
+if __name__ == "__main__":
+    n_accounts = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    n_trades = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    accounts = {1000 + k: make_deals(n_trades, seed=k) for k in range(n_accounts)}
+    now = START + 365 * 86400 + 86400 + 3600
+    cache = DealCache(tempfile.mkdtemp())
+
+    def fetch_for(deals):
+        times = deals['time'].values
+        return lambda date_from, date_to: deals.iloc[np.searchsorted(times, date_from):np.searchsorted(times, date_to, side='right')]
+
+    def run():
+        t0 = time.perf_counter()
+        trades = pd.concat([trade_frame(DealHistory(fetch_for(deals), cache, account).load(START - 86400, now)).assign(account=account)
+                            for account, deals in accounts.items()], ignore_index=True)
+        trades = trades.sort_values('close_time', kind='stable').reset_index(drop=True)
+        stats = performance_stats(trades['pnl'])
+        equity_curve(trades)
+        breakdown(trades, 'symbol'), breakdown(trades, 'session'), breakdown(trades, 'account')
+        return trades, stats, time.perf_counter() - t0
+
+    _, _, t_cold = run()
+    trades, stats, t_warm = run()
+
+    mismatches = 0
+    for account, deals in accounts.items():
+        n, net, max_dd, by_symbol = naive_stats(deals)
+        own = trades[trades['account'] == account]
+        account_stats = performance_stats(own['pnl'])
+        mismatches += int(n != len(own) or not np.isclose(net, account_stats['net'])
+                          or not np.isclose(max_dd, account_stats['max_drawdown']))
+        grouped = own.groupby('symbol')['pnl'].sum()
+        mismatches += sum(not np.isclose(grouped[symbol], pnl) for symbol, pnl in by_symbol.items())
+
+    print(f"Accounts: {n_accounts} | Trades: {stats['trades']:,} | Net: {stats['net']:,.2f} | PF: {stats['profit_factor']:.2f} "
+          f"| Max DD: {stats['max_drawdown']:,.2f}")
+    print(f"Cold run (builds cache): {t_cold * 1e3:.0f} ms | Warm run: {t_warm * 1e3:.0f} ms | Mismatches: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+    print("✅ Vectorized analytics match the deal-by-deal reference.")
@@ -0,0 +1,48 @@
+import sys
+import os
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import settings
+from src.bar_aggregator import BarAggregator, aggregate
+from src.trend_bias import TrendBias
+from src.timeframes import bar_open_time
+from tools.check_signal_parity import make_random_ohlc
+
+def check_alignment(df, window_bars=500):
+    """
+    Simula el loop en vivo (siembra con el HTF nativo, ventanas de `window_bars`
+    velas cerradas, HTF agregado con BarAggregator y sesgo incremental) y lo
+    compara con bias_series del backtest.
+    """
+    htf = settings.TIMEFRAME_HTF
+    trend = TrendBias(htf)
+    aggregator = BarAggregator(settings.TIMEFRAME_LTF, [htf])
+    start = aggregator.history_bars(htf, trend.window) + 1
+
+    # El HTF nativo del broker = agregado de todo lo visible (la última fila se forma)
+    df_closed = df.iloc[start - window_bars:start]
+    native = aggregate(df.iloc[:start], htf).tail(trend.window)
+    trend.seed('TEST', native['Close'], forming_time=bar_open_time(df_closed.index[-1], htf))
+    aggregator.seed('TEST', df_closed)
+    live = [trend.bias('TEST', df_closed['Close'].iloc[-1])]
+    for end in range(start + 1, len(df) + 1):
+        df_closed = df.iloc[max(0, end - window_bars):end]
+        htf_bars = aggregator.update('TEST', df_closed)
+        trend.advance('TEST', htf_bars[htf])
+        live.append(trend.bias('TEST', df_closed['Close'].iloc[-1]))
+
+    # Backtest: misma ventana HTF de `window` velas (la del sesgo en vivo)
+    expected = TrendBias(htf).bias_series(df, aggregate(df, htf)['Close']).values[start - 1:]
+    return np.asarray(live), expected
+
+if __name__ == "__main__":
+    n_bars = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    df = make_random_ohlc(n_bars)
+    df = df.drop(df.index[6000:6200]) # Hueco de fin de semana
+    live, expected = check_alignment(df)
+    mismatches = int((live != expected).sum())
+    print(f"Bars: {len(live)} | Bull: {int((live == 1).sum())} | Bear: {int((live == -1).sum())} | Mismatches: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+    print("✅ Live HTF bias from aggregated bars matches the backtest bias bar by bar.")
@@ -0,0 +1,60 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.fvg import FVGIndex, find_fvgs, open_fvgs
+from tools.check_signal_parity import make_random_ohlc
+
+def brute_force_fvgs(df):
+    """
+    Bucle de referencia: detección vela a vela y relleno por búsqueda lineal.
+    """
+    highs, lows = df['High'].values, df['Low'].values
+    rows = []
+    for i in range(2, len(df)):
+        if lows[i] > highs[i-2]:
+            direction, top, bottom = 1, lows[i], highs[i-2]
+        elif highs[i] < lows[i-2]:
+            direction, top, bottom = -1, lows[i-2], highs[i]
+        else:
+            continue
+        filled = len(df)
+        for j in range(i + 1, len(df)):
+            if (direction == 1 and lows[j] < bottom) or (direction == -1 and highs[j] > top):
+                filled = j
+                break
+        rows.append((i, direction, top, bottom, filled))
+    return rows
+
+def check_parity(df, step=7):
+    """
+    1. find_fvgs == bucle de referencia.
+    2. El índice incremental (alimentado en trozos de `step` velas) == open_fvgs en cada paso.
+    Retorna el número de discrepancias.
+    """
+    gaps = find_fvgs(df)
+    expected = brute_force_fvgs(df)
+    got = list(zip(gaps['Pos'], gaps['Direction'], gaps['Top'], gaps['Bottom'], gaps['Filled']))
+    mismatches = int(got != expected)
+
+    index = FVGIndex(max_open=10**6)
+    for end in range(50, len(df) + 1, step):
+        window = df.iloc[:end]
+        live = index.update('TEST', 'M15', window).frame()
+        batch = open_fvgs(window)
+        if not (np.array_equal(live['Top'].values, batch['Top'].values)
+                and np.array_equal(live['Bottom'].values, batch['Bottom'].values)
+                and np.array_equal(pd.DatetimeIndex(live['Time']), pd.DatetimeIndex(batch['Time']))):
+            mismatches += 1
+    return len(gaps), mismatches
+
+if __name__ == "__main__":
+    n_bars = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    df = make_random_ohlc(n_bars)
+    n_gaps, mismatches = check_parity(df)
+    print(f"Bars: {n_bars} | FVGs: {n_gaps} | Open: {len(open_fvgs(df))} | Mismatches: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+    print("✅ Vectorized FVGs and incremental index match the reference loop.")
@@ -0,0 +1,58 @@
+import sys
+import os
+import time
+import tempfile
+import multiprocessing
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.journal import TradeJournal, EVENT_TYPES
+
+SYMBOLS = ['EURUSD', 'GBPUSD', 'USDJPY', 'AUDUSD', 'USDCAD', 'NZDUSD', 'XAUUSD', 'BTC/USDT']
+START = 1704067200 # 2024-01-01
+
+class StepClock:
+    """Reloj que avanza `step` segundos en cada lectura (eventos repartidos en días)"""
+    def __init__(self, start, step):
+        self.now = start - step
+        self.step = step
+    def time(self):
+        self.now += self.step
+        return self.now
+
+def writer(path, bot, n_events, offset):
+    journal = TradeJournal(path, bot=bot, clock=StepClock(START + offset, 30), batch_size=5000)
+    for i in range(n_events):
+        journal.record(EVENT_TYPES[i % len(EVENT_TYPES)], SYMBOLS[i % len(SYMBOLS)], 'BUY' if i % 2 else 'SELL',
+                       entry=1.1, sl=1.09, tp=1.12, size=0.1, reason='TEST', ticket=i, seq=i)
+    journal.close(timeout=None)
+    return journal.written
+
+if __name__ == "__main__":
+    n_writers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    n_events = int(sys.argv[2]) if len(sys.argv) > 2 else 250000
+    path = os.path.join(tempfile.mkdtemp(), 'journal.db')
+    TradeJournal(path, bot='CHECK') # Esquema creado antes de lanzar los procesos
+
+    # Varios procesos escribiendo a la vez en el mismo fichero (MT5 + CCXT + ...)
+    t0 = time.perf_counter()
+    with multiprocessing.Pool(n_writers) as pool:
+        written = pool.starmap(writer, [(path, f"BOT{k}", n_events, k) for k in range(n_writers)])
+    t_write = time.perf_counter() - t0
+
+    journal = TradeJournal(path, bot='CHECK')
+    t0 = time.perf_counter()
+    by_symbol = journal.query(symbol='EURUSD', day='2024-01-15')
+    t_symbol = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    by_day = journal.query(day='2024-01-15')
+    t_day = time.perf_counter() - t0
+    total = len(journal.query(symbol='XAUUSD')) * len(SYMBOLS)
+
+    expected = n_writers * n_events
+    print(f"Writers: {n_writers} | Rows: {sum(written):,} | Write: {sum(written) / t_write:,.0f} rows/s")
+    print(f"Symbol+day query: {len(by_symbol)} rows in {t_symbol * 1e3:.1f} ms | "
+          f"Day query: {len(by_day)} rows in {t_day * 1e3:.1f} ms")
+    if sum(written) != expected or total != expected or len(by_day) != n_writers * 2880:
+        print(f"❌ Lost rows: expected {expected:,}")
+        sys.exit(1)
+    print("✅ Concurrent writers landed every row; indexed queries stay fast.")
@@ -0,0 +1,142 @@
+import sys
+import os
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.liquidity_levels import LiquidityIndex, LiquidityBook
+from tools.check_signal_parity import make_random_ohlc
+
+def check_sweeps(df):
+    """
+    Repite cada vela contra un barrido lineal de todos los niveles pendientes
+    (copia del libro antes de la vela) y compara barridos y retiros.
+    """
+    index = LiquidityIndex()
+    mismatches = 0
+    sweeps = 0
+    elapsed = 0.0
+    highs, lows, closes = df['High'].values, df['Low'].values, df['Close'].values
+    for i in range(len(df)):
+        book = index.books.get(('TEST', 'M15'))
+        before = [] if book is None else list(book.highs.levels) + list(book.lows.levels)
+
+        t0 = time.perf_counter()
+        book = index.update('TEST', 'M15', df.iloc[:i + 1])
+        elapsed += time.perf_counter() - t0
+
+        h, l, c = highs[i], lows[i], closes[i]
+        expected_highs = sorted(x['price'] for x in before if x['side'] == 'HIGH' and c < x['price'] < h)
+        expected_lows = sorted(x['price'] for x in before if x['side'] == 'LOW' and l < x['price'] < c)
+        got_highs = sorted(x['price'] for x in book.last_sweeps[0])
+        got_lows = sorted(x['price'] for x in book.last_sweeps[1])
+        if (got_highs, got_lows) != (expected_highs, expected_lows):
+            mismatches += 1
+        # Nada pendiente puede quedar dentro del rango de la vela
+        if any(x['price'] < h for x in book.highs.levels) or any(x['price'] > l for x in book.lows.levels):
+            mismatches += 1
+        if book.highs.prices != sorted(book.highs.prices) or book.lows.prices != sorted(book.lows.prices):
+            mismatches += 1
+        sweeps += len(got_highs) + len(got_lows)
+    return book, sweeps, mismatches, elapsed / len(df)
+
+def time_trap_zone(df, lookback=96):
+    """
+    us/vela del par actual de SMCAnalyst.analyze: max/min de las `lookback` velas previas.
+    """
+    highs, lows = df['High'], df['Low']
+    t0 = time.perf_counter()
+    for i in range(lookback + 1, len(df)):
+        highs.iloc[i - lookback - 1:i - 1].max()
+        lows.iloc[i - lookback - 1:i - 1].min()
+    return (time.perf_counter() - t0) / (len(df) - lookback - 1)
+
+def time_levels(df, n_levels, seed=3):
+    """
+    us/vela con `n_levels` niveles vivos por lado (repuestos fuera del rango de
+    la vela tras cada barrido, así el libro no se vacía):
+    LevelSide.take (ambos lados) y LiquidityBook.push completo (sesiones, PDH/PDL).
+    """
+    rng = np.random.default_rng(seed)
+    highs, lows, closes = df['High'].values, df['Low'].values, df['Close'].values
+    span = highs.max() - lows.min()
+    book = LiquidityBook('M15', max_age=pd.Timedelta(days=10000))
+    for _ in range(n_levels):
+        book.add_level(highs[0] + rng.random() * span, 'HIGH', 'PLANTED', df.index[0])
+        book.add_level(lows[0] - rng.random() * span, 'LOW', 'PLANTED', df.index[0])
+
+    take = push = 0.0
+    for i in range(len(df)):
+        t0 = time.perf_counter()
+        taken_highs = book.highs.take(highs[i], lows[i], closes[i])
+        taken_lows = book.lows.take(highs[i], lows[i], closes[i])
+        take += time.perf_counter() - t0
+        for _ in range(sum(map(len, taken_highs))):
+            book.add_level(highs[i] + rng.random() * span, 'HIGH', 'PLANTED', df.index[i])
+        for _ in range(sum(map(len, taken_lows))):
+            book.add_level(lows[i] - rng.random() * span, 'LOW', 'PLANTED', df.index[i])
+
+        t0 = time.perf_counter()
+        book.push(df.index[i], highs[i], lows[i], closes[i])
+        push += time.perf_counter() - t0
+    return take / len(df), push / len(df), len(book.highs) + len(book.lows)
+
+def time_update(df, n_levels, warmup=200, seed=3):
+    """
+    us/vela de LiquidityIndex.update de punta a punta (sync de estructura incluido,
+    sin contar el slice de df) con `n_levels` niveles plantados por lado.
+    """
+    rng = np.random.default_rng(seed)
+    index = LiquidityIndex(max_age=pd.Timedelta(days=10000))
+    book = index.update('TEST', 'M15', df.iloc[:warmup])
+    span = df['High'].max() - df['Low'].min()
+    for _ in range(n_levels):
+        book.add_level(df['High'].max() + rng.random() * span, 'HIGH', 'PLANTED', df.index[0])
+        book.add_level(df['Low'].min() - rng.random() * span, 'LOW', 'PLANTED', df.index[0])
+    elapsed = 0.0
+    for i in range(warmup, len(df)):
+        window = df.iloc[:i + 1]
+        t0 = time.perf_counter()
+        index.update('TEST', 'M15', window)
+        elapsed += time.perf_counter() - t0
+    return elapsed / (len(df) - warmup)
+
+def check_scaling(df, counts=(10, 100, 300, 1000)):
+    """
+    Coste por vela frente al par único de hoy: con cientos de niveles vivos
+    el chequeo no debe costar más, y crecer x100 en niveles no puede crecer
+    el coste de forma lineal (O(log n) por vela + niveles tomados).
+    """
+    baseline = time_trap_zone(df)
+    print(f"Trap zone (today, 1 pair): {baseline * 1e6:.1f} us/bar")
+    failures = []
+    takes = {}
+    for n_levels in counts:
+        take, push, live = time_levels(df, n_levels)
+        takes[n_levels] = take
+        print(f"  {n_levels:>5} levels/side ({live} live at end): take {take * 1e6:5.1f} us/bar | "
+              f"push {push * 1e6:5.1f} us/bar")
+        if n_levels >= 100 and max(take, push) > baseline:
+            failures.append(f"{n_levels} levels cost more than the single pair")
+    print(f"  update end to end (structure sync included): {time_update(df, counts[0]) * 1e6:.0f} us/bar with "
+          f"{counts[0]} levels/side, {time_update(df, counts[-1]) * 1e6:.0f} us/bar with {counts[-1]}")
+    growth = takes[counts[-1]] / takes[counts[0]]
+    print(f"  take x{growth:.1f} for x{counts[-1] // counts[0]} levels")
+    if growth > 4:
+        failures.append(f"take grows x{growth:.1f} with the number of levels")
+    return failures
+
+if __name__ == "__main__":
+    n_bars = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    df = make_random_ohlc(n_bars)
+    book, sweeps, mismatches, per_bar = check_sweeps(df)
+    origins = book.frame()['origin'].value_counts().to_dict()
+    print(f"Bars: {n_bars} | Sweeps: {sweeps} | Live levels: {len(book.highs) + len(book.lows)} {origins} "
+          f"| Update: {per_bar * 1e6:.0f} us/bar | Mismatches: {mismatches}")
+    failures = check_scaling(df)
+    if mismatches or failures:
+        print(f"❌ {failures}")
+        sys.exit(1)
+    print("✅ Sorted liquidity index matches a linear scan of every level, and hundreds of levels "
+          "cost less per bar than the single trap-zone pair.")
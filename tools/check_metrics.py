@@ -0,0 +1,47 @@
+import sys
+import os
+import time
+import urllib.request
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.metrics import Metrics
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    metrics = Metrics()
+
+    # Coste de un timer vacío (lo que añade cada etapa instrumentada al loop)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with metrics.timer('noop'):
+            pass
+    per_timer = (time.perf_counter() - t0) / n
+
+    for symbol in metrics.timed('scan_seconds', ['EURUSD', 'USDJPY'], 'symbol'):
+        with metrics.timer('analyze'):
+            time.sleep(0.002)
+    metrics.inc('orders_total', result='filled')
+    metrics.set('last_bar_close_timestamp', 1700000000)
+
+    server = metrics.serve(0) # Puerto libre
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            content_type = response.headers['Content-Type']
+            body = response.read().decode()
+    finally:
+        server.close()
+
+    expected = [
+        'smc_bot_stage_seconds_count{stage="analyze"} 2',
+        'smc_bot_stage_seconds_bucket{stage="analyze",le="+Inf"} 2',
+        f'smc_bot_stage_seconds_count{{stage="noop"}} {n}',
+        'smc_bot_scan_seconds_count{symbol="USDJPY"} 1',
+        'smc_bot_orders_total{result="filled"} 1',
+        'smc_bot_last_bar_close_timestamp 1700000000',
+    ]
+    missing = [line for line in expected if line not in body.splitlines()]
+    print(f"Timer overhead: {per_timer * 1e6:.2f} us | /metrics: {len(body.splitlines())} lines ({content_type})")
+    if missing or not content_type.startswith('text/plain'):
+        print(f"❌ Missing series: {missing}")
+        sys.exit(1)
+    print("✅ Prometheus endpoint exposes stage histograms, scan times, counters and gauges.")
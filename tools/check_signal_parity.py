@@ -0,0 +1,54 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.smc_analyst import SMCAnalyst
+
+def make_random_ohlc(n_bars, seed=7):
+    """
+    Paseo aleatorio con mechas largas ocasionales (para provocar barridos).
+    """
+    rng = np.random.default_rng(seed)
+    closes = np.round(1.10 + np.cumsum(rng.normal(0, 0.0004, n_bars)), 5)
+    opens = np.r_[closes[0], closes[:-1]]
+    spikes = 1 + 12 * (rng.random(n_bars) < 0.04)
+    highs = np.round(np.maximum(opens, closes) + rng.exponential(0.0002, n_bars) * spikes, 5)
+    lows = np.round(np.minimum(opens, closes) - rng.exponential(0.0002, n_bars) * spikes, 5)
+    index = pd.date_range('2024-01-01', periods=n_bars, freq='15min')
+    return pd.DataFrame({'Open': opens, 'High': highs, 'Low': lows, 'Close': closes}, index=index)
+
+def check_parity(df, trend_bias, point=0.00001, swing_lookback=96):
+    """
+    Compara generate_signal_frame con _check_candle_signal vela a vela.
+    Retorna la lista de índices con diferencias.
+    """
+    analyst = SMCAnalyst(swing_lookback=swing_lookback)
+    frame = analyst.generate_signal_frame(df, trend_bias=trend_bias, point=point)
+    bias = np.broadcast_to(np.asarray(trend_bias), (len(df),))
+
+    mismatches = []
+    for i in range(swing_lookback, len(df)):
+        live = analyst._check_candle_signal(df, i, int(bias[i]), point)
+        row = frame.iloc[i]
+        if live is None:
+            if row['direction'] != 0: mismatches.append(i)
+            continue
+        expected = (1 if live['action'] == 'BUY' else -1, live['price'], live['sl'], live['reason'])
+        got = (row['direction'], row['entry'], row['sl'], row['reason'])
+        if expected != got or live['timestamp'] != frame.index[i]:
+            mismatches.append(i)
+    return frame, mismatches
+
+if __name__ == "__main__":
+    n_bars = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    df = make_random_ohlc(n_bars)
+    bias = np.random.default_rng(1).choice([-1, 0, 1], size=n_bars)
+
+    frame, mismatches = check_parity(df, bias)
+    print(f"Bars: {n_bars} | Signals: {int((frame['direction'] != 0).sum())} | Mismatches: {len(mismatches)}")
+    if mismatches:
+        print(f"First mismatches at: {mismatches[:10]}")
+        sys.exit(1)
+    print("✅ Vectorized signals match _check_candle_signal bar by bar.")
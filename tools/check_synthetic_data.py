@@ -0,0 +1,69 @@
+import sys
+import os
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.smc_analyst import SMCAnalyst
+from src.fvg import detect_fvgs
+from src.synthetic_data import generate_ohlc, generate_market, SYMBOL_PROFILES
+
+def check_symbol(df, truth, point, swing_lookback=96, n_live=50):
+    """
+    Oráculo: cada barrido plantado debe ser señal (vectorizada y en vivo) con
+    la dirección y entrada registradas, y cada FVG plantado debe detectarse.
+    Retorna la lista de fallos.
+    """
+    analyst = SMCAnalyst(swing_lookback=swing_lookback)
+    failures = []
+
+    # Velas coherentes, al punto del símbolo y sin fines de semana
+    if ((df['High'] < df[['Open', 'Close']].max(axis=1)) | (df['Low'] > df[['Open', 'Close']].min(axis=1))).any():
+        failures.append("OHLC inconsistent")
+    if not np.allclose(df['Close'] / point, np.round(df['Close'] / point), atol=1e-6):
+        failures.append("prices not on point grid")
+    if (df.index.dayofweek >= 5).any():
+        failures.append("weekend bars")
+
+    sweeps = truth['sweeps']
+    frame = analyst.generate_signal_frame(df, trend_bias=0, point=point)
+    pos = sweeps['Pos'].values
+    found = frame['direction'].values[pos] == sweeps['Direction'].values
+    found &= frame['entry'].values[pos] == sweeps['Entry'].values
+    failures += [f"sweep {p} missed" for p in pos[~found]]
+
+    for p, d in zip(pos[:n_live], sweeps['Direction'].values[:n_live]):
+        live = analyst._check_candle_signal(df, int(p), 0, point)
+        if live is None or live['action'] != ('BUY' if d == 1 else 'SELL'):
+            failures.append(f"sweep {p} missed live")
+
+    fvgs = truth['fvgs']
+    detected = detect_fvgs(df['High'].values, df['Low'].values)
+    detected = set(zip(detected[0].tolist(), detected[1].tolist()))
+    failures += [f"fvg {p} missed" for p, d in zip(fvgs['Pos'], fvgs['Direction']) if (p, d) not in detected]
+
+    natural = int((frame['direction'] != 0).sum()) - len(sweeps)
+    print(f"  Sweeps: {len(sweeps)} planted, {int(found.sum())} found (+{natural} natural) | "
+          f"FVGs: {len(fvgs)} planted, {len(detected)} detected")
+    return failures
+
+if __name__ == "__main__":
+    n_bars = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    n_speed = int(sys.argv[2]) if len(sys.argv) > 2 else 20000000
+
+    failures = []
+    market = generate_market(['EURUSD', 'USDJPY', 'XAUUSD'], n_bars, seed=11)
+    for symbol, (df, truth) in market.items():
+        print(f"{symbol}: {len(df):,} bars {df.index[0]} -> {df.index[-1]} | Close {df['Close'].iloc[-1]}")
+        failures += [f"{symbol}: {f}" for f in check_symbol(df, truth, SYMBOL_PROFILES[symbol]['point'])]
+
+    t0 = time.perf_counter()
+    df, truth = generate_ohlc(n_speed, 'EURUSD', seed=3)
+    elapsed = time.perf_counter() - t0
+    print(f"Generation: {len(df):,} bars in {elapsed:.2f} s ({len(df) / elapsed / 1e6:.1f} M bars/s) | "
+          f"{len(truth['sweeps']):,} sweeps, {len(truth['fvgs']):,} FVGs planted")
+
+    if failures:
+        print(f"❌ {len(failures)} failures: {failures[:10]}")
+        sys.exit(1)
+    print("✅ Every planted sweep and FVG is found by the signal engines.")
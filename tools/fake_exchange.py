@@ -0,0 +1,152 @@
+import sys
+import os
+import time
+import asyncio
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.timeframes import timeframe_seconds
+
+class FakeExchange:
+    """
+    Exchange local con la interfaz CCXT que usan los bots (sync).
+    Velas deterministas por símbolo, latencia fija por petición y
+    espaciado mínimo entre peticiones (como enableRateLimit).
+    """
+
+    def __init__(self, latency=0.25, rate_limit=0.01, n_bars=1000, balances=None):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.n_bars = n_bars
+        self.balances = balances or {'USDT': {'free': 10000.0}}
+        self.calls = []
+        self.orders = []
+        self._next_slot = 0.0
+
+    def milliseconds(self):
+        return int(time.time() * 1000)
+
+    def _candles(self, symbol, timeframe, since=None, limit=None):
+        period = timeframe_seconds(timeframe)
+        last_open = int(time.time()) // period * period
+        times = last_open - period * np.arange(self.n_bars - 1, -1, -1)
+        rng = np.random.default_rng(abs(hash((symbol, timeframe))) % 2**32)
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, self.n_bars)))
+        opens = np.r_[closes[0], closes[:-1]]
+        highs = np.maximum(opens, closes) * (1 + rng.exponential(0.001, self.n_bars))
+        lows = np.minimum(opens, closes) * (1 - rng.exponential(0.001, self.n_bars))
+        rows = np.column_stack([times * 1000, opens, highs, lows, closes, rng.random(self.n_bars)])
+        if since is not None:
+            # Como CCXT: las `limit` primeras velas desde `since`
+            rows = rows[rows[:, 0] >= since][:limit]
+        elif limit is not None:
+            rows = rows[-limit:]
+        return [[int(r[0])] + list(r[1:]) for r in rows]
+
+    def _throttle(self):
+        # Espaciado tipo ccxt: cada petición reserva el siguiente hueco libre
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.rate_limit
+        return slot - now + self.latency
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.calls.append(('fetch_ohlcv', symbol, timeframe))
+        time.sleep(self._throttle())
+        return self._candles(symbol, timeframe, since, limit)
+
+    def fetch_balance(self):
+        self.calls.append(('fetch_balance',))
+        time.sleep(self._throttle())
+        return self.balances
+
+    def fetch_time(self):
+        return self.milliseconds()
+
+    def create_order(self, symbol, type, side, amount):
+        self.calls.append(('create_order', symbol))
+        time.sleep(self._throttle())
+        order = {'id': str(len(self.orders) + 1), 'symbol': symbol, 'side': side, 'amount': amount}
+        self.orders.append(order)
+        return order
+
+
+class FakeAsyncExchange(FakeExchange):
+    """
+    Misma fuente de datos con la interfaz de ccxt.async_support.
+    """
+
+    async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.calls.append(('fetch_ohlcv', symbol, timeframe))
+        await asyncio.sleep(self._throttle())
+        return self._candles(symbol, timeframe, since, limit)
+
+    async def fetch_balance(self):
+        self.calls.append(('fetch_balance',))
+        await asyncio.sleep(self._throttle())
+        return self.balances
+
+    async def fetch_time(self):
+        return self.milliseconds()
+
+    async def create_order(self, symbol, type, side, amount):
+        self.calls.append(('create_order', symbol))
+        await asyncio.sleep(self._throttle())
+        order = {'id': str(len(self.orders) + 1), 'symbol': symbol, 'side': side, 'amount': amount}
+        self.orders.append(order)
+        return order
+
+    async def close(self):
+        pass
+
+
+def _prepare(bot, store_dir):
+    from src.bar_store import BarStore
+    from config import settings_ccxt as settings
+    bot.store = BarStore(store_dir)
+    period = timeframe_seconds(settings.TIMEFRAME_LTF)
+    bot.bar_close_time = pd.Timestamp(int(time.time()) // period * period, unit='s')
+    bot.pending_symbols = set(bot.symbols)
+
+def sync_scan(bot):
+    """
+    Misma secuencia de peticiones que una pasada de CCXTSMCBot.run (sin dormir).
+    """
+    from config import settings_ccxt as settings
+    balance = bot.get_balance()
+    for symbol in bot.symbols:
+        df_closed = bot.closed_bars(symbol, bot.get_ohlcv(symbol, settings.TIMEFRAME_LTF, 500))
+        if df_closed is None: continue
+        if not bot.advance_trend(symbol, df_closed):
+            bot.seed_trend(symbol, bot.get_ohlcv(symbol, settings.TIMEFRAME_HTF, bot.trend.window), df_closed)
+
+if __name__ == "__main__":
+    from src.main_ccxt import CCXTSMCBot
+    from src.main_ccxt_async import AsyncCCXTSMCBot
+
+    n_async = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir) # Journal DB stays out of the repo
+
+    bot = CCXTSMCBot(exchange=FakeExchange(), symbols=[f"S{i}/USDT" for i in range(3)])
+    _prepare(bot, os.path.join(workdir, 'sync'))
+    t0 = time.perf_counter()
+    sync_scan(bot)
+    t_sync = time.perf_counter() - t0
+
+    async_bot = AsyncCCXTSMCBot(exchange=FakeAsyncExchange(), symbols=[f"S{i}/USDT" for i in range(n_async)])
+    _prepare(async_bot, os.path.join(workdir, 'async'))
+    t0 = time.perf_counter()
+    asyncio.run(async_bot.scan())
+    t_async = time.perf_counter() - t0
+
+    seeded = sum(symbol in async_bot.trend.states for symbol in async_bot.symbols)
+    balance_calls = sum(call[0] == 'fetch_balance' for call in async_bot.exchange.calls)
+    print(f"Sync scan, 3 symbols: {t_sync:.2f}s")
+    print(f"Async scan, {n_async} symbols: {t_async:.2f}s ({len(async_bot.exchange.calls)} requests, {balance_calls} balance)")
+    if async_bot.pending_symbols or seeded != n_async or balance_calls != 1:
+        print(f"❌ Incomplete scan: pending={len(async_bot.pending_symbols)} seeded={seeded}")
+        sys.exit(1)
+    print("✅ Every symbol fetched, seeded and analyzed in one concurrent pass.")
@@ -0,0 +1,104 @@
+import sys
+import os
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.notifications import TelegramNotifier
+
+class FakeTelegram:
+    """
+    Servidor HTTP local que imita la Bot API (sendMessage / sendPhoto).
+    `fail_first`: cuántas peticiones responden 429 antes de aceptar.
+    `delay`: segundos que tarda cada respuesta.
+    """
+
+    def __init__(self, fail_first=0, retry_after=0.1, delay=0.0):
+        self.requests = []
+        self.fail_first = fail_first
+        self.retry_after = retry_after
+        self.delay = delay
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                time.sleep(fake.delay)
+                if fake.fail_first > 0:
+                    fake.fail_first -= 1
+                    self._reply(429, {'ok': False, 'parameters': {'retry_after': fake.retry_after}})
+                    return
+                fake.requests.append((self.path.rsplit('/', 1)[-1], body))
+                self._reply(200, {'ok': True})
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def methods(self):
+        return [method for method, _ in self.requests]
+
+    def stop(self):
+        self.server.shutdown()
+
+if __name__ == "__main__":
+    failures = []
+
+    # 1. Burst of fills while Telegram is slow: enqueueing must stay instant
+    fake = FakeTelegram(delay=0.5)
+    notifier = TelegramNotifier("TOKEN", "CHAT", base_url=fake.url, digest_window=0.3, backoff=0.05)
+    t0 = time.perf_counter()
+    for i in range(20):
+        notifier.send_alert(f"Alert {i}", image_bytes=b"png" if i % 10 == 0 else None)
+    enqueue_ms = (time.perf_counter() - t0) * 1000
+    notifier.close(timeout=20)
+    print(f"Burst: 20 alerts enqueued in {enqueue_ms:.1f} ms -> {fake.methods()}")
+    if enqueue_ms > 50: failures.append("enqueue blocked")
+    if fake.methods().count('sendMessage') != 1 or fake.methods().count('sendPhoto') != 2:
+        failures.append("burst not coalesced into one digest + 2 photos")
+    fake.stop()
+
+    # 2. Rate limited: 429 with retry_after, then delivered
+    fake = FakeTelegram(fail_first=2, retry_after=0.1)
+    notifier = TelegramNotifier("TOKEN", "CHAT", base_url=fake.url, digest_window=0, backoff=0.05)
+    notifier.send_alert("Rate limited")
+    notifier.close(timeout=10)
+    print(f"429 x2: sent={notifier.sent} failed={notifier.failed}")
+    if notifier.sent != 1: failures.append("429 not retried")
+    fake.stop()
+
+    # 3. Hung API: timeout + bounded retries, never blocks the caller
+    fake = FakeTelegram(delay=2.0)
+    notifier = TelegramNotifier("TOKEN", "CHAT", base_url=fake.url, digest_window=0, timeout=0.2, max_retries=1, backoff=0.05)
+    t0 = time.perf_counter()
+    notifier.send_alert("Slow")
+    caller_ms = (time.perf_counter() - t0) * 1000
+    notifier.close(timeout=10)
+    print(f"Timeout: caller {caller_ms:.1f} ms | sent={notifier.sent} failed={notifier.failed}")
+    if notifier.failed != 1: failures.append("timeout not enforced")
+    fake.stop()
+
+    # 4. Bounded queue: overflow is dropped, not blocking
+    notifier = TelegramNotifier("TOKEN", "CHAT", base_url="http://127.0.0.1:9", max_queue=5, digest_window=5, timeout=0.2, max_retries=0)
+    for i in range(20):
+        notifier.send_alert(f"Overflow {i}")
+    print(f"Overflow: dropped={notifier.dropped}")
+    if notifier.dropped == 0: failures.append("queue not bounded")
+
+    if failures:
+        print(f"❌ {failures}")
+        sys.exit(1)
+    print("✅ Telegram delivery queue behaves as expected.")